@@ -0,0 +1,52 @@
+"""
+Compares the single-pass BinaryFieldFixer with the previous per-field re.sub repair.
+
+Run from the repository root:
+    python -m benchmarks.bench_binary_field_fixer
+"""
+import json
+import random
+import re
+import timeit
+
+from migrate.export import BinaryFieldFixer
+
+
+def legacy_fix(response_text, binary_fields):
+    for field in binary_fields:
+        pattern = rf'"{field}":([^",:}}\s]+)'
+        replacement = rf'"{field}":"\1"'
+        response_text = re.sub(pattern, replacement, response_text)
+    return response_text
+
+
+def build_page(docs, binary_fields, quoted=False):
+    rng = random.Random(42)
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+    rendered = []
+    for n in range(docs):
+        doc = {"id": str(n), "title": "document %d" % n, "body": "lorem ipsum " * 40}
+        text = json.dumps(doc)[:-1]
+        for field in binary_fields:
+            value = "".join(rng.choice(alphabet) for _ in range(64)) + "="
+            text += ',"%s":%s' % (field, json.dumps(value) if quoted else value)
+        rendered.append(text + "}")
+    return '{"response":{"numFound":%d,"docs":[%s]},"nextCursorMark":"AoE"}' % (docs, ",".join(rendered))
+
+
+def run(label, page, binary_fields, repeat=5, number=3):
+    fixer = BinaryFieldFixer(binary_fields)
+    assert fixer.fix(page) == legacy_fix(page, binary_fields)
+    legacy = min(timeit.repeat(lambda: legacy_fix(page, binary_fields), repeat=repeat, number=number)) / number
+    single = min(timeit.repeat(lambda: fixer.fix(page), repeat=repeat, number=number)) / number
+    raw = page.encode("utf-8")
+    single_bytes = min(timeit.repeat(lambda: fixer.fix(raw), repeat=repeat, number=number)) / number
+    print("%-34s %8.1f KB  legacy %8.2f ms  single-pass %8.2f ms  bytes %8.2f ms  speedup %5.1fx" % (
+        label, len(page) / 1024, legacy * 1000, single * 1000, single_bytes * 1000, legacy / single))
+
+
+if __name__ == "__main__":
+    for field_count in (1, 10, 20):
+        fields = ["binary_field_%d" % i for i in range(field_count)]
+        run("%d binary fields, unquoted" % field_count, build_page(2000, fields), fields)
+        run("%d binary fields, already quoted" % field_count, build_page(2000, fields, quoted=True), fields)
@@ -16,6 +16,9 @@ export interface Solr2OsStackProps extends cdk.StackProps {
     namePrefix?: string;
     domainName?: string;
     indexName?: string;
+    exportFormat?: string;
+    exportCompression?: string;
+    documentIdField?: string;
 }
 
 export class Solr2OsStack extends cdk.Stack {
@@ -73,7 +76,12 @@ export class Solr2OsStack extends cdk.Stack {
             migrationBucketName: migrationBucketName,
             opensearchEndpoint: opensearch.domain.domainEndpoint,
             pipelineRoleArn: pipeline_iam.pipelineRole.roleArn,
-            indexName: indexName
+            indexName: indexName,
+            // keep in step with export_format and export_compression in migrate.toml
+            exportFormat: props?.exportFormat || this.node.tryGetContext("exportFormat"),
+            exportCompression: props?.exportCompression || this.node.tryGetContext("exportCompression"),
+            // the uniqueKey of the collection, as renamed by rename_fields
+            documentIdField: props?.documentIdField || this.node.tryGetContext("documentIdField")
         })
 
         pipeline.node.addDependency(pipeline_iam.pipelineRole)
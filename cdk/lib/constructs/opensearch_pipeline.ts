@@ -12,8 +12,29 @@ export interface OpensearchPipelineProps {
     readonly opensearchEndpoint: string;
     readonly pipelineRoleArn: string;
     readonly indexName: string;
+    readonly exportFormat?: string;
+    readonly exportCompression?: string;
+    readonly documentIdField?: string;
 }
 
+// S3 source codec for each export_format of the data migration
+const PIPELINE_CODECS: { [format: string]: string } = {
+    json: "json",
+    ndjson: "newline",
+};
+// export_compression values the S3 source can read
+const PIPELINE_COMPRESSIONS = ["none", "gzip"];
+// the newline codec puts each ndjson line into "message"; other codecs emit documents whose own "message"
+// field must be left alone
+const NEWLINE_PROCESSORS = [
+    "- parse_json:",
+    "    source: \"message\"",
+    "    parse_when: '/message != null'",
+    "- delete_entries:",
+    "    with_keys: [ \"message\" ]",
+    "    delete_when: '/message != null'",
+].join("\n    ");
+
 export class OpensearchPipelineConstruct extends Construct {
     readonly pipeline: CfnPipeline;
     constructor(scope: Construct, id: string, props: OpensearchPipelineProps) {
@@ -21,6 +42,15 @@ export class OpensearchPipelineConstruct extends Construct {
 
         const pipeline_name = props.pipelineName || 'solr2os-migration-pipeline';
         const fileContents = fs.readFileSync('lib/pipeline/pipeline.yaml', 'utf8');
+        const exportFormat = props.exportFormat || "json";
+        const exportCompression = props.exportCompression || "none";
+        const documentIdField = props.documentIdField || "id";
+        if (!(exportFormat in PIPELINE_CODECS)) {
+            throw new Error(`Unsupported export format ${exportFormat}`);
+        }
+        if (!PIPELINE_COMPRESSIONS.includes(exportCompression)) {
+            throw new Error(`The pipeline S3 source cannot read ${exportCompression} compressed exports`);
+        }
 
         const cloudwatchLogsGroup = new LogGroup(scope, 'LogGroup', {
             logGroupName: `/aws/vendedlogs/OpenSearchService/${pipeline_name}`,
@@ -41,7 +71,12 @@ export class OpensearchPipelineConstruct extends Construct {
                 pipelineRoleArn: props.pipelineRoleArn,
                 openSearchDomainVPCEndpoint: props.opensearchEndpoint,
                 bucketName: props.migrationBucketName,
-                indexName: props.indexName
+                indexName: props.indexName,
+                pipelineCodec: PIPELINE_CODECS[exportFormat],
+                codecProcessors: PIPELINE_CODECS[exportFormat] === "newline" ? NEWLINE_PROCESSORS : "",
+                pipelineCompression: exportCompression,
+                // a Data Prepper format string, passed as a value so that Fn.sub leaves it alone
+                documentId: "${/" + documentIdField + "}"
             }),
             pipelineName: pipeline_name,
             vpcOptions: {
@@ -1,4 +1,5 @@
 # Press the green button in the gutter to run the script.
+import argparse
 import sys
 
 import opensearchpy
@@ -7,6 +8,8 @@ import toml
 import boto3
 
 from config import get_custom_logger
+from migrate.export import export_targets
+from migrate.orchestrator import MigrationOrchestrator
 from migrate.solr2os_migrate import Solr2OSMigrate
 from opensearch.opensearch_client import OpenSearchClient
 from solr.solr_client import SolrClient
@@ -14,6 +17,26 @@ from solr.solr_client import SolrClient
 logger = get_custom_logger("main")
 
 if __name__ == '__main__':    
+    parser = argparse.ArgumentParser(description="Migrate an Apache Solr collection to Amazon OpenSearch")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted data export from its last committed batch")
+    parser.add_argument("--replay-dead-letters", action="store_true",
+                        help="export the documents of the dead-letter file again instead of running a migration")
+    parser.add_argument("--reconcile", action="store_true",
+                        help="compare the OpenSearch index with Solr by bucket checksums instead of running a "
+                             "migration")
+    parser.add_argument("--diff-ids", action="store_true",
+                        help="write the ids missing from and extra in the OpenSearch index instead of running a "
+                             "migration")
+    parser.add_argument("--reexport-ids", metavar="FILE",
+                        help="export only the documents whose ids are listed in FILE, one per line")
+    parser.add_argument("--sync", action="store_true",
+                        help="keep applying Solr changes and deletes to the OpenSearch index until interrupted")
+    parser.add_argument("--worker", action="store_true",
+                        help="export partitions claimed from the shared work queue, together with other workers")
+    parser.add_argument("--collections", nargs="+", metavar="PATTERN",
+                        help="migrate every collection matching the names or glob patterns, largest first")
+    args = parser.parse_args()
     config = toml.load("migrate.toml")
     migration_config = config['migration']
     data_migration_config = config.get('data_migration', {})
@@ -23,7 +46,7 @@ if __name__ == '__main__':
             sys.exit()
         
     # Validate data migration configuration if enabled
-    if data_migration_config.get('migrate_data', False):
+    if data_migration_config.get('migrate_data', False) and 's3' in export_targets(data_migration_config):
         if not data_migration_config.get('s3_export_bucket'):
             logger.error("s3_export_bucket must be specified when migrate_data is enabled")
             sys.exit()
@@ -38,6 +61,12 @@ if __name__ == '__main__':
             sys.exit()
             
     try:
+        collections = args.collections or config.get('orchestration', {}).get('collections')
+        if collections:
+            results = MigrationOrchestrator(config).run(collections)
+            logger.info(f"Migrated {sum(1 for r in results if r['status'] == 'completed')} of {len(results)} "
+                        f"collections")
+            sys.exit()
         solrclient = SolrClient(config['solr'])
         opensearchclient = OpenSearchClient(config['opensearch'])
         file_path = f"migration_schema/{config['solr']['collection']}/"
@@ -50,6 +79,31 @@ if __name__ == '__main__':
             data_migration_config
         )
         logger.info("Migration object initialized")
+        if args.replay_dead_letters:
+            replayed = migrator.replay_dead_letters()
+            logger.info(f"Replayed {replayed} dead-lettered documents")
+            sys.exit()
+        if args.reconcile:
+            result = migrator.reconcile()
+            logger.info(f"Reconciled {result['source_docs']} Solr with {result['target_docs']} OpenSearch documents, "
+                        f"{len(result['differing_buckets'])} buckets differ")
+            sys.exit()
+        if args.diff_ids:
+            result = migrator.diff_ids()
+            logger.info(f"{result['missing']} ids missing from OpenSearch, {result['extra']} extra")
+            sys.exit()
+        if args.reexport_ids:
+            exported = migrator.reexport_ids(args.reexport_ids)
+            logger.info(f"Exported {exported} documents listed in {args.reexport_ids}")
+            sys.exit()
+        if args.worker:
+            completed = migrator.run_export_worker()
+            logger.info(f"Export worker completed {completed} partitions")
+            sys.exit()
+        if args.sync:
+            metrics = migrator.sync()
+            logger.info(f"Sync stopped after {metrics['cycles']} cycles, lag {metrics['lag_seconds']}s")
+            sys.exit()
         # Handle schema migration if enabled
         if migration_config.get('migrate_schema', False):
             logger.info("Starting schema migration")
@@ -61,8 +115,15 @@ if __name__ == '__main__':
         # Handle data migration if enabled
         if data_migration_config.get('migrate_data', False):
             logger.info("Starting data export")
-            migrator.export_data()
-            logger.info(f"Data export completed. Check S3 bucket: {data_migration_config['s3_export_bucket']}")
+            migrator.export_data(resume=args.resume)
+            targets = export_targets(data_migration_config)
+            if 'opensearch' in targets:
+                logger.info(f"Data export completed. Check OpenSearch index: {config['opensearch']['index']}")
+            if 'local' in targets:
+                logger.info(f"Data export completed. Check directory: "
+                            f"{data_migration_config.get('local_export_dir', 'solr-export')}")
+            if 's3' in targets:
+                logger.info(f"Data export completed. Check S3 bucket: {data_migration_config['s3_export_bucket']}")
             
     except pysolr.SolrError as e:
         logger.error(f"Solr error: {str(e)}")
@@ -0,0 +1,59 @@
+from .batch_writer import PIPELINE_COMPRESSIONS, BatchWriter, BatchWriterException
+from .binary_field_fixer import BinaryFieldFixer
+from .bulk_sink import BulkSinkException, OpenSearchBulkSink
+from .checkpoint import CheckpointException, ExportJournal, PartitionCheckpoint, PartitionState
+from .concurrency import OVERLOAD_STATUSES, AimdController, BudgetedClient, RequestBudget
+from .dead_letter import DeadLetterStore
+from .delta import DeltaWatermark, delta_filter_query, open_delta_window
+from .export_handler import (EXPORT_ENGINES, ExportFieldPlan, ExportHandlerException, export_batches,
+                             merge_stored_fields, parallel_search_expression, resume_filter_query)
+from .id_diff import EXTRA, MISSING, IdDiffException, merge_sorted_ids, read_id_chunks
+from .nested import (CHILD_TRANSFORMER, CHILD_TRANSFORMER_LIMIT, ChildStitcher, NestedStats, nest_path_field,
+                     readable_field)
+from .page_sizer import AdaptivePageSizer
+from .partition_helper import (ExportPartition, ExportProgress, PartitionException, WorkStealingPool,
+                               build_partitions, uncached_params, uncached_query)
+from .pipeline import ExportPipeline, PipelineStage, extract_next_cursor_mark
+from .projection import SOLR_INTERNAL_FIELDS, FieldProjection
+from .reconcile import BucketChecksums, ReconcileException, diff_buckets, document_digest, id_bucket
+from .retry import RetryPolicy, is_transient
+from .shards import DEFAULT_SHARDS_PREFERENCE, order_replicas, parse_shards_preference, shard_partitions
+from .sinks import (EXPORT_TARGETS, ExportSink, LocalDirectorySink, RollingS3Sink, S3BatchSink, SinkException,
+                    export_targets)
+from .spill_buffer import BufferedPage, SpillBuffer
+from .stream_parser import StreamingDocsParser
+from .sync import SyncMetrics
+from .tee_sink import TeeSink
+from .telemetry import HISTOGRAM_BOUNDS, STAGES, ExportTelemetry, percentile
+from .work_queue import (WORK_QUEUE_BACKENDS, Lease, LeasedProgress, LeaseKeeper, QueueJournal, SqliteWorkQueue,
+                         WorkQueue, WorkQueueException, open_work_queue)
+
+__all__ = ['PIPELINE_COMPRESSIONS', 'BatchWriter', 'BatchWriterException',
+           'BinaryFieldFixer',
+           'BulkSinkException', 'OpenSearchBulkSink',
+           'CheckpointException', 'ExportJournal', 'PartitionCheckpoint', 'PartitionState',
+           'OVERLOAD_STATUSES', 'AimdController', 'BudgetedClient', 'RequestBudget',
+           'DeadLetterStore',
+           'DeltaWatermark', 'delta_filter_query', 'open_delta_window',
+           'EXPORT_ENGINES', 'ExportFieldPlan', 'ExportHandlerException', 'export_batches', 'merge_stored_fields',
+           'parallel_search_expression', 'resume_filter_query',
+           'EXTRA', 'MISSING', 'IdDiffException', 'merge_sorted_ids', 'read_id_chunks',
+           'CHILD_TRANSFORMER', 'CHILD_TRANSFORMER_LIMIT', 'ChildStitcher', 'NestedStats', 'nest_path_field',
+           'readable_field',
+           'AdaptivePageSizer',
+           'ExportPartition', 'ExportProgress', 'PartitionException', 'WorkStealingPool', 'build_partitions',
+           'uncached_params', 'uncached_query',
+           'ExportPipeline', 'PipelineStage', 'extract_next_cursor_mark',
+           'SOLR_INTERNAL_FIELDS', 'FieldProjection',
+           'BucketChecksums', 'ReconcileException', 'diff_buckets', 'document_digest', 'id_bucket',
+           'RetryPolicy', 'is_transient',
+           'DEFAULT_SHARDS_PREFERENCE', 'order_replicas', 'parse_shards_preference', 'shard_partitions',
+           'EXPORT_TARGETS', 'ExportSink', 'LocalDirectorySink', 'RollingS3Sink', 'S3BatchSink', 'SinkException',
+           'export_targets',
+           'BufferedPage', 'SpillBuffer',
+           'StreamingDocsParser',
+           'SyncMetrics',
+           'TeeSink',
+           'HISTOGRAM_BOUNDS', 'STAGES', 'ExportTelemetry', 'percentile',
+           'WORK_QUEUE_BACKENDS', 'Lease', 'LeasedProgress', 'LeaseKeeper', 'QueueJournal', 'SqliteWorkQueue',
+           'WorkQueue', 'WorkQueueException', 'open_work_queue']
@@ -0,0 +1,127 @@
+import gzip
+import json
+import tempfile
+
+from config import get_custom_logger
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = get_custom_logger("migrate.export.batch_writer")
+
+# export_format: (ContentType, object key extension)
+FORMATS = {
+    "json": ("application/json", ".json"),
+    "ndjson": ("application/x-ndjson", ".ndjson"),
+}
+# export_compression: (ContentEncoding, object key extension)
+COMPRESSIONS = {
+    "none": (None, ""),
+    "gzip": ("gzip", ".gz"),
+    "zstd": ("zstd", ".zst"),
+}
+# export_compression values the OSIS pipeline S3 source can read
+PIPELINE_COMPRESSIONS = {"none", "gzip"}
+
+
+class BatchWriterException(Exception):
+    def __init__(self, name, reason=None):
+        self.name = name
+        self.reason = reason
+
+    def __str__(self):
+        return f"{self.reason}: {self.name}"
+
+
+def format_metadata(export_format, compression):
+    """
+    :return: tuple of (ContentType, ContentEncoding, object key extension) of an export format
+    """
+    content_type, format_extension = FORMATS[export_format]
+    content_encoding, compression_extension = COMPRESSIONS[compression]
+    return content_type, content_encoding, format_extension + compression_extension
+
+
+class BatchWriter(object):
+    """
+    Serializes documents one at a time into the body of a batch object, as a JSON array or as
+    newline-delimited JSON, optionally gzip or zstd compressed.
+    The body is kept in memory up to spool_bytes and moved to a temporary file beyond that, unless a
+    writable fileobj is given to stream the body into.
+    """
+
+    def __init__(self, spool_bytes=8 * 1024 * 1024, export_format="json", compression="none", compression_level=None,
+                 fileobj=None):
+        self.validate(export_format, compression)
+        self.content_type, self.content_encoding, self.extension = format_metadata(export_format, compression)
+        self._ndjson = export_format == "ndjson"
+        if fileobj is None:
+            fileobj = tempfile.SpooledTemporaryFile(max_size=spool_bytes, mode="w+b")
+        self._file = fileobj
+        self._closed = False
+        if compression == "gzip":
+            self._stream = gzip.GzipFile(fileobj=self._file, mode="wb",
+                                         compresslevel=compression_level if compression_level is not None else 6)
+        elif compression == "zstd":
+            compressor = zstandard.ZstdCompressor(level=compression_level if compression_level is not None else 3)
+            self._stream = compressor.stream_writer(self._file, closefd=False)
+        else:
+            self._stream = self._file
+        self.doc_count = 0
+
+    @classmethod
+    def from_config(cls, data_config, fileobj=None):
+        return cls(
+            spool_bytes=data_config.get('stream_spool_bytes', 8 * 1024 * 1024),
+            export_format=data_config.get('export_format', 'json'),
+            compression=data_config.get('export_compression', 'none'),
+            compression_level=data_config.get('compression_level'),
+            fileobj=fileobj
+        )
+
+    @staticmethod
+    def validate(export_format, compression):
+        if export_format not in FORMATS:
+            raise BatchWriterException(name=export_format, reason="UnknownExportFormat")
+        if compression not in COMPRESSIONS:
+            raise BatchWriterException(name=compression, reason="UnknownExportCompression")
+        if compression == "zstd" and zstandard is None:
+            raise BatchWriterException(name=compression, reason="zstandard package is not installed")
+
+    def write(self, doc):
+        data = json.dumps(doc).encode("utf-8")
+        if self._ndjson:
+            self._stream.write(data + b"\n")
+        else:
+            self._stream.write((b"[" if self.doc_count == 0 else b",") + data)
+        self.doc_count += 1
+
+    def finish(self):
+        """
+        Write the end of the body and flush the compressor
+        """
+        if not self._closed:
+            if not self._ndjson:
+                self._stream.write(b"]" if self.doc_count else b"[]")
+            if self._stream is not self._file:
+                self._stream.close()
+            self._closed = True
+
+    def body(self):
+        """
+        Finish the batch and return a readable file object positioned at the start of the body
+        """
+        self.finish()
+        self._file.seek(0)
+        return self._file
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
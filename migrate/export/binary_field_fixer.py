@@ -0,0 +1,50 @@
+import re
+
+from config import get_custom_logger
+
+logger = get_custom_logger("migrate.export.binary_field_fixer")
+
+
+class BinaryFieldFixer(object):
+    """
+    Quotes unquoted Base64 values of binary fields in a Solr JSON response.
+    All binary fields are matched by one precompiled pattern, so a page is scanned once however many
+    binary fields the schema has. A page that does not contain the key of any binary field skips the scan
+    after a substring search per field, and a page without unquoted binary values is returned untouched,
+    without a copy. Works on str and on bytes, so a raw response body can be repaired without decoding it first.
+    """
+
+    def __init__(self, binary_fields):
+        self.fields = tuple(binary_fields)
+        self._pattern = None
+        self._bytes_pattern = None
+        self._keys = tuple(f'"{name}":' for name in set(self.fields))
+        self._bytes_keys = tuple(key.encode("utf-8") for key in self._keys)
+        if self.fields:
+            # longest names first so that a field is never matched by a shorter prefix of its name
+            names = sorted(set(self.fields), key=len, reverse=True)
+            pattern = '("(?:' + '|'.join(re.escape(name) for name in names) + r')":)([^",:}\s]+)'
+            self._pattern = re.compile(pattern)
+            self._bytes_pattern = re.compile(pattern.encode("utf-8"))
+
+    def fix(self, response):
+        """
+        Repair all binary fields of a response in a single pass
+        :param response: JSON text as str or bytes
+        :return: the repaired response, or the input object itself when nothing needed repair
+        """
+        if self._pattern is None:
+            return response
+        if isinstance(response, bytes):
+            pattern, quote, keys = self._bytes_pattern, b'"', self._bytes_keys
+        else:
+            pattern, quote, keys = self._pattern, '"', self._keys
+        if not any(key in response for key in keys):
+            return response
+        # split yields [text, key, value, text, key, value, ..., text]; quoting the values and joining the
+        # parts back is cheaper than expanding a replacement template for every match
+        parts = pattern.split(response)
+        if len(parts) == 1:
+            return response
+        parts[2::3] = [quote + value + quote for value in parts[2::3]]
+        return response[:0].join(parts)
@@ -0,0 +1,252 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from opensearchpy import TransportError
+
+from config import get_custom_logger
+from migrate.export.sinks import ExportSink
+
+logger = get_custom_logger("migrate.export.bulk_sink")
+
+# only the fields needed to find failed items are returned by _bulk
+BULK_FILTER_PATH = "errors,items.*.status,items.*.error.type,items.*.error.reason"
+REJECTED_ERRORS = {"es_rejected_execution_exception", "rejected_execution_exception"}
+MIN_BULK_BYTES = 256 * 1024
+
+
+class BulkSinkException(Exception):
+    def __init__(self, name, reason=None):
+        self.name = name
+        self.reason = reason
+
+    def __str__(self):
+        return f"{self.reason}: {self.name}"
+
+
+class OpenSearchBulkSink(ExportSink):
+    """
+    Indexes exported documents straight into the OpenSearch index with concurrent _bulk requests.
+    Documents of consecutive batches are packed into requests of about bulk_bytes of payload. At most
+    bulk_concurrency requests are in flight; write_batch blocks beyond that, which backs pressure up to the
+    Solr fetch. Requests rejected with 429 / es_rejected_execution_exception are retried with exponential
+    backoff, resending only the rejected items, and the request size is halved until requests succeed again.
+    Documents written with versions are indexed with external versioning, so that a request applied after a
+    newer one for the same document is rejected as a version conflict and counted as stale instead of failed.
+    """
+
+    def __init__(self, opensearch_client, unique_key, data_config, on_commit=None):
+        """
+        :param on_commit: optional callback(batch_counts, index), called once every document of the batches
+                          is indexed or has failed permanently
+        """
+        super().__init__(on_commit)
+        self._client = opensearch_client
+        self._unique_key = unique_key
+        self._max_bulk_bytes = int(data_config.get('bulk_bytes', 5 * 1024 * 1024))
+        self._bulk_bytes = self._max_bulk_bytes
+        self._max_retries = int(data_config.get('bulk_max_retries', 8))
+        self._initial_backoff = float(data_config.get('bulk_initial_backoff', 0.5))
+        self._max_backoff = float(data_config.get('bulk_max_backoff', 30))
+        concurrency = int(data_config.get('bulk_concurrency', 4))
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bulk")
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._buffer_size = 0
+        self._buffer_batches = set()
+        # batch count -> number of open references: the batch being written and the requests holding its documents
+        self._references = {}
+        self._futures = []
+        self._error = None
+        self.failures = []
+        self.indexed_docs = 0
+        self.deleted_docs = 0
+        self.stale_docs = 0
+        self.requests = 0
+        self.retries = 0
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise BulkSinkException(name=str(self._error), reason="Bulk request failed")
+
+    def write_batch(self, batch_count, docs, versions=None):
+        """
+        Queue the documents of one batch for indexing, sending a _bulk request whenever enough payload is buffered
+        :param versions: optional external version of every document, such as Solr's _version_
+        :return: number of documents written
+        """
+        started = time.monotonic()
+        lines = []
+        for position, doc in enumerate(docs):
+            doc_id = doc.get(self._unique_key)
+            action = {"_id": str(doc_id)} if doc_id is not None else {}
+            if versions is not None and versions[position] is not None:
+                action.update(version=versions[position], version_type="external")
+            lines.append((doc_id, (json.dumps({"index": action}) + "\n" + json.dumps(doc) + "\n").encode("utf-8")))
+        return self._queue(batch_count, lines, started)
+
+    def delete_batch(self, batch_count, ids):
+        """
+        Queue delete actions for documents by id; ids that are not in the index are not failures
+        :return: number of deletes queued
+        """
+        started = time.monotonic()
+        lines = [(doc_id, (json.dumps({"delete": {"_id": str(doc_id)}}) + "\n").encode("utf-8")) for doc_id in ids]
+        return self._queue(batch_count, lines, started)
+
+    def _queue(self, batch_count, lines, started):
+        """Buffer the action lines of one batch"""
+        self._raise_error()
+        written = 0
+        with self._lock:
+            self._references[batch_count] = 1
+        for doc_id, line in lines:
+            request = None
+            with self._lock:
+                self._buffer.append((doc_id, line))
+                self._buffer_size += len(line)
+                if batch_count not in self._buffer_batches:
+                    self._buffer_batches.add(batch_count)
+                    self._references[batch_count] += 1
+                if self._buffer_size >= self._bulk_bytes:
+                    request = self._take_buffer()
+            if request is not None:
+                self._submit(*request)
+            written += 1
+        # includes waiting for a free request slot when bulk_concurrency requests are in flight
+        self._record("serialize", time.monotonic() - started, batch_count)
+        self._release([batch_count])
+        return written
+
+    def _take_buffer(self):
+        """Take the buffered documents for one request, called with the lock held"""
+        if not self._buffer:
+            return None
+        request = self._buffer, self._buffer_batches
+        self._buffer, self._buffer_size, self._buffer_batches = [], 0, set()
+        return request
+
+    def _submit(self, items, batches):
+        """Send one request on the executor, blocking while bulk_concurrency requests are in flight"""
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._send, items, batches)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        with self._lock:
+            self._futures.append(future)
+
+    def _release(self, batches):
+        committed = []
+        with self._lock:
+            for batch in batches:
+                self._references[batch] -= 1
+                if self._references[batch] == 0:
+                    del self._references[batch]
+                    committed.append(batch)
+        if committed and self._on_commit is not None:
+            self._on_commit(sorted(committed), self._client.index_name)
+
+    def _backoff(self, attempt):
+        delay = min(self._max_backoff, self._initial_backoff * (2 ** attempt))
+        time.sleep(delay * random.uniform(0.5, 1.0))
+
+    def _resize(self, rejected):
+        with self._lock:
+            if rejected:
+                self._bulk_bytes = max(MIN_BULK_BYTES, self._bulk_bytes // 2)
+            else:
+                self._bulk_bytes = min(self._max_bulk_bytes, int(self._bulk_bytes * 1.25))
+
+    def _send(self, items, batches):
+        try:
+            self._send_with_retries(items)
+        except Exception as e:
+            logger.error(f"Bulk request of {len(items)} documents failed: {str(e)}")
+            self._error = e
+            return
+        self._release(batches)
+
+    def _send_with_retries(self, items):
+        attempt = 0
+        while True:
+            body = b"".join(line for _, line in items)
+            started = time.monotonic()
+            try:
+                response = self._client.bulk(body, filter_path=BULK_FILTER_PATH)
+                self._record("upload", time.monotonic() - started, bytes_out=len(body))
+            except TransportError as e:
+                if e.status_code != 429 or attempt >= self._max_retries:
+                    raise
+                logger.warning(f"Bulk request rejected with 429, retrying {len(items)} documents")
+            else:
+                with self._lock:
+                    self.requests += 1
+                rejected = []
+                failed = 0
+                stale = 0
+                deleted = sum(1 for _, line in items if line.startswith(b'{"delete"'))
+                if response.get("errors"):
+                    for item, result in zip(items, response["items"]):
+                        action, result = next(iter(result.items()))
+                        status = result.get("status", 0)
+                        if status < 300 or (action == "delete" and status == 404):
+                            continue
+                        if action == "delete":
+                            deleted -= 1
+                        error = result.get("error", {})
+                        if status == 409 and error.get("type") == "version_conflict_engine_exception":
+                            # a newer version of the document is already indexed
+                            stale += 1
+                        elif status == 429 or error.get("type") in REJECTED_ERRORS:
+                            rejected.append(item)
+                        else:
+                            failed += 1
+                            with self._lock:
+                                self.failures.append({"id": item[0], "status": status,
+                                                      "error": f"{error.get('type')}: {error.get('reason')}"})
+                with self._lock:
+                    self.indexed_docs += len(items) - len(rejected) - failed - stale - deleted
+                    self.deleted_docs += deleted
+                    self.stale_docs += stale
+                if not rejected:
+                    self._resize(rejected=False)
+                    return
+                if attempt >= self._max_retries:
+                    raise BulkSinkException(name=f"{len(rejected)} documents",
+                                            reason=f"Still rejected after {self._max_retries} retries")
+                logger.warning(f"{len(rejected)} of {len(items)} bulk items rejected, retrying them")
+                items = rejected
+            self._resize(rejected=True)
+            with self._lock:
+                self.retries += 1
+            self._backoff(attempt)
+            attempt += 1
+
+    def flush(self):
+        """
+        Send the buffered documents and wait for all requests in flight, keeping the sink open
+        """
+        with self._lock:
+            request = self._take_buffer()
+        if request is not None:
+            self._submit(*request)
+        with self._lock:
+            futures, self._futures = self._futures, []
+        for future in futures:
+            future.result()
+        self._raise_error()
+
+    def close(self):
+        """
+        Send the remaining documents and wait for all requests
+        """
+        try:
+            self.flush()
+        finally:
+            self._executor.shutdown(wait=True)
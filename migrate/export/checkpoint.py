@@ -0,0 +1,204 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from config import get_custom_logger
+
+logger = get_custom_logger("migrate.export.checkpoint")
+
+
+class CheckpointException(Exception):
+    def __init__(self, name, reason=None):
+        self.name = name
+        self.reason = reason
+
+    def __str__(self):
+        return f"{self.reason}: {self.name}"
+
+
+class PartitionState(object):
+    """Committed position of one partition, as read back from the journal"""
+
+    def __init__(self, name):
+        self.name = name
+        self.cursor_mark = "*"
+        self.last_batch = 0
+        self.docs = 0
+        self.batches = 0
+        self.keys = set()
+        self.done = False
+
+
+class ExportJournal(object):
+    """
+    Append-only journal of committed export batches, one JSON record per line.
+    A batch is only journaled once its documents are durable in S3, so the last record of a partition is a
+    position the export can safely resume from. Every record is flushed and fsynced before it is counted as
+    committed; a torn last line left by a crash is ignored when the journal is read back.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def start(self, fingerprint):
+        """
+        Start a new journal for an export, discarding any previous one
+        :param fingerprint: settings a resumed export must share with this one
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._append({"type": "start", "fingerprint": fingerprint, "time": time.time()})
+
+    def read_fingerprint(self):
+        """
+        :return: the fingerprint the journal was started with, or None when there is no journal
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, encoding="utf-8") as f:
+            try:
+                record = json.loads(f.readline())
+            except json.JSONDecodeError:
+                return None
+        return record.get("fingerprint")
+
+    def resume(self, fingerprint):
+        """
+        Reopen an existing journal to continue an interrupted export
+        :return: dict of partition name to PartitionState
+        :raises CheckpointException: when there is no journal or it was written with other settings
+        """
+        if not os.path.exists(self.path):
+            raise CheckpointException(name=self.path, reason="No export journal to resume from")
+        states = {}
+        journal_fingerprint = None
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Ignoring incomplete record in {self.path}")
+                    break
+                if record["type"] == "start":
+                    journal_fingerprint = record["fingerprint"]
+                    continue
+                state = states.setdefault(record["partition"], PartitionState(record["partition"]))
+                if record["type"] == "batch":
+                    state.cursor_mark = record["cursor_mark"]
+                    state.last_batch = max(state.last_batch, record["batch"])
+                    state.docs += record["docs"]
+                    state.batches += 1
+                    state.keys.update(record["keys"])
+                elif record["type"] == "done":
+                    state.done = True
+        if journal_fingerprint != fingerprint:
+            raise CheckpointException(name=self.path, reason="Export settings changed since the journal was written")
+        self._file = open(self.path, "a", encoding="utf-8")
+        return states
+
+    def _append(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def record_batch(self, partition, batch, cursor_mark, docs, keys):
+        self._append({"type": "batch", "partition": partition, "batch": batch, "cursor_mark": cursor_mark,
+                      "docs": docs, "keys": sorted(keys)})
+
+    def record_done(self, partition):
+        self._append({"type": "done", "partition": partition})
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class PartitionCheckpoint(object):
+    """
+    Orders the batches of one partition for the journal.
+    Batches are registered in fetch order and may be written and committed by the sink out of order; a batch
+    is journaled once it and every batch fetched before it are committed, so the journaled cursorMark never
+    skips documents that are not in S3 yet.
+    """
+
+    def __init__(self, journal, partition):
+        self._journal = journal
+        self._partition = partition
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._batches = {}
+        self._exhausted = False
+
+    def fetched(self, batch, cursor_mark=None):
+        """
+        Register a batch in fetch order
+        :param cursor_mark: the cursorMark after this batch, when already known
+        """
+        with self._lock:
+            self._pending.append(batch)
+            self._batches[batch] = {"cursor_mark": cursor_mark, "docs": None, "keys": set(), "committed": False}
+
+    def written(self, batch, docs, cursor_mark=None):
+        """
+        The batch was handed to the sink. A batch without documents needs no commit.
+        """
+        with self._lock:
+            entry = self._batches[batch]
+            entry["docs"] = docs
+            if cursor_mark is not None:
+                entry["cursor_mark"] = cursor_mark
+            self._advance()
+
+    def discard(self, batch):
+        """The batch will be fetched again and must not hold back later batches"""
+        with self._lock:
+            self._pending.remove(batch)
+            del self._batches[batch]
+            self._advance()
+
+    def committed(self, batches, key):
+        """
+        Sink callback: all documents of the given batches are durable, the last ones in object key
+        :param key: one key, or a list of keys when the batches were written to several targets
+        """
+        keys = [key] if isinstance(key, str) else key
+        with self._lock:
+            for batch in batches:
+                entry = self._batches.get(batch)
+                if entry is not None:
+                    entry["keys"].update(keys)
+                    entry["committed"] = True
+            self._advance()
+
+    def exhausted(self):
+        """The cursor of the partition reached its end"""
+        with self._lock:
+            self._exhausted = True
+
+    def _advance(self):
+        while self._pending:
+            entry = self._batches[self._pending[0]]
+            if entry["docs"] is None or entry["cursor_mark"] is None:
+                return
+            if entry["docs"] and not entry["committed"]:
+                return
+            batch = self._pending.popleft()
+            del self._batches[batch]
+            self._journal.record_batch(self._partition, batch, entry["cursor_mark"], entry["docs"], entry["keys"])
+
+    def close(self):
+        """
+        Mark the partition done when its cursor is exhausted and every batch is committed
+        :return: True when the partition is complete
+        """
+        with self._lock:
+            if self._exhausted and not self._pending:
+                self._journal.record_done(self._partition)
+                return True
+            return False
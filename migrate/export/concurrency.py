@@ -0,0 +1,229 @@
+import collections
+import threading
+import time
+from contextlib import contextmanager
+
+from config import get_custom_logger
+
+logger = get_custom_logger("migrate.export.concurrency")
+
+# responses that mean Solr is overloaded
+OVERLOAD_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class AimdController(object):
+    """
+    Limits the Solr requests of an export that are in flight at the same time, like TCP congestion control.
+    The limit grows by one after a window of responses within target_latency and is cut by backoff_factor
+    when a response is slower, fails with 429 / 5xx or does not arrive, at most once per target_latency so
+    that one slow period does not collapse it. Independently of the limit, requests are spaced to max_rps.
+    Every change of the limit is logged and kept for the data migration report.
+    """
+
+    def __init__(self, max_concurrency, min_concurrency=1, initial_concurrency=None, target_latency=1.0,
+                 backoff_factor=0.5, max_rps=0, adaptive=True, history=5000):
+        """
+        :param target_latency: seconds a Solr response may take before the limit is cut
+        :param max_rps: ceiling of requests started per second, 0 for none
+        :param adaptive: False keeps the limit at max_concurrency and only applies max_rps
+        :param history: number of limit changes kept for the report
+        """
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.min_concurrency = max(1, min(int(min_concurrency), self.max_concurrency))
+        initial = self.max_concurrency if initial_concurrency is None else int(initial_concurrency)
+        self.limit = float(max(self.min_concurrency, min(initial, self.max_concurrency)))
+        self.target_latency = float(target_latency)
+        self.backoff_factor = float(backoff_factor)
+        self.max_rps = float(max_rps)
+        self.adaptive = adaptive
+        self._condition = threading.Condition()
+        self._started = time.monotonic()
+        self._in_flight = 0
+        self._successes = 0
+        self._last_decrease = float("-inf")
+        self._next_start = 0.0
+        self.requests = 0
+        self.overloads = 0
+        self.increases = 0
+        self.decreases = 0
+        self.throttled_seconds = 0.0
+        self.initial_limit = self.peak_limit = int(self.limit)
+        self.decisions = collections.deque(maxlen=history)
+
+    @classmethod
+    def from_config(cls, data_config, workers):
+        """
+        :param workers: concurrent export requests without a controller
+        :return: the controller, or None when neither adaptive_concurrency nor solr_max_rps is set
+        """
+        adaptive = data_config.get('adaptive_concurrency', False)
+        max_rps = data_config.get('solr_max_rps', 0)
+        if not adaptive and not max_rps:
+            return None
+        controller = cls(data_config.get('solr_max_concurrency', max(1, workers)),
+                         min_concurrency=data_config.get('solr_min_concurrency', 1),
+                         initial_concurrency=data_config.get('solr_initial_concurrency'),
+                         target_latency=data_config.get('solr_target_latency_ms', 1000) / 1000,
+                         backoff_factor=data_config.get('solr_backoff_factor', 0.5),
+                         max_rps=max_rps, adaptive=adaptive)
+        logger.info(f"Limiting Solr export requests to {int(controller.limit)} in flight"
+                    f"{f' (adaptive {controller.min_concurrency}-{controller.max_concurrency})' if adaptive else ''}"
+                    f"{f' and {max_rps} per second' if max_rps else ''}")
+        return controller
+
+    def acquire(self):
+        """Wait for a free slot under the limit and for the next start allowed by max_rps"""
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                self._condition.wait()
+            self._in_flight += 1
+            self.requests += 1
+            wait = 0.0
+            if self.max_rps > 0:
+                now = time.monotonic()
+                start = max(now, self._next_start)
+                self._next_start = start + 1 / self.max_rps
+                wait = start - now
+                self.throttled_seconds += wait
+        if wait > 0:
+            time.sleep(wait)
+
+    def release(self, latency, status=200):
+        """
+        :param latency: seconds the request took
+        :param status: HTTP status of the response, None when no response arrived
+        """
+        with self._condition:
+            self._in_flight -= 1
+            overloaded = status is None or status in OVERLOAD_STATUSES
+            if overloaded:
+                self.overloads += 1
+            if self.adaptive:
+                now = time.monotonic()
+                if overloaded or latency > self.target_latency:
+                    self._successes = 0
+                    if now - self._last_decrease >= self.target_latency and self.limit > self.min_concurrency:
+                        self._last_decrease = now
+                        self.decreases += 1
+                        reason = f"status {status}" if overloaded else f"latency {latency * 1000:.0f}ms"
+                        self._change(max(self.min_concurrency, int(self.limit * self.backoff_factor)), reason,
+                                     latency)
+                else:
+                    self._successes += 1
+                    if self._successes >= int(self.limit) and self.limit < self.max_concurrency:
+                        self._successes = 0
+                        self.increases += 1
+                        self._change(self.limit + 1, f"{int(self.limit)} responses within target", latency)
+            self._condition.notify_all()
+
+    def _change(self, limit, reason, latency):
+        """Set a new limit, called with the lock held"""
+        previous, self.limit = int(self.limit), float(limit)
+        self.peak_limit = max(self.peak_limit, int(self.limit))
+        second = round(time.monotonic() - self._started, 1)
+        self.decisions.append({"second": second, "limit": int(self.limit), "in_flight": self._in_flight,
+                               "latency_ms": round(latency * 1000, 1), "reason": reason})
+        logger.info(f"Solr concurrency {previous} -> {int(self.limit)}: {reason}")
+
+    @contextmanager
+    def request(self):
+        """
+        Context manager around one Solr request; set status on the yielded object once the response arrived
+        """
+        self.acquire()
+        outcome = _Outcome()
+        started = time.monotonic()
+        try:
+            yield outcome
+        except Exception:
+            # the status is set when the error is an HTTP error response
+            self.release(time.monotonic() - started, outcome.status)
+            raise
+        self.release(time.monotonic() - started, outcome.status or 200)
+
+    def stats(self):
+        with self._condition:
+            return {
+                "limit": int(self.limit),
+                "initial_limit": self.initial_limit,
+                "peak_limit": self.peak_limit,
+                "min_concurrency": self.min_concurrency,
+                "max_concurrency": self.max_concurrency,
+                "max_rps": self.max_rps,
+                "requests": self.requests,
+                "overloads": self.overloads,
+                "increases": self.increases,
+                "decreases": self.decreases,
+                "throttled_seconds": round(self.throttled_seconds, 2),
+                "decisions": list(self.decisions)
+            }
+
+
+class RequestBudget(object):
+    """
+    Limit on the requests in flight to one service, shared by every migration running in the process, such as
+    all Solr requests or all S3 PUTs of a multi-collection run. request() makes it usable as a SolrClient
+    request budget.
+    """
+
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = max(1, int(limit))
+        self._slots = threading.BoundedSemaphore(self.limit)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.waited_seconds = 0.0
+
+    @contextmanager
+    def request(self):
+        """Context manager around one request, waiting for a free slot"""
+        started = time.monotonic()
+        self._slots.acquire()
+        with self._lock:
+            self.waited_seconds += time.monotonic() - started
+            self.requests += 1
+            self._in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self._in_flight)
+        try:
+            yield _Outcome()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "name": self.name,
+                "limit": self.limit,
+                "requests": self.requests,
+                "peak_in_flight": self.peak_in_flight,
+                "waited_seconds": round(self.waited_seconds, 2)
+            }
+
+
+class BudgetedClient(object):
+    """Proxy for a boto3 client that takes a slot of a RequestBudget for every API call"""
+
+    def __init__(self, client, budget):
+        self._client = client
+        self._budget = budget
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            with self._budget.request():
+                return attribute(*args, **kwargs)
+        return call
+
+
+class _Outcome(object):
+    __slots__ = ("status",)
+
+    def __init__(self):
+        self.status = None
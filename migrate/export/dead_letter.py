@@ -0,0 +1,61 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+from config import get_custom_logger
+
+logger = get_custom_logger("migrate.export.dead_letter")
+
+
+class DeadLetterStore(object):
+    """
+    Local JSON lines file of documents an export could not read, with their uniqueKey, the cursorMark of
+    their batch, the error and the raw Solr response. The documents are exported again by a replay
+    once the cause is fixed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def add(self, doc_id, batch_count, cursor_mark, error, raw):
+        record = {
+            "id": doc_id,
+            "batch": batch_count,
+            "cursor_mark": cursor_mark,
+            "error": str(error),
+            "raw": raw,
+            "time": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        }
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+            self.count += 1
+        logger.warning(f"Dead-lettered document {doc_id} of batch {batch_count} to {self.path}: {error}")
+
+    def read(self):
+        """
+        :return: list of dead-letter records, empty when the file does not exist
+        """
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def rewrite(self, records):
+        """Replace the file with the records that are still not exported, removing it when none are left"""
+        with self._lock:
+            if not records:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                self.count = 0
+                return
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+            os.replace(temp_path, self.path)
+            self.count = len(records)
@@ -0,0 +1,62 @@
+import json
+import os
+import time
+
+from config import get_custom_logger
+from migrate.export.partition_helper import _quote
+
+logger = get_custom_logger("migrate.export.delta")
+
+
+class DeltaWatermark(object):
+    """
+    High-watermark of the last complete export: the largest value of the delta field when that export started.
+    Stored as a small JSON file next to the export journal.
+    """
+
+    def __init__(self, path, field):
+        self.path = path
+        self.field = field
+
+    def load(self):
+        """
+        :return: the stored watermark, or None when there is none for this field
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, encoding="utf-8") as f:
+            stored = json.load(f)
+        if stored.get("field") != self.field:
+            logger.warning(f"Ignoring watermark of field {stored.get('field')} in {self.path}, "
+                           f"delta field is {self.field}")
+            return None
+        return stored.get("watermark")
+
+    def save(self, value):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"field": self.field, "watermark": value, "time": time.time()}, f)
+        os.replace(temp_path, self.path)
+
+
+def open_delta_window(field, lower, upper, s3_prefix):
+    """
+    Describe the documents one delta run exports: delta field values in (lower, upper].
+    A run without a lower watermark is the base load and exports everything under s3_prefix; every later run
+    writes below its own delta_<time>/ prefix so its objects never replace objects of an earlier run.
+    :return: dict that is stored in the export journal so a resumed run uses the same window
+    """
+    if lower is not None:
+        s3_prefix = f"{s3_prefix}delta_{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}/"
+    return {"field": field, "lower": lower, "upper": upper, "s3_export_prefix": s3_prefix}
+
+
+def delta_filter_query(window):
+    """
+    :return: the range fq of a delta window, or None for the base load
+    """
+    if window is None or window["lower"] is None:
+        return None
+    upper = _quote(window["upper"]) if window["upper"] is not None else "*"
+    return f'{window["field"]}:{{{_quote(window["lower"])} TO {upper}]'
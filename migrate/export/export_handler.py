@@ -0,0 +1,159 @@
+from config import get_custom_logger
+from migrate.export.partition_helper import _quote
+from migrate.export.projection import SOLR_INTERNAL_FIELDS
+
+logger = get_custom_logger("migrate.export.export_handler")
+
+EXPORT_ENGINES = ("select", "export", "stream")
+
+# field type classes that have docValues by default from schema version 1.6 on
+DOCVALUES_CLASSES = frozenset({
+    "StrField", "BoolField", "EnumFieldType", "EnumField",
+    "IntPointField", "LongPointField", "FloatPointField", "DoublePointField", "DatePointField",
+    "TrieIntField", "TrieLongField", "TrieFloatField", "TrieDoubleField", "TrieDateField",
+})
+
+
+class ExportHandlerException(Exception):
+    def __init__(self, name, reason=None):
+        self.name = name
+        self.reason = reason
+
+    def __str__(self):
+        return f"{self.reason}: {self.name}"
+
+
+class ExportFieldPlan(object):
+    """
+    Decides per field whether it is read through the /export handler or through /select.
+    /export streams sorted docValues and never loads stored fields, so it can only return fields with
+    docValues; stored-only fields and dynamic fields are filled in by a secondary /select of the exported ids.
+    The docValues of a multiValued field are sorted and de-duplicated, so stored multiValued fields are read
+    through /select as well to keep the order and repeats of their values.
+    """
+
+    def __init__(self, schema, unique_key, fields=None):
+        """
+        :param schema: schema from SolrClient.read_schema()
+        :param fields: optional field names and patterns to export, e.g. FieldProjection.fields
+        """
+        self.unique_key = unique_key
+        version = float(schema.get("version", 1.6))
+        field_types = {field_type["name"]: field_type for field_type in schema.get("fieldTypes", [])}
+        wanted = {field for field in fields if "*" not in field} if fields else None
+
+        self.export_fields = []
+        self.select_fields = []
+        for field in schema.get("fields", []):
+            name = field["name"]
+            if name in SOLR_INTERNAL_FIELDS or (wanted is not None and name not in wanted):
+                continue
+            field_type = field_types.get(field.get("type"), {})
+            type_class = field_type.get("class", "").rsplit(".", 1)[-1]
+            docvalues = field.get("docValues", field_type.get("docValues",
+                                                              version >= 1.6 and type_class in DOCVALUES_CLASSES))
+            stored = field.get("stored", field_type.get("stored", True))
+            multi_valued = field.get("multiValued", field_type.get("multiValued", False))
+            if docvalues and not (multi_valued and stored and name != unique_key):
+                self.export_fields.append(name)
+            elif stored:
+                self.select_fields.append(name)
+
+        if fields:
+            patterns = [field for field in fields if "*" in field]
+        else:
+            patterns = [field["name"] for field in schema.get("dynamicFields", []) if field.get("stored", True)]
+        self.select_fields.extend(patterns)
+
+    @property
+    def usable(self):
+        """The /export handler sorts on the uniqueKey, which needs docValues"""
+        return self.unique_key in self.export_fields
+
+    @property
+    def export_fl(self):
+        return ",".join(self.export_fields)
+
+    @property
+    def select_fl(self):
+        """fl of the secondary fetch, or None when every field comes from /export"""
+        if not self.select_fields:
+            return None
+        return ",".join([self.unique_key] + self.select_fields)
+
+    @classmethod
+    def from_config(cls, data_config, schema, unique_key, projection=None):
+        """
+        :return: the plan, or None when documents are exported through /select with cursorMark paging
+        :raises ExportHandlerException: when export_engine is unknown
+        """
+        engine = data_config.get('export_engine', 'select')
+        if engine not in EXPORT_ENGINES:
+            raise ExportHandlerException(name=engine, reason=f"export_engine must be one of {EXPORT_ENGINES}")
+        if engine == 'select':
+            return None
+        plan = cls(schema, unique_key, projection.fields if projection is not None else None)
+        if not plan.usable:
+            logger.warning(f"uniqueKey {unique_key} has no docValues, exporting through /select instead of /export")
+            return None
+        logger.info(f"Exporting {len(plan.export_fields)} docValues fields through /{engine}, "
+                    f"{len(plan.select_fields)} stored fields through /select: {plan.select_fields}")
+        return plan
+
+
+def resume_filter_query(unique_key, last_key):
+    """
+    :return: fq of the documents after the last exported uniqueKey, or None to start from the beginning
+    """
+    if last_key is None or last_key == "*":
+        return None
+    return f"{unique_key}:{{{_quote(last_key)} TO *]"
+
+
+def _expression_value(value):
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def parallel_search_expression(collection, plan, filter_queries, workers):
+    """
+    Build a streaming expression that splits the export over workers by hash of the uniqueKey and merges
+    their sorted streams again, so documents still arrive in uniqueKey order.
+    """
+    sort = f"{plan.unique_key} asc"
+    arguments = [collection, 'q="*:*"', f"fl={_expression_value(plan.export_fl)}", f'sort="{sort}"', 'qt="/export"']
+    arguments.extend(f"fq={_expression_value(filter_query)}" for filter_query in filter_queries)
+    search = f"search({', '.join(arguments)}, partitionKeys={plan.unique_key})"
+    if workers <= 1:
+        return search
+    return f'parallel({collection}, {search}, workers={workers}, sort="{sort}")'
+
+
+def export_batches(docs, batch_size):
+    """
+    Group a stream of exported documents into batches, dropping the EOF tuple of streaming expressions
+    :raises ExportHandlerException: when the stream reports an exception
+    """
+    batch = []
+    for doc in docs:
+        if "EXCEPTION" in doc:
+            raise ExportHandlerException(name=doc["EXCEPTION"], reason="Export stream failed")
+        if doc.get("EOF"):
+            break
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def merge_stored_fields(docs, stored_docs, unique_key):
+    """
+    Copy the fields of the secondary /select documents into the exported documents with the same uniqueKey
+    """
+    by_key = {doc[unique_key]: doc for doc in stored_docs}
+    for doc in docs:
+        stored = by_key.get(doc[unique_key])
+        if stored is not None:
+            doc.update(stored)
+    return docs
@@ -0,0 +1,68 @@
+from config import get_custom_logger
+
+logger = get_custom_logger("migrate.export.id_diff")
+
+MISSING = "missing"
+EXTRA = "extra"
+
+
+class IdDiffException(Exception):
+    def __init__(self, name, reason=None):
+        self.name = name
+        self.reason = reason
+
+    def __str__(self):
+        return f"{self.reason}: {self.name}"
+
+
+def _ascending(ids, side):
+    previous = None
+    for doc_id in ids:
+        if previous is not None and doc_id <= previous:
+            raise IdDiffException(name=f"{previous!r} before {doc_id!r}",
+                                  reason=f"Ids of the {side} are not in ascending string order")
+        previous = doc_id
+        yield doc_id
+
+
+def merge_sorted_ids(source_ids, target_ids):
+    """
+    Merge two streams of ids, each sorted in ascending string order, in constant memory
+    :param source_ids: ids that should be in the target, from Solr
+    :param target_ids: ids of the target index
+    :return: generator of (MISSING, id) for ids only in the source and (EXTRA, id) for ids only in the target
+    :raises IdDiffException: when a stream is not in strictly ascending order, for example a numeric uniqueKey
+    """
+    source = _ascending(source_ids, "source")
+    target = _ascending(target_ids, "target")
+    source_id = next(source, None)
+    target_id = next(target, None)
+    while source_id is not None or target_id is not None:
+        if target_id is None or (source_id is not None and source_id < target_id):
+            yield MISSING, source_id
+            source_id = next(source, None)
+        elif source_id is None or target_id < source_id:
+            yield EXTRA, target_id
+            target_id = next(target, None)
+        else:
+            source_id = next(source, None)
+            target_id = next(target, None)
+
+
+def read_id_chunks(path, chunk_size):
+    """
+    Read a file with one id per line in chunks, without loading the whole file
+    :return: generator of lists of at most chunk_size ids
+    """
+    chunk = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            doc_id = line.rstrip("\r\n")
+            if not doc_id:
+                continue
+            chunk.append(doc_id)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,150 @@
+import threading
+
+from config import get_custom_logger
+from migrate.export.export_handler import DOCVALUES_CLASSES
+
+logger = get_custom_logger("migrate.export.nested")
+
+# field type FieldHelper maps to an OpenSearch nested field
+NEST_PATH_CLASS = "NestPathField"
+# children returned per parent by the [child] transformer unless its limit is raised
+CHILD_TRANSFORMER_LIMIT = 10
+# the [child] transformer without a limit, used when children cannot be fetched in bulk
+CHILD_TRANSFORMER = "[child limit=-1]"
+
+
+def nest_path_field(schema):
+    """
+    :return: name of the field holding the nest path of child documents, or None for a collection without
+             nested documents
+    """
+    nest_path_types = {field_type["name"] for field_type in schema.get("fieldTypes", [])
+                       if field_type.get("class", "").endswith(NEST_PATH_CLASS)}
+    for field in schema.get("fields", []):
+        if field.get("type") in nest_path_types:
+            return field["name"]
+    return None
+
+
+def readable_field(schema, name):
+    """
+    :return: True when Solr can return the field, because it is stored or has docValues
+    """
+    version = float(schema.get("version", 1.6))
+    field_types = {field_type["name"]: field_type for field_type in schema.get("fieldTypes", [])}
+    for field in schema.get("fields", []):
+        if field["name"] != name:
+            continue
+        field_type = field_types.get(field.get("type"), {})
+        type_class = field_type.get("class", "").rsplit(".", 1)[-1]
+        stored = field.get("stored", field_type.get("stored", True))
+        docvalues = field.get("docValues", field_type.get("docValues",
+                                                          version >= 1.6 and type_class in DOCVALUES_CLASSES))
+        return bool(stored or docvalues)
+    return False
+
+
+def _parse_nest_path(path):
+    """
+    Split a nest path such as /comments#0/replies#1 into (field, index) steps; index is None for a single child
+    """
+    steps = []
+    for step in path.strip("/").split("/"):
+        name, _, index = step.partition("#")
+        steps.append((name, int(index) if index else None))
+    return steps
+
+
+class NestedStats(object):
+    """Thread safe child document counters shared by all partitions of one export"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.parents = 0
+        self.children = 0
+        self.max_children = 0
+        self.wide_parents = 0
+        self.orphans = 0
+
+    def add(self, child_counts, orphans=0):
+        """
+        :param child_counts: number of child documents, at any depth, of each parent of a page
+        """
+        with self._lock:
+            self.parents += len(child_counts)
+            self.children += sum(child_counts)
+            self.max_children = max([self.max_children] + list(child_counts))
+            self.wide_parents += sum(1 for count in child_counts if count > CHILD_TRANSFORMER_LIMIT)
+            self.orphans += orphans
+
+
+class ChildStitcher(object):
+    """
+    Attaches child documents fetched in bulk to their parents.
+    The children of a page of parents are read with one query on the root field instead of the [child]
+    transformer, which looks up the children of every parent separately and returns at most 10 of them by
+    default. Each child is joined to its parent, or to an intermediate child, by its nest path.
+    """
+
+    def __init__(self, unique_key, nest_path="_nest_path_", root_field="_root_"):
+        self.unique_key = unique_key
+        self.nest_path = nest_path
+        self.root_field = root_field
+
+    @property
+    def parent_filter_query(self):
+        return f"-{self.nest_path}:*"
+
+    @property
+    def child_filter_query(self):
+        return f"{self.nest_path}:*"
+
+    def stitch(self, parents, children):
+        """
+        Attach children to the parents in place, in nest path order
+        :return: tuple of (number of children of each parent, number of children without a parent in the page)
+        """
+        counts = {parent[self.unique_key]: 0 for parent in parents}
+        nodes = {(parent[self.unique_key], ""): parent for parent in parents}
+        orphans = 0
+        steps = [(_parse_nest_path(child.get(self.nest_path, "")), child) for child in children]
+        # parents before their children, siblings by index
+        steps.sort(key=lambda item: (len(item[0]), [(name, -1 if index is None else index)
+                                                    for name, index in item[0]]))
+        for path, child in steps:
+            root = child.get(self.root_field)
+            holder = nodes.get((root, self._path_key(path[:-1])))
+            if holder is None:
+                orphans += 1
+                continue
+            name, index = path[-1]
+            if index is None:
+                holder[name] = child
+            else:
+                holder.setdefault(name, []).append(child)
+            nodes[(root, self._path_key(path))] = child
+            counts[root] += 1
+        return list(counts.values()), orphans
+
+    @staticmethod
+    def _path_key(path):
+        return "/".join(f"{name}#{'' if index is None else index}" for name, index in path)
+
+    @classmethod
+    def from_config(cls, data_config, schema, unique_key):
+        """
+        :return: the stitcher, or None when children are exported with the [child] transformer or the
+                 collection has no nested documents
+        """
+        if data_config.get('nested_engine', 'bulk') != 'bulk':
+            return None
+        nest_path = nest_path_field(schema)
+        if nest_path is None:
+            return None
+        # children are joined to their parents on _root_, which Solr only returns when stored or with docValues
+        if not readable_field(schema, "_root_"):
+            logger.warning(f"_root_ is neither stored nor has docValues, exporting child documents with the "
+                           f"{CHILD_TRANSFORMER} transformer instead of in bulk")
+            return None
+        logger.info(f"Exporting child documents in bulk by {nest_path} instead of the [child] transformer")
+        return cls(unique_key, nest_path)
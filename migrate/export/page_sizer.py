@@ -0,0 +1,64 @@
+from config import get_custom_logger
+
+logger = get_custom_logger("migrate.export.page_sizer")
+
+
+class AdaptivePageSizer(object):
+    """
+    Chooses the rows of the next cursor page from the bytes per document and the seconds per document of the
+    pages fetched so far, so that a page stays close to target_bytes and below max_seconds.
+    The page size moves by at most a factor of two per page and stays within min_rows and max_rows.
+    With min_rows equal to max_rows the page size is fixed and only the statistics are logged.
+    """
+
+    # weight of the latest page in the running per document estimates
+    SMOOTHING = 0.5
+
+    def __init__(self, rows, min_rows=None, max_rows=None, target_bytes=4 * 1024 * 1024, max_seconds=30):
+        self.min_rows = int(min_rows if min_rows is not None else rows)
+        self.max_rows = int(max_rows if max_rows is not None else rows)
+        self.rows = max(self.min_rows, min(self.max_rows, int(rows)))
+        self._target_bytes = target_bytes
+        self._max_seconds = max_seconds
+        self._bytes_per_doc = None
+        self._seconds_per_doc = None
+
+    @classmethod
+    def from_config(cls, data_config):
+        rows = data_config.get('rows_per_page', 500)
+        if not data_config.get('adaptive_page_size', False):
+            return cls(rows)
+        return cls(
+            rows,
+            min_rows=data_config.get('min_rows_per_page', 50),
+            max_rows=data_config.get('max_rows_per_page', 10000),
+            target_bytes=data_config.get('target_page_bytes', 4 * 1024 * 1024),
+            max_seconds=data_config.get('max_page_seconds', 30)
+        )
+
+    def _smooth(self, estimate, value):
+        if estimate is None:
+            return value
+        return self.SMOOTHING * value + (1 - self.SMOOTHING) * estimate
+
+    def observe(self, batch_count, docs, response_bytes, seconds):
+        """
+        Record a fetched page and choose the rows of the next page
+        :param response_bytes: size of the page response body
+        :param seconds: time taken to fetch the page
+        :return: rows of the next page
+        """
+        rows = self.rows
+        if docs > 0:
+            self._bytes_per_doc = self._smooth(self._bytes_per_doc, response_bytes / docs)
+            self._seconds_per_doc = self._smooth(self._seconds_per_doc, seconds / docs)
+            desired = self._target_bytes / max(self._bytes_per_doc, 1)
+            if self._seconds_per_doc > 0:
+                desired = min(desired, self._max_seconds / self._seconds_per_doc)
+            desired = max(rows / 2, min(rows * 2, desired))
+            self.rows = int(max(self.min_rows, min(self.max_rows, desired)))
+        logger.info(f"Batch {batch_count}: {docs} documents of {rows} rows, {response_bytes / 1024:.0f} KiB in "
+                    f"{seconds:.2f}s ({docs / seconds if seconds > 0 else 0:.0f} docs/s, "
+                    f"{response_bytes / (1024 * 1024) / seconds if seconds > 0 else 0:.2f} MiB/s), "
+                    f"next page {self.rows} rows")
+        return self.rows
@@ -0,0 +1,194 @@
+import threading
+from collections import deque
+
+from config import get_custom_logger
+
+logger = get_custom_logger("migrate.export.partition")
+
+
+class PartitionException(Exception):
+    def __init__(self, name, reason=None):
+        self.name = name
+        self.reason = reason
+
+    def __str__(self):
+        return f"{self.reason}: {self.name}"
+
+
+class ExportPartition(object):
+    """A disjoint slice of the collection, exported with its own cursor"""
+
+    def __init__(self, name, filter_query=None, core_url=None):
+        """
+        :param core_url: core of a shard replica the partition is read from with distrib=false, instead of the
+                         collection
+        """
+        self.name = name
+        self.filter_query = filter_query
+        self.core_url = core_url
+
+    def __repr__(self):
+        return f"ExportPartition({self.name!r}, {self.filter_query!r})"
+
+
+def _quote(value):
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def uncached_query(query):
+    """
+    Add cache=false to the local params of a query, so Solr keeps it out of filterCache and queryResultCache
+    """
+    if query.startswith("{!"):
+        end = query.index("}")
+        if "cache=" in query[:end]:
+            return query
+        return f"{query[:end]} cache=false{query[end:]}"
+    return "{!cache=false}" + query
+
+
+def uncached_params(params):
+    """
+    :return: copy of the request parameters with q and every fq marked cache=false
+    """
+    params = dict(params)
+    if params.get('q'):
+        params['q'] = uncached_query(params['q'])
+    if isinstance(params.get('fq'), str):
+        params['fq'] = uncached_query(params['fq'])
+    elif params.get('fq'):
+        params['fq'] = [uncached_query(fq) for fq in params['fq']]
+    return params
+
+
+def build_partitions(data_config, unique_key="id"):
+    """
+    Split the uniqueKey space into disjoint fq slices.
+    hash: `export_partitions` slices using Solr's hash query parser on the uniqueKey
+    range: one slice per interval between the sorted `partition_boundaries`
+    :param data_config: the [data_migration] configuration
+    :param unique_key: the uniqueKey field of the collection
+    :return: list of ExportPartition
+    """
+    mode = data_config.get('partition_mode', 'hash')
+    if mode == 'hash':
+        count = int(data_config.get('export_partitions', 1))
+        if count <= 1:
+            return [ExportPartition("all")]
+        return [
+            ExportPartition(f"hash_{i}", f"{{!hash workers={count} worker={i} partitionKeys={unique_key}}}")
+            for i in range(count)
+        ]
+    if mode == 'range':
+        boundaries = sorted(data_config.get('partition_boundaries', []))
+        if not boundaries:
+            return [ExportPartition("all")]
+        edges = ["*"] + [_quote(b) for b in boundaries] + ["*"]
+        partitions = []
+        for i in range(len(edges) - 1):
+            closing = "]" if i == len(edges) - 2 else "}"
+            partitions.append(ExportPartition(f"range_{i}", f"{unique_key}:[{edges[i]} TO {edges[i + 1]}{closing}"))
+        return partitions
+    raise PartitionException(name=mode, reason="UnknownPartitionMode")
+
+
+class ExportProgress(object):
+    """Thread safe document and batch counters shared by all partitions of one export"""
+
+    def __init__(self, limit=None, exported_docs=0, batch_count=0):
+        """
+        :param exported_docs: documents already exported by an interrupted run that is resumed
+        :param batch_count: last batch number used by an interrupted run that is resumed
+        """
+        self._limit = limit
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.exported_docs = exported_docs
+        self.batch_count = batch_count
+
+    def next_batch(self):
+        with self._lock:
+            self.batch_count += 1
+            return self.batch_count
+
+    def add_exported(self, docs):
+        with self._lock:
+            self.exported_docs += docs
+
+    def limit_reached(self):
+        if self._limit is None:
+            return False
+        with self._lock:
+            return self.exported_docs >= self._limit
+
+    def stop(self):
+        """Stop fetching new pages; pages already fetched are still written"""
+        self._stopped.set()
+
+    @property
+    def stopped(self):
+        return self._stopped.is_set()
+
+    def wait(self, timeout):
+        """Sleep up to timeout seconds, returning True early once stopped"""
+        return self._stopped.wait(timeout)
+
+    def should_stop(self):
+        return self.stopped or self.limit_reached()
+
+
+class WorkStealingPool(object):
+    """
+    Runs work items on a fixed number of worker threads.
+    Items are dealt round robin into one deque per worker; a worker takes from the front of its own
+    deque and, once empty, steals from the back of the longest peer deque so that a few large
+    partitions do not leave the remaining workers idle. Stealing only helps when there are more items than
+    workers.
+    """
+
+    def __init__(self, workers):
+        self._workers = max(1, int(workers))
+        self._lock = threading.Lock()
+        self._deques = []
+        self.errors = []
+
+    def _take(self, worker):
+        with self._lock:
+            own = self._deques[worker]
+            if own:
+                return own.popleft()
+            victim = max(self._deques, key=len)
+            if victim:
+                logger.debug("Worker %s stealing work", worker)
+                return victim.pop()
+            return None
+
+    def _work(self, worker, func):
+        while True:
+            item = self._take(worker)
+            if item is None:
+                return
+            try:
+                func(item)
+            except Exception as e:
+                logger.error("Worker %s failed on %s: %s", worker, item, e)
+                with self._lock:
+                    self.errors.append((item, e))
+
+    def run(self, items, func):
+        """
+        Call func for every item and block until all items are done
+        :return: list of (item, exception) for the items that raised
+        """
+        workers = min(self._workers, len(items)) or 1
+        self._deques = [deque() for _ in range(workers)]
+        for i, item in enumerate(items):
+            self._deques[i % workers].append(item)
+
+        threads = [threading.Thread(target=self._work, args=(w, func), name=f"export-worker-{w}", daemon=True)
+                   for w in range(workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return self.errors
@@ -0,0 +1,170 @@
+import json
+import queue
+import threading
+import time
+
+from config import get_custom_logger
+
+logger = get_custom_logger("migrate.export.pipeline")
+
+_END = object()
+
+
+def extract_next_cursor_mark(response_text):
+    """
+    Read nextCursorMark from a raw Solr JSON response without parsing the documents.
+    Solr writes nextCursorMark after the response block, so only the tail of the text is scanned
+    :return: the cursor mark or None if it is not present
+    """
+    position = response_text.rfind('"nextCursorMark"')
+    if position < 0:
+        return None
+    position = response_text.index(':', position) + 1
+    while response_text[position] in ' \t\r\n':
+        position += 1
+    try:
+        value, _ = json.JSONDecoder().raw_decode(response_text, position)
+    except ValueError:
+        return None
+    return value if isinstance(value, str) else None
+
+
+class PipelineStage(object):
+    """A named step of the pipeline and the time its workers spent working and waiting"""
+
+    def __init__(self, name, func, workers=1, discard=None):
+        """
+        :param discard: optional callable(item) for items dropped unprocessed once the pipeline stopped
+        """
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self.discard = discard
+        self.items = 0
+        self.busy_seconds = 0.0
+        self.idle_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _account(self, busy, idle, items=0):
+        with self._lock:
+            self.busy_seconds += busy
+            self.idle_seconds += idle
+            self.items += items
+
+    def stats(self):
+        return {
+            "stage": self.name,
+            "items": self.items,
+            "busy_seconds": self.busy_seconds,
+            "idle_seconds": self.idle_seconds
+        }
+
+
+class ExportPipeline(object):
+    """
+    Runs a source generator and a chain of stages on separate threads connected by bounded queues,
+    so that fetching the next page overlaps with parsing and uploading the previous ones.
+    A stage returning None drops the item. The first error stops the source and is returned by run().
+    """
+
+    def __init__(self, source_name, source, stages, queue_depths):
+        self._source = PipelineStage(source_name, source)
+        self._stages = stages
+        self._queues = [queue.Queue(maxsize=max(1, int(d))) for d in queue_depths]
+        if len(self._queues) != len(stages):
+            raise ValueError("One queue depth is needed per stage")
+        self._stop = threading.Event()
+        self._errors = []
+        self._errors_lock = threading.Lock()
+
+    @property
+    def stages(self):
+        return [self._source] + self._stages
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    def _fail(self, stage, error):
+        logger.error("Pipeline stage %s failed: %s", stage.name, error)
+        with self._errors_lock:
+            self._errors.append((stage.name, error))
+        self._stop.set()
+
+    def _put(self, stage, out_queue, item):
+        started = time.monotonic()
+        out_queue.put(item)
+        stage._account(0.0, time.monotonic() - started)
+
+    def _send_end(self, index):
+        if index < len(self._stages):
+            for _ in range(self._stages[index].workers):
+                self._queues[index].put(_END)
+
+    def _run_source(self):
+        stage = self._source
+        out_queue = self._queues[0]
+        iterator = iter(stage.func())
+        try:
+            while not self._stop.is_set():
+                started = time.monotonic()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                stage._account(time.monotonic() - started, 0.0, 1)
+                self._put(stage, out_queue, item)
+        except Exception as e:
+            self._fail(stage, e)
+        finally:
+            self._send_end(0)
+
+    def _run_stage(self, index, remaining):
+        stage = self._stages[index]
+        in_queue = self._queues[index]
+        out_queue = self._queues[index + 1] if index + 1 < len(self._queues) else None
+        while True:
+            started = time.monotonic()
+            item = in_queue.get()
+            stage._account(0.0, time.monotonic() - started)
+            if item is _END:
+                break
+            if self._stop.is_set():
+                # keep draining so upstream producers never block on a full queue
+                if stage.discard is not None:
+                    stage.discard(item)
+                continue
+            started = time.monotonic()
+            try:
+                result = stage.func(item)
+            except Exception as e:
+                self._fail(stage, e)
+                continue
+            stage._account(time.monotonic() - started, 0.0, 1)
+            if out_queue is not None and result is not None:
+                self._put(stage, out_queue, result)
+        with remaining[index][1]:
+            remaining[index][0] -= 1
+            last = remaining[index][0] == 0
+        if last:
+            self._send_end(index + 1)
+
+    def run(self):
+        """
+        Run all stages to completion
+        :return: list of (stage name, exception)
+        """
+        remaining = [[stage.workers, threading.Lock()] for stage in self._stages]
+        threads = [threading.Thread(target=self._run_source, name=f"pipeline-{self._source.name}", daemon=True)]
+        for index, stage in enumerate(self._stages):
+            for worker in range(stage.workers):
+                threads.append(threading.Thread(target=self._run_stage, args=(index, remaining),
+                                                name=f"pipeline-{stage.name}-{worker}", daemon=True))
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for stage in self.stages:
+            logger.info("Pipeline stage %s: %s items, busy %.2fs, idle %.2fs",
+                        stage.name, stage.items, stage.busy_seconds, stage.idle_seconds)
+        return self._errors
@@ -0,0 +1,78 @@
+from config import get_custom_logger
+
+logger = get_custom_logger("migrate.export.projection")
+
+# bookkeeping fields Solr adds to documents, never indexed into OpenSearch
+SOLR_INTERNAL_FIELDS = frozenset({"_version_", "_root_", "_nest_path_", "_nest_parent_"})
+DEFAULT_FIELD_LIST = "*,[child limit=-1]"
+
+
+class FieldProjection(object):
+    """
+    Limits the exported fields to the ones the generated OpenSearch mapping knows about.
+    The Solr fl parameter is built from the mapped properties and the dynamic template patterns, so unmapped
+    fields and fields that failed to map are not read from Solr at all. Each document is then pruned of
+    Solr-internal fields, also in nested child documents, and fields are renamed before serialization.
+    """
+
+    def __init__(self, index_json, unique_key, rename_fields=None):
+        """
+        :param index_json: index definition from OpenSearchClient.get_index_json(); an empty mapping exports all
+                           fields and only prunes internal fields
+        :param rename_fields: optional dict of Solr field name to exported field name
+        """
+        mappings = index_json.get("mappings", {})
+        self._rename = dict(rename_fields or {})
+        fields = set(mappings.get("properties", {}))
+        patterns = set()
+        for template in mappings.get("dynamic_templates", []):
+            for definition in template.values():
+                if "match" in definition:
+                    patterns.add(definition["match"])
+        fields -= SOLR_INTERNAL_FIELDS
+        if fields or patterns:
+            self.fields = sorted(fields | {unique_key}) + sorted(patterns)
+            self.field_list = ",".join(self.fields + ["[child limit=-1]"])
+            self.flat_field_list = ",".join(self.fields)
+        else:
+            logger.warning("No mapped fields, exporting all stored fields")
+            self.fields = []
+            self.field_list = DEFAULT_FIELD_LIST
+            self.flat_field_list = "*"
+
+    @classmethod
+    def from_config(cls, data_config, index_json, unique_key):
+        """
+        :return: the projection, or None when field_projection is disabled
+        """
+        if not data_config.get('field_projection', False):
+            return None
+        projection = cls(index_json, unique_key, data_config.get('rename_fields'))
+        logger.info(f"Exporting {len(projection.fields) or 'all'} fields: {projection.field_list}")
+        return projection
+
+    def target_name(self, field):
+        """Name of a Solr field in the exported documents"""
+        return self._rename.get(field, field)
+
+    def apply(self, doc):
+        """
+        Prune internal fields and rename fields of a document and its child documents, in place
+        :return: the document
+        """
+        for field in SOLR_INTERNAL_FIELDS.intersection(doc):
+            del doc[field]
+        for field in self._rename.keys() & doc.keys():
+            doc[self._rename[field]] = doc.pop(field)
+        for value in doc.values():
+            if isinstance(value, dict):
+                self.apply(value)
+            elif isinstance(value, list) and value and isinstance(value[0], dict):
+                for child in value:
+                    self.apply(child)
+        return doc
+
+    def apply_all(self, docs):
+        """Lazily apply the projection to an iterable of documents"""
+        for doc in docs:
+            yield self.apply(doc)
@@ -0,0 +1,97 @@
+import hashlib
+import json
+
+from config import get_custom_logger
+
+logger = get_custom_logger("migrate.export.reconcile")
+
+CHECKSUM_MODULUS = 2 ** 64
+
+
+class ReconcileException(Exception):
+    def __init__(self, name, reason=None):
+        self.name = name
+        self.reason = reason
+
+    def __str__(self):
+        return f"{self.reason}: {self.name}"
+
+
+def id_bucket(doc_id, bits):
+    """
+    :return: leaf bucket of a uniqueKey, the top bits of its hash so that both sides agree without sorting
+    """
+    digest = hashlib.blake2b(str(doc_id).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> (64 - bits)
+
+
+def document_digest(doc_id, doc):
+    """
+    :return: 64 bit hash of the uniqueKey and the canonical JSON of the document, independent of field order
+    """
+    canonical = json.dumps(doc, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    digest = hashlib.blake2b(f"{doc_id}\x1f{canonical}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class BucketChecksums(object):
+    """
+    Document count and order independent checksum per leaf bucket of the uniqueKey hash space.
+    The checksum of a bucket is the sum of the digests of its documents modulo 2^64, so a bucket, or any
+    range of buckets, has the same checksum whatever order its documents were read in, and the checksums
+    of partitions read in parallel are merged by adding them.
+    """
+
+    def __init__(self, bits=12):
+        """
+        :param bits: log2 of the number of leaf buckets
+        """
+        self.bits = bits
+        self.counts = [0] * (1 << bits)
+        self.checksums = [0] * (1 << bits)
+
+    def add(self, doc_id, doc):
+        bucket = id_bucket(doc_id, self.bits)
+        self.counts[bucket] += 1
+        self.checksums[bucket] = (self.checksums[bucket] + document_digest(doc_id, doc)) % CHECKSUM_MODULUS
+
+    def merge(self, other):
+        for bucket, (count, checksum) in enumerate(zip(other.counts, other.checksums)):
+            self.counts[bucket] += count
+            self.checksums[bucket] = (self.checksums[bucket] + checksum) % CHECKSUM_MODULUS
+
+    def range(self, start, end):
+        """
+        :return: (count, checksum) of the leaf buckets start to end, end excluded
+        """
+        return sum(self.counts[start:end]), sum(self.checksums[start:end]) % CHECKSUM_MODULUS
+
+    @property
+    def total(self):
+        return sum(self.counts)
+
+
+def diff_buckets(source, target, fanout=16):
+    """
+    Compare two BucketChecksums like a Merkle tree: starting with the whole hash space, only ranges of
+    buckets whose count or checksum differ are split into fanout sub-ranges, down to the leaf buckets.
+    :return: (list of differing leaf buckets with the document counts of both sides, number of compared ranges)
+    """
+    if source.bits != target.bits:
+        raise ValueError(f"Cannot compare {source.bits} bit with {target.bits} bit buckets")
+    differing = []
+    compared = 0
+    ranges = [(0, 1 << source.bits)]
+    while ranges:
+        start, end = ranges.pop()
+        compared += 1
+        if source.range(start, end) == target.range(start, end):
+            continue
+        if end - start == 1:
+            differing.append({"bucket": start, "source_docs": source.counts[start],
+                              "target_docs": target.counts[start]})
+            continue
+        step = max(1, (end - start) // fanout)
+        ranges.extend((low, min(low + step, end)) for low in range(start, end, step))
+    differing.sort(key=lambda bucket: bucket["bucket"])
+    return differing, compared
@@ -0,0 +1,67 @@
+import random
+import threading
+import time
+
+import requests
+
+from config import get_custom_logger
+
+logger = get_custom_logger("migrate.export.retry")
+
+# errors of the connection rather than of the request, which a later attempt may not meet
+TRANSIENT_ERRORS = (ConnectionError, TimeoutError, requests.ConnectionError, requests.Timeout,
+                    requests.exceptions.ChunkedEncodingError)
+
+
+def is_transient(error):
+    """
+    :return: True for connection errors, timeouts and HTTP 429 and 5xx responses, False for errors such as
+             other 4xx responses that fail again however often the request is sent
+    """
+    if isinstance(error, requests.HTTPError):
+        status = error.response.status_code if error.response is not None else None
+        return status == 429 or (status is not None and status >= 500)
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+class RetryPolicy(object):
+    """
+    Retries one batch of an export with exponential backoff and jitter before giving up on it. Only transient
+    errors are retried; any other error is raised at once.
+    """
+
+    def __init__(self, max_retries=3, initial_backoff=1.0, max_backoff=30.0):
+        self.max_retries = max(0, int(max_retries))
+        self.initial_backoff = float(initial_backoff)
+        self.max_backoff = float(max_backoff)
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, data_config):
+        return cls(data_config.get('batch_max_retries', 3), data_config.get('batch_initial_backoff', 1.0),
+                   data_config.get('batch_max_backoff', 30.0))
+
+    def backoff(self, attempt):
+        delay = min(self.max_backoff, self.initial_backoff * (2 ** attempt))
+        time.sleep(delay * random.uniform(0.5, 1.0))
+
+    def call(self, func, description):
+        """
+        :param func: callable without arguments
+        :return: the result of func
+        :raises: the first error that is not transient, or the last error of func once max_retries are used up
+        """
+        attempt = 0
+        while True:
+            try:
+                return func()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_transient(e):
+                    raise
+                logger.warning(f"{description} failed ({type(e).__name__}: {e}), retry {attempt + 1} "
+                               f"of {self.max_retries}")
+                with self._lock:
+                    self.retries += 1
+                self.backoff(attempt)
+                attempt += 1
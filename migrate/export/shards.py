@@ -0,0 +1,68 @@
+from config import get_custom_logger
+from migrate.export.partition_helper import ExportPartition, PartitionException
+
+logger = get_custom_logger("migrate.export.shards")
+
+# read from PULL replicas first, then TLOG, and from leaders only when a shard has nothing else
+DEFAULT_SHARDS_PREFERENCE = "replica.type:PULL,replica.type:TLOG,replica.leader:false"
+
+
+def parse_shards_preference(preference):
+    """
+    Parse a shards.preference value such as replica.type:PULL,replica.location:http://host1
+    :return: list of (property, value) rules in priority order
+    """
+    rules = []
+    for rule in (preference or "").split(","):
+        rule = rule.strip()
+        if not rule:
+            continue
+        prop, separator, value = rule.partition(":")
+        if not separator or prop not in ("replica.type", "replica.leader", "replica.location"):
+            raise PartitionException(name=rule, reason="UnsupportedShardsPreference")
+        rules.append((prop, value))
+    return rules
+
+
+def _matches(replica, rule):
+    prop, value = rule
+    if prop == "replica.type":
+        return replica.get("type", "NRT").upper() == value.upper()
+    if prop == "replica.leader":
+        return (str(replica.get("leader", "false")).lower() == "true") == (value.lower() == "true")
+    return replica.get("base_url", "").startswith(value)
+
+
+def order_replicas(replicas, rules):
+    """
+    Sort replicas by the first preference rule they match, then the next rule, like Solr's shards.preference
+    """
+    return sorted(replicas, key=lambda replica: [0 if _matches(replica, rule) else 1 for rule in rules])
+
+
+def shard_partitions(cluster_status, collection, preference=DEFAULT_SHARDS_PREFERENCE):
+    """
+    One partition per active shard of a SolrCloud collection, read directly from one core with distrib=false
+    :param cluster_status: the cluster section of a CLUSTERSTATUS response
+    :param preference: shards.preference rules choosing the replica of each shard
+    :return: list of ExportPartition with core_url set
+    :raises PartitionException: when a shard has no active replica on a live node
+    """
+    rules = parse_shards_preference(preference)
+    live_nodes = set(cluster_status.get("live_nodes", []))
+    shards = cluster_status["collections"][collection]["shards"]
+    partitions = []
+    for shard_name, shard in sorted(shards.items()):
+        if shard.get("state", "active") != "active":
+            logger.info(f"Skipping {shard.get('state')} shard {shard_name}")
+            continue
+        replicas = [replica for replica in shard.get("replicas", {}).values()
+                    if replica.get("state") == "active" and (not live_nodes or replica.get("node_name") in live_nodes)]
+        if not replicas:
+            raise PartitionException(name=shard_name, reason="NoActiveReplica")
+        replica = order_replicas(replicas, rules)[0]
+        core_url = f"{replica['base_url'].rstrip('/')}/{replica['core']}"
+        logger.info(f"Exporting shard {shard_name} from {replica.get('type', 'NRT')} replica {core_url}"
+                    f"{' (leader)' if str(replica.get('leader')).lower() == 'true' else ''}")
+        partitions.append(ExportPartition(shard_name, core_url=core_url))
+    return partitions
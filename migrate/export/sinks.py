@@ -0,0 +1,365 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import get_custom_logger
+from migrate.export.batch_writer import BatchWriter, format_metadata
+
+logger = get_custom_logger("migrate.export.sinks")
+
+# S3 rejects multipart parts smaller than 5 MiB, except for the last part
+MIN_PART_BYTES = 5 * 1024 * 1024
+EXPORT_TARGETS = ("s3", "local", "opensearch")
+
+
+class SinkException(Exception):
+    def __init__(self, name, reason=None):
+        self.name = name
+        self.reason = reason
+
+    def __str__(self):
+        return f"{self.reason}: {self.name}"
+
+
+def export_targets(data_config):
+    """
+    :return: list of the configured export targets; export_target is one target or a list of targets
+    :raises SinkException: for an unknown target
+    """
+    targets = data_config.get('export_target', 's3')
+    targets = [targets] if isinstance(targets, str) else list(targets)
+    for target in targets:
+        if target not in EXPORT_TARGETS:
+            raise SinkException(name=target, reason=f"export_target must be one of {EXPORT_TARGETS}")
+    if not targets:
+        raise SinkException(name="[]", reason="export_target is empty")
+    return targets
+
+
+class ExportSink(object):
+    """
+    Receives the exported documents of one partition, one batch at a time.
+    A sink may buffer documents; it reports batches whose documents are durable in its target through the
+    on_commit callback, which is what the export journal advances on.
+    """
+
+    def __init__(self, on_commit=None):
+        """
+        :param on_commit: optional callback(batch_counts, key), called once the documents of the batches are
+                          durable; key names the object, file or index holding them
+        """
+        self._on_commit = on_commit
+        self.objects = []
+        # optional ExportTelemetry receiving serialize and upload latencies
+        self.telemetry = None
+
+    def _record(self, stage, seconds, batch_count=None, bytes_out=0):
+        if self.telemetry is not None:
+            self.telemetry.stage(stage, seconds, batch_count, bytes_out)
+
+    def write_batch(self, batch_count, docs):
+        """
+        :param docs: iterable of documents, consumed lazily
+        :return: number of documents written
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Write everything still buffered; raises when the sink failed"""
+        pass
+
+
+class S3BatchSink(ExportSink):
+    """
+    Writes every Solr page to its own S3 object: {key_prefix}_batch_{n}{extension}
+    """
+
+    def __init__(self, s3_client, bucket, key_prefix, data_config, on_commit=None):
+        """
+        :param on_commit: optional callback(batch_counts, key), called once the documents of the batches are
+                          durable in S3
+        """
+        super().__init__(on_commit)
+        self._s3_client = s3_client
+        self._bucket = bucket
+        self._key_prefix = key_prefix
+        self._data_config = data_config
+        self._lock = threading.Lock()
+
+    def write_batch(self, batch_count, docs):
+        """
+        Serialize the documents of one batch and upload them as one object
+        :param docs: iterable of documents, consumed lazily
+        :return: number of documents written
+        """
+        started = time.monotonic()
+        with BatchWriter.from_config(self._data_config) as writer:
+            for doc in docs:
+                writer.write(doc)
+            if not writer.doc_count:
+                return 0
+            key = f"{self._key_prefix}_batch_{batch_count}{writer.extension}"
+            extra_args = {'ContentEncoding': writer.content_encoding} if writer.content_encoding else {}
+            body = writer.body()
+            body.seek(0, 2)
+            size = body.tell()
+            body.seek(0)
+            serialized = time.monotonic()
+            self._record("serialize", serialized - started, batch_count)
+            self._s3_client.put_object(
+                Bucket=self._bucket,
+                Key=key,
+                Body=body,
+                ContentType=writer.content_type,
+                **extra_args
+            )
+            self._record("upload", time.monotonic() - serialized, batch_count, size)
+            with self._lock:
+                self.objects.append({"key": key, "docs": writer.doc_count, "bytes": size})
+            if self._on_commit is not None:
+                self._on_commit([batch_count], key)
+            return writer.doc_count
+
+
+class LocalDirectorySink(ExportSink):
+    """
+    Writes every Solr page to its own file below a local directory, with the same names as S3BatchSink keys:
+    {directory}/{key_prefix}_batch_{n}{extension}. Used for dry runs, benchmarks without AWS and local archives.
+    A file is written under a temporary name and renamed once it is complete and synced.
+    """
+
+    def __init__(self, directory, key_prefix, data_config, on_commit=None):
+        """
+        :param on_commit: optional callback(batch_counts, path), called once the file of the batch is complete
+        """
+        super().__init__(on_commit)
+        self._directory = directory
+        self._key_prefix = key_prefix
+        self._data_config = data_config
+        self._lock = threading.Lock()
+        self._extension = format_metadata(data_config.get('export_format', 'json'),
+                                          data_config.get('export_compression', 'none'))[2]
+
+    def write_batch(self, batch_count, docs):
+        path = os.path.join(self._directory, f"{self._key_prefix}_batch_{batch_count}{self._extension}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + ".tmp"
+        started = time.monotonic()
+        with open(temp_path, "wb") as f:
+            writer = BatchWriter.from_config(self._data_config, fileobj=f)
+            for doc in docs:
+                writer.write(doc)
+            writer.finish()
+            serialized = time.monotonic()
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        if not writer.doc_count:
+            os.remove(temp_path)
+            return 0
+        os.replace(temp_path, path)
+        self._record("serialize", serialized - started, batch_count)
+        self._record("upload", time.monotonic() - serialized, batch_count, size)
+        with self._lock:
+            self.objects.append({"key": path, "docs": writer.doc_count, "bytes": size})
+        if self._on_commit is not None:
+            self._on_commit([batch_count], path)
+        return writer.doc_count
+
+
+class _MultipartStream(object):
+    """
+    Writable file object that uploads everything written to it as one S3 object.
+    Data is cut into parts of part_bytes that are uploaded concurrently on the shared executor while
+    writing continues; at most max_parts_in_flight parts are held in memory.
+    An object that ends before its first part is full is uploaded with a single put_object.
+    """
+
+    def __init__(self, s3_client, bucket, key, content_type, content_encoding, part_bytes, executor,
+                 max_parts_in_flight):
+        self._s3_client = s3_client
+        self._bucket = bucket
+        self._key = key
+        self._extra_args = {'ContentType': content_type}
+        if content_encoding:
+            self._extra_args['ContentEncoding'] = content_encoding
+        self._part_bytes = max(MIN_PART_BYTES, int(part_bytes))
+        self._executor = executor
+        self._slots = threading.BoundedSemaphore(max(1, int(max_parts_in_flight)))
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._futures = []
+        self.bytes_written = 0
+
+    def write(self, data):
+        self._buffer += data
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self._part_bytes:
+            part = bytes(self._buffer[:self._part_bytes])
+            del self._buffer[:self._part_bytes]
+            self._submit_part(part)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def _submit_part(self, data):
+        if self._upload_id is None:
+            response = self._s3_client.create_multipart_upload(Bucket=self._bucket, Key=self._key, **self._extra_args)
+            self._upload_id = response['UploadId']
+        part_number = len(self._futures) + 1
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._upload_part, part_number, data)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def _upload_part(self, part_number, data):
+        response = self._s3_client.upload_part(Bucket=self._bucket, Key=self._key, UploadId=self._upload_id,
+                                               PartNumber=part_number, Body=data)
+        return {'ETag': response['ETag'], 'PartNumber': part_number}
+
+    def complete(self):
+        """
+        Upload the remaining data and complete the object
+        """
+        if self._upload_id is None:
+            self._s3_client.put_object(Bucket=self._bucket, Key=self._key, Body=bytes(self._buffer),
+                                       **self._extra_args)
+            return
+        if self._buffer:
+            self._submit_part(bytes(self._buffer))
+            self._buffer = bytearray()
+        try:
+            parts = [future.result() for future in self._futures]
+            self._s3_client.complete_multipart_upload(Bucket=self._bucket, Key=self._key, UploadId=self._upload_id,
+                                                      MultipartUpload={'Parts': parts})
+        except Exception:
+            self.abort()
+            raise
+
+    def abort(self):
+        if self._upload_id is None:
+            return
+        for future in self._futures:
+            future.cancel()
+        upload_id, self._upload_id = self._upload_id, None
+        try:
+            self._s3_client.abort_multipart_upload(Bucket=self._bucket, Key=self._key, UploadId=upload_id)
+        except Exception as e:
+            logger.warning("Could not abort multipart upload of %s: %s", self._key, e)
+
+
+class RollingS3Sink(ExportSink):
+    """
+    Writes documents into S3 objects of about target_object_bytes, independent of the Solr page size:
+    {key_prefix}_part_{n}{extension}. Each object is streamed through a multipart upload with concurrent
+    part uploads, so an object is never built in memory.
+    A batch is committed when the object holding its last document is completed.
+    """
+
+    def __init__(self, s3_client, bucket, key_prefix, data_config, on_commit=None, resume_keys=()):
+        """
+        :param on_commit: optional callback(batch_counts, key), called once the documents of the batches are
+                          durable in S3
+        :param resume_keys: keys of objects written by an interrupted run, numbering continues after them
+        """
+        super().__init__(on_commit)
+        self._s3_client = s3_client
+        self._bucket = bucket
+        self._key_prefix = key_prefix
+        self._data_config = data_config
+        self._target_bytes = int(data_config.get('target_object_bytes', 64 * 1024 * 1024))
+        self._part_bytes = int(data_config.get('multipart_part_bytes', 8 * 1024 * 1024))
+        concurrency = int(data_config.get('multipart_concurrency', 4))
+        self._max_parts_in_flight = concurrency * 2
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="s3-part")
+        self._content_type, self._content_encoding, self._extension = format_metadata(
+            data_config.get('export_format', 'json'), data_config.get('export_compression', 'none'))
+        self._lock = threading.Lock()
+        self._key = None
+        self._writer = None
+        self._stream = None
+        # with several export targets the journal also holds keys of the other targets
+        own_prefix = f"{key_prefix}_part_"
+        self._object_count = max((self._object_number(key) for key in resume_keys if key.startswith(own_prefix)),
+                                 default=0)
+        self._object_batches = []
+
+    @staticmethod
+    def _object_number(key):
+        return int(key.rsplit("_part_", 1)[1].split(".", 1)[0])
+
+    def _open(self):
+        self._object_count += 1
+        self._key = f"{self._key_prefix}_part_{self._object_count:05d}{self._extension}"
+        self._stream = _MultipartStream(
+            self._s3_client, self._bucket, self._key, self._content_type, self._content_encoding,
+            part_bytes=self._part_bytes, executor=self._executor, max_parts_in_flight=self._max_parts_in_flight
+        )
+        self._writer = BatchWriter.from_config(self._data_config, fileobj=self._stream)
+
+    def _roll(self, batch_count=None):
+        """
+        Complete the current object; the wait for its part uploads is recorded as upload time of the batch
+        that filled it
+        """
+        writer, stream = self._writer, self._stream
+        self._writer, self._stream = None, None
+        started = time.monotonic()
+        try:
+            writer.finish()
+            stream.complete()
+        except Exception:
+            stream.abort()
+            raise
+        self._record("upload", time.monotonic() - started, batch_count, stream.bytes_written)
+        self.objects.append({"key": self._key, "docs": writer.doc_count, "bytes": stream.bytes_written})
+        logger.info("Completed object %s with %s documents, %s bytes", self._key, writer.doc_count,
+                    stream.bytes_written)
+        batches, self._object_batches = self._object_batches, []
+        if self._on_commit is not None and batches:
+            self._on_commit(batches, self._key)
+
+    def write_batch(self, batch_count, docs):
+        """
+        Append the documents of one batch to the current object, rolling over to a new object
+        whenever the target size is reached
+        :return: number of documents written
+        """
+        written = 0
+        rolling = 0
+        started = time.monotonic()
+        with self._lock:
+            for doc in docs:
+                if self._writer is None:
+                    self._open()
+                self._writer.write(doc)
+                written += 1
+                if self._stream.bytes_written >= self._target_bytes:
+                    rolled = time.monotonic()
+                    self._roll(batch_count)
+                    rolling += time.monotonic() - rolled
+            if written:
+                if self._writer is not None:
+                    self._object_batches.append(batch_count)
+                elif self._on_commit is not None:
+                    # the last document of the batch completed an object
+                    self._on_commit([batch_count], self._key)
+        self._record("serialize", time.monotonic() - started - rolling, batch_count)
+        return written
+
+    def close(self):
+        """
+        Complete the current object and wait for all part uploads
+        """
+        with self._lock:
+            try:
+                if self._writer is not None:
+                    self._roll()
+            finally:
+                self._executor.shutdown(wait=True)
@@ -0,0 +1,179 @@
+import mmap
+import os
+import threading
+
+from config import get_custom_logger
+
+logger = get_custom_logger("migrate.export.spill_buffer")
+
+
+class BufferedPage(object):
+    """A fetched page held by a SpillBuffer, either in memory or in a segment file"""
+
+    __slots__ = ("size", "text", "segment", "offset", "length")
+
+    def __init__(self, size, text=None, segment=None, offset=0, length=0):
+        self.size = size
+        self.text = text
+        self.segment = segment
+        self.offset = offset
+        self.length = length
+
+    @property
+    def spilled(self):
+        return self.segment is not None
+
+
+class _Segment(object):
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "wb")
+        self.size = 0
+        self.pages = 0
+        self.sealed = False
+
+
+class SpillBuffer(object):
+    """
+    Byte-budgeted buffer for pages that are fetched but not yet parsed and written, shared by all partitions
+    of an export.
+    Pages stay in memory up to memory_bytes; further pages are appended to segment files of about
+    segment_bytes and read back through memory-mapped I/O, so a slow sink no longer stops Solr reads until
+    max_spill_bytes are spilled. A segment is deleted once all its pages are read.
+    """
+
+    def __init__(self, memory_bytes, directory, max_spill_bytes=10 * 1024 ** 3, segment_bytes=64 * 1024 ** 2):
+        self._memory_bytes = int(memory_bytes)
+        self._directory = directory
+        self._max_spill_bytes = int(max_spill_bytes)
+        self._segment_bytes = int(segment_bytes)
+        self._condition = threading.Condition()
+        self._segment = None
+        self._segment_count = 0
+        self.resident_bytes = 0
+        self.peak_resident_bytes = 0
+        self.spill_bytes = 0
+        self.peak_spill_bytes = 0
+        self.spilled_pages = 0
+        self.spilled_total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, data_config, default_directory):
+        """
+        :return: the buffer, or None when buffer_memory_bytes is not set and pages are bounded by queue depth only
+        """
+        memory_bytes = int(data_config.get('buffer_memory_bytes', 0))
+        if memory_bytes <= 0:
+            return None
+        directory = data_config.get('spill_dir', default_directory)
+        logger.info(f"Buffering {memory_bytes} bytes of fetched pages in memory, spilling to {directory}")
+        return cls(memory_bytes, directory, data_config.get('spill_max_bytes', 10 * 1024 ** 3),
+                   data_config.get('spill_segment_bytes', 64 * 1024 ** 2))
+
+    def put(self, text, cancelled=None):
+        """
+        Hold one page, spilling it to disk when the memory budget is used up.
+        Blocks while max_spill_bytes are spilled, until pages are taken or cancelled() returns True
+        :return: BufferedPage to hand to take()
+        """
+        # the budget is in bytes, a character of non-ASCII text takes up to 4 of them
+        data = None
+        if text.isascii():
+            size = len(text)
+        else:
+            data = text.encode("utf-8")
+            size = len(data)
+        with self._condition:
+            if self.resident_bytes == 0 or self.resident_bytes + size <= self._memory_bytes:
+                self.resident_bytes += size
+                self.peak_resident_bytes = max(self.peak_resident_bytes, self.resident_bytes)
+                return BufferedPage(size, text=text)
+            if data is None:
+                data = text.encode("utf-8")
+            while self.spill_bytes and self.spill_bytes + len(data) > self._max_spill_bytes:
+                if cancelled is not None and cancelled():
+                    break
+                self._condition.wait(timeout=1)
+            return self._spill(size, data)
+
+    def _spill(self, size, data):
+        """Append a page to the current segment, called with the lock held"""
+        segment = self._segment
+        if segment is None or segment.size >= self._segment_bytes:
+            if segment is not None:
+                self._seal(segment)
+            self._segment_count += 1
+            segment = self._segment = _Segment(os.path.join(self._directory, f"segment_{self._segment_count:05d}"))
+        offset = segment.size
+        segment.file.write(data)
+        segment.file.flush()
+        segment.size += len(data)
+        segment.pages += 1
+        self.spill_bytes += len(data)
+        self.peak_spill_bytes = max(self.peak_spill_bytes, self.spill_bytes)
+        self.spilled_pages += 1
+        self.spilled_total_bytes += len(data)
+        return BufferedPage(size, segment=segment, offset=offset, length=len(data))
+
+    def _seal(self, segment):
+        segment.sealed = True
+        segment.file.close()
+        if segment.pages == 0:
+            os.remove(segment.path)
+
+    def take(self, page):
+        """
+        :return: the text of the page, which no longer counts against the buffer
+        """
+        if not page.spilled:
+            text, page.text = page.text, None
+            self.release(page)
+            return text
+        with open(page.segment.path, "rb") as f:
+            with mmap.mmap(f.fileno(), page.offset + page.length, access=mmap.ACCESS_READ) as mapped:
+                text = mapped[page.offset:page.offset + page.length].decode("utf-8")
+        self.release(page)
+        return text
+
+    def release(self, page):
+        """Drop a page without reading it"""
+        with self._condition:
+            if page.size < 0:
+                return
+            if page.spilled:
+                segment = page.segment
+                self.spill_bytes -= page.length
+                segment.pages -= 1
+                if segment.pages == 0 and segment.sealed:
+                    os.remove(segment.path)
+            else:
+                self.resident_bytes -= page.size
+            # a page is released once
+            page.size = -1
+            self._condition.notify_all()
+
+    def stats(self):
+        return {
+            "memory_bytes": self._memory_bytes,
+            "peak_resident_bytes": self.peak_resident_bytes,
+            "spilled_pages": self.spilled_pages,
+            "spilled_bytes": self.spilled_total_bytes,
+            "peak_spill_bytes": self.peak_spill_bytes
+        }
+
+    def close(self):
+        """Delete the segment files still on disk"""
+        with self._condition:
+            if self._segment is not None and not self._segment.sealed:
+                self._segment.file.close()
+            self._segment = None
+            for number in range(1, self._segment_count + 1):
+                path = os.path.join(self._directory, f"segment_{number:05d}")
+                if os.path.exists(path):
+                    os.remove(path)
+        try:
+            os.rmdir(self._directory)
+        except OSError:
+            pass
@@ -0,0 +1,130 @@
+import codecs
+import json
+import re
+
+from config import get_custom_logger
+from migrate.export.pipeline import extract_next_cursor_mark
+
+logger = get_custom_logger("migrate.export.stream_parser")
+
+_DOCS_START = re.compile(r'"docs"\s*:\s*\[')
+_OUTSIDE_STRING = re.compile(r'[{}"]')
+_INSIDE_STRING = re.compile(r'["\\]')
+_SEPARATORS = " \t\r\n,"
+
+
+class _ObjectScanner(object):
+    """Finds the end of a JSON object that may arrive over several chunks, without rescanning"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.position = 0
+        self._depth = 0
+        self._in_string = False
+
+    def scan(self, text):
+        """
+        Continue scanning text, which starts with the object being scanned
+        :return: index after the closing brace, or None when more text is needed
+        """
+        position = self.position
+        while True:
+            if self._in_string:
+                match = _INSIDE_STRING.search(text, position)
+                if match is None:
+                    self.position = len(text)
+                    return None
+                if match.group() == '\\':
+                    if match.end() >= len(text):
+                        # the escaped character is in the next chunk
+                        self.position = match.start()
+                        return None
+                    position = match.end() + 1
+                    continue
+                self._in_string = False
+                position = match.end()
+                continue
+            match = _OUTSIDE_STRING.search(text, position)
+            if match is None:
+                self.position = len(text)
+                return None
+            position = match.end()
+            token = match.group()
+            if token == '"':
+                self._in_string = True
+            elif token == '{':
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    return position
+
+
+class StreamingDocsParser(object):
+    """
+    Pulls the documents of response.docs out of a Solr JSON response one at a time while it is read from
+    the socket. Only the current document and the current chunk are held in memory.
+    """
+
+    def __init__(self, fix_document=None):
+        """
+        :param fix_document: optional function applied to the raw text of each document before it is parsed
+        """
+        self._fix_document = fix_document
+        self.next_cursor_mark = None
+
+    def iter_docs(self, chunks):
+        """
+        Yield documents from an iterable of response body chunks (bytes or str)
+        :raises json.JSONDecodeError: when the response is malformed or truncated
+        """
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        scanner = _ObjectScanner()
+        buffer = ""
+        tail = []
+        phase = "header"
+
+        for chunk in chunks:
+            buffer += decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+
+            while buffer:
+                if phase == "header":
+                    match = _DOCS_START.search(buffer)
+                    if match is None:
+                        # keep enough text for a "docs" key split across chunks
+                        buffer = buffer[-32:]
+                        break
+                    buffer = buffer[match.end():]
+                    phase = "docs"
+                elif phase == "docs":
+                    start = 0
+                    while start < len(buffer) and buffer[start] in _SEPARATORS:
+                        start += 1
+                    if start == len(buffer):
+                        buffer = ""
+                        break
+                    if buffer[start] == ']':
+                        buffer = buffer[start + 1:]
+                        phase = "tail"
+                        continue
+                    if buffer[start] != '{':
+                        raise json.JSONDecodeError("Expecting document object", buffer, start)
+                    buffer = buffer[start:]
+                    end = scanner.scan(buffer)
+                    if end is None:
+                        break
+                    doc_text = buffer[:end]
+                    buffer = buffer[end:]
+                    scanner.reset()
+                    if self._fix_document is not None:
+                        doc_text = self._fix_document(doc_text)
+                    yield json.loads(doc_text)
+                else:
+                    tail.append(buffer)
+                    buffer = ""
+
+        if phase != "tail":
+            raise json.JSONDecodeError("Unexpected end of response", buffer, len(buffer))
+        self.next_cursor_mark = extract_next_cursor_mark("".join(tail))
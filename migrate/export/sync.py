@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+
+from config import get_custom_logger
+
+logger = get_custom_logger("migrate.export.sync")
+
+
+class SyncMetrics(object):
+    """
+    Replication state of a continuous sync, written after every cycle as a Prometheus text file that a
+    node exporter textfile collector or any file watcher can pick up.
+    lag_seconds is the time since the last moment OpenSearch held every change Solr had then: the start
+    of the last cycle that applied its whole window.
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: file the metrics are written to, None to only keep them in memory
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._caught_up_at = None
+        self.cycles = 0
+        self.applied_docs = 0
+        self.deleted_docs = 0
+        self.stale_docs = 0
+        self.missing_docs = 0
+        self.backlog_docs = 0
+        self.docs_per_second = 0.0
+        self.watermark = None
+
+    def finish_cycle(self, started, applied, backlog, watermark):
+        """
+        Record a cycle that applied every change of its window
+        :param started: wall clock time the cycle read the Solr high-watermark
+        :param applied: documents sent to OpenSearch by the cycle
+        :param backlog: documents that had changed since the previous watermark when the cycle started
+        """
+        with self._lock:
+            self.cycles += 1
+            self.applied_docs += applied
+            self.backlog_docs = backlog
+            self.docs_per_second = round(applied / max(time.time() - started, 0.001), 1)
+            self._caught_up_at = started
+            self.watermark = watermark
+        self.write()
+
+    def add_deletes(self, deleted, missing):
+        """
+        :param deleted: documents deleted from OpenSearch because they are no longer in Solr
+        :param missing: documents in Solr that OpenSearch does not have
+        """
+        with self._lock:
+            self.deleted_docs += deleted
+            self.missing_docs = missing
+        self.write()
+
+    def set_stale(self, stale):
+        with self._lock:
+            self.stale_docs = stale
+
+    @property
+    def lag_seconds(self):
+        with self._lock:
+            if self._caught_up_at is None:
+                return None
+            return round(time.time() - self._caught_up_at, 1)
+
+    def snapshot(self):
+        lag = self.lag_seconds
+        with self._lock:
+            return {
+                "lag_seconds": lag,
+                "docs_per_second": self.docs_per_second,
+                "backlog_docs": self.backlog_docs,
+                "cycles": self.cycles,
+                "applied_docs": self.applied_docs,
+                "deleted_docs": self.deleted_docs,
+                "stale_docs": self.stale_docs,
+                "missing_docs": self.missing_docs,
+                "watermark": self.watermark
+            }
+
+    def write(self):
+        """Replace the metrics file"""
+        if self.path is None:
+            return
+        values = self.snapshot()
+        lines = []
+        for name, kind, help_text in (("lag_seconds", "gauge", "Seconds OpenSearch trails Solr"),
+                                      ("docs_per_second", "gauge", "Documents applied per second by the last cycle"),
+                                      ("backlog_docs", "gauge", "Changed documents at the start of the last cycle"),
+                                      ("cycles", "counter", "Completed sync cycles"),
+                                      ("applied_docs", "counter", "Documents indexed or updated"),
+                                      ("deleted_docs", "counter", "Documents deleted because Solr no longer has them"),
+                                      ("stale_docs", "counter", "Updates skipped because a newer version was indexed"),
+                                      ("missing_docs", "gauge", "Solr documents OpenSearch did not have at the last "
+                                                                "delete check")):
+            if values[name] is None:
+                continue
+            lines.extend([f"# HELP solr_sync_{name} {help_text}", f"# TYPE solr_sync_{name} {kind}",
+                          f"solr_sync_{name} {values[name]}"])
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, self.path)
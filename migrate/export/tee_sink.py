@@ -0,0 +1,116 @@
+import queue
+import threading
+
+from config import get_custom_logger
+from migrate.export.sinks import ExportSink, SinkException
+
+logger = get_custom_logger("migrate.export.tee_sink")
+
+_CLOSE = object()
+
+
+class TeeSink(ExportSink):
+    """
+    Writes every batch of one Solr read pass to several sinks.
+    Each sink is fed by its own thread from its own bounded queue, so a slow sink only holds back the read
+    once its queue is full, and the other sinks keep writing meanwhile. A batch is committed once every sink
+    has committed it. The documents of a batch are materialized once and the same list is handed to every
+    sink, which must not modify it.
+    """
+
+    def __init__(self, sink_factories, on_commit=None, queue_depth=4):
+        """
+        :param sink_factories: list of callables(on_commit) creating the sinks to write to
+        :param on_commit: optional callback(batch_counts, keys), called with the keys of all sinks
+        :param queue_depth: batches waiting for a sink before write_batch blocks
+        """
+        super().__init__(on_commit)
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._error = None
+        self.sinks = []
+        self._queues = []
+        self._threads = []
+        for index, factory in enumerate(sink_factories):
+            self.sinks.append(factory(lambda batches, key, index=index: self._committed(index, batches, key)))
+            self._queues.append(queue.Queue(maxsize=max(1, int(queue_depth))))
+        for index, sink in enumerate(self.sinks):
+            thread = threading.Thread(target=self._feed, args=(index,), name=f"tee-{type(sink).__name__}",
+                                      daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise SinkException(name=str(self._error), reason="Export sink failed")
+
+    def write_batch(self, batch_count, docs):
+        """
+        Hand the documents of one batch to every sink, blocking while the queue of a sink is full
+        :return: number of documents written
+        """
+        self._raise_error()
+        if not isinstance(docs, list):
+            # the sinks read the batch on their own threads, so a lazy iterable is read into memory once here
+            docs = list(docs)
+        if not docs:
+            return 0
+        with self._lock:
+            self._pending[batch_count] = {"sinks": set(range(len(self.sinks))), "keys": set()}
+        for sink_queue in self._queues:
+            sink_queue.put((batch_count, docs))
+        return len(docs)
+
+    def _feed(self, index):
+        sink, sink_queue = self.sinks[index], self._queues[index]
+        failed = False
+        while True:
+            item = sink_queue.get()
+            if item is _CLOSE:
+                break
+            if failed:
+                # keep draining so that the other sinks are not blocked by a full queue
+                continue
+            try:
+                sink.write_batch(*item)
+            except Exception as e:
+                failed = True
+                self._fail(sink, e)
+        try:
+            sink.close()
+        except Exception as e:
+            self._fail(sink, e)
+
+    def _fail(self, sink, error):
+        logger.error(f"{type(sink).__name__} failed: {error}")
+        with self._lock:
+            if self._error is None:
+                self._error = error
+
+    def _committed(self, index, batches, key):
+        done = []
+        keys = set()
+        with self._lock:
+            for batch in batches:
+                entry = self._pending.get(batch)
+                if entry is None:
+                    continue
+                entry["sinks"].discard(index)
+                entry["keys"].add(key)
+                if not entry["sinks"]:
+                    del self._pending[batch]
+                    done.append(batch)
+                    keys.update(entry["keys"])
+        if done and self._on_commit is not None:
+            self._on_commit(sorted(done), sorted(keys))
+
+    def close(self):
+        """
+        Let every sink write its queued batches and close it
+        """
+        for sink_queue in self._queues:
+            sink_queue.put(_CLOSE)
+        for thread in self._threads:
+            thread.join()
+        self.objects = [o for sink in self.sinks for o in sink.objects]
+        self._raise_error()
@@ -0,0 +1,141 @@
+import heapq
+import math
+import threading
+import time
+
+from config import get_custom_logger
+
+logger = get_custom_logger("migrate.export.telemetry")
+
+# order of the stages in the report
+STAGES = ("solr", "parse", "stream", "stored_fetch", "write", "serialize", "upload")
+# upper bounds in seconds of the latency histogram buckets, the last bucket is open
+HISTOGRAM_BOUNDS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0
+    rank = min(len(sorted_values), max(1, math.ceil(fraction * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+class ExportTelemetry(object):
+    """
+    Thread safe per-batch timings of one export.
+    Every stage a batch passes through (Solr request, parse and binary field fix, serialization, upload)
+    records its latency; the summary gives latency percentiles and histograms per stage, a throughput
+    timeline and the slowest batches with the cursor they were fetched with.
+    """
+
+    def __init__(self, interval=10, slowest=10):
+        """
+        :param interval: seconds per point of the throughput timeline
+        :param slowest: number of slowest batches kept
+        """
+        self._interval = interval
+        self._slowest = slowest
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._samples = {}
+        self._batches = {}
+        self._slowest_heap = []
+        self._timeline = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def stage(self, name, seconds, batch_count=None, bytes_out=0):
+        """
+        Record the latency of one stage
+        :param batch_count: batch the stage worked on, when it worked on one batch
+        :param bytes_out: bytes the stage wrote to the target
+        """
+        with self._lock:
+            self._samples.setdefault(name, []).append(seconds)
+            self.bytes_out += bytes_out
+            record = self._batches.get(batch_count)
+            if record is not None:
+                record["stages"][name] = record["stages"].get(name, 0) + seconds
+
+    def start_batch(self, batch_count, partition, cursor_mark):
+        with self._lock:
+            self._batches[batch_count] = {"batch": batch_count, "partition": partition, "cursor_mark": cursor_mark,
+                                          "docs": 0, "bytes_in": 0, "stages": {}}
+
+    def finish_batch(self, batch_count, docs, bytes_in=0):
+        """
+        The batch was handed to the sink; stages that complete later, like uploads of buffered documents,
+        are counted in the stage latencies but not in the batch
+        """
+        with self._lock:
+            record = self._batches.pop(batch_count, None)
+            self.bytes_in += bytes_in
+            point = self._timeline.setdefault(int((time.monotonic() - self._started) // self._interval),
+                                              {"docs": 0, "bytes_in": 0, "batches": 0})
+            point["docs"] += docs
+            point["bytes_in"] += bytes_in
+            point["batches"] += 1
+            if record is None:
+                return
+            record["docs"] = docs
+            record["bytes_in"] = bytes_in
+            record["seconds"] = sum(record["stages"].values())
+            entry = (record["seconds"], batch_count, record)
+            if len(self._slowest_heap) < self._slowest:
+                heapq.heappush(self._slowest_heap, entry)
+            else:
+                heapq.heappushpop(self._slowest_heap, entry)
+
+    def summary(self):
+        """
+        :return: dict with stages, histogram, timeline and slowest batches, rounded for the report
+        """
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+            timeline = sorted(self._timeline.items())
+            slowest = sorted(self._slowest_heap, reverse=True)
+            elapsed = time.monotonic() - self._started
+            bytes_in, bytes_out = self.bytes_in, self.bytes_out
+        names = [name for name in STAGES if name in samples] + sorted(set(samples) - set(STAGES))
+        stages = []
+        histogram = []
+        for name in names:
+            values = samples[name]
+            stages.append({
+                "stage": name,
+                "count": len(values),
+                "p50_ms": round(percentile(values, 0.5) * 1000, 1),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+                "max_ms": round(values[-1] * 1000, 1),
+                "total_seconds": round(sum(values), 2)
+            })
+            counts = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+            for value in values:
+                counts[next((i for i, bound in enumerate(HISTOGRAM_BOUNDS) if value < bound),
+                            len(HISTOGRAM_BOUNDS))] += 1
+            histogram.append({"stage": name, "counts": counts})
+        return {
+            "elapsed_seconds": round(elapsed, 2),
+            "bytes_in": bytes_in,
+            "bytes_out": bytes_out,
+            "stages": stages,
+            "histogram_buckets": [f"< {bound}s" for bound in HISTOGRAM_BOUNDS] + [f">= {HISTOGRAM_BOUNDS[-1]}s"],
+            "histogram": histogram,
+            "timeline": [{
+                "second": index * self._interval,
+                "batches": point["batches"],
+                "docs": point["docs"],
+                "docs_per_second": round(point["docs"] / self._interval, 1),
+                "megabytes_in": round(point["bytes_in"] / (1024 * 1024), 2)
+            } for index, point in timeline],
+            "slowest": [{
+                "batch": record["batch"],
+                "partition": record["partition"],
+                "cursor_mark": record["cursor_mark"],
+                "docs": record["docs"],
+                "seconds": round(record["seconds"], 3),
+                "stages": ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in record["stages"].items())
+            } for _, _, record in slowest]
+        }
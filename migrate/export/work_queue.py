@@ -0,0 +1,370 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from config import get_custom_logger
+from migrate.export.checkpoint import PartitionState
+from migrate.export.partition_helper import ExportPartition
+
+logger = get_custom_logger("migrate.export.work_queue")
+
+
+class WorkQueueException(Exception):
+    def __init__(self, name, reason=None):
+        self.name = name
+        self.reason = reason
+
+    def __str__(self):
+        return f"{self.reason}: {self.name}"
+
+
+class Lease(object):
+    """A partition claimed by one worker until expires, unless renewed"""
+
+    def __init__(self, partition, worker, token, expires, state):
+        """
+        :param token: fences the lease; once the partition is claimed again, calls with the old token fail
+        :param state: PartitionState with the position committed by previous holders of the partition
+        """
+        self.partition = partition
+        self.worker = worker
+        self.token = token
+        self.expires = expires
+        self.state = state
+        self.lost = False
+
+
+class WorkQueue(object):
+    """
+    Shared queue of export partitions that export workers on any number of hosts claim with leases.
+    A worker renews its leases while it exports; a partition whose lease expires, because its worker died or
+    stalled, is claimed by another worker, which continues from the last committed cursorMark checkpointed
+    into the queue. Backends implement the methods below and are registered in WORK_QUEUE_BACKENDS.
+    """
+
+    @classmethod
+    def from_config(cls, data_config, file_path_prefix):
+        raise NotImplementedError
+
+    def publish(self, fingerprint, partitions):
+        """
+        Add the partitions of an export, unless a worker already did
+        :param fingerprint: settings every worker of the export must share
+        :raises WorkQueueException: when the queue holds an export with another fingerprint
+        """
+        raise NotImplementedError
+
+    def claim(self, worker, lease_seconds):
+        """
+        :return: a Lease on the next pending or expired partition, or None when no partition can be claimed
+        """
+        raise NotImplementedError
+
+    def renew(self, lease, lease_seconds):
+        """:return: False when the lease was lost to another worker"""
+        raise NotImplementedError
+
+    def checkpoint(self, lease, batch, cursor_mark, docs, keys):
+        """
+        Record a committed batch of the partition, so that a worker claiming it next resumes after it
+        :return: False when the lease was lost to another worker
+        """
+        raise NotImplementedError
+
+    def complete(self, lease, docs, seconds):
+        """
+        Mark the partition done and add the documents and seconds of the lease to its worker
+        :return: False when the lease was lost to another worker
+        """
+        raise NotImplementedError
+
+    def release(self, lease, docs, seconds, failed=False):
+        """
+        Hand an unfinished partition back to the queue, keeping its checkpoint
+        :param failed: the export of the partition failed; a stopped export does not count as an attempt
+        """
+        raise NotImplementedError
+
+    def unfinished(self):
+        """:return: number of partitions that are pending or held by a live lease and may still be exported"""
+        raise NotImplementedError
+
+    def abandoned(self):
+        """
+        :return: names of partitions that are not done after max_attempts claims, including those whose last
+                 allowed lease expired
+        """
+        raise NotImplementedError
+
+    def exported_docs(self):
+        """:return: documents committed by all workers, for max_rows"""
+        raise NotImplementedError
+
+    def last_batch(self):
+        """:return: the highest batch number checkpointed by any worker, 0 before the first checkpoint"""
+        raise NotImplementedError
+
+    def worker_stats(self):
+        """:return: list of dicts with worker, partitions, docs, seconds and last_seen of every worker"""
+        raise NotImplementedError
+
+
+class SqliteWorkQueue(WorkQueue):
+    """
+    WorkQueue in a SQLite database. Claims run in IMMEDIATE transactions, so workers in several processes,
+    or on several hosts sharing a file system with working locks, never claim the same partition.
+    Lease expiry compares wall clocks, so lease_seconds must be well above the clock skew between hosts.
+    """
+
+    def __init__(self, path, max_attempts=3):
+        """
+        :param max_attempts: claims of a partition before it is abandoned, so a partition that crashes every
+                             worker does not stop the export
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._transaction() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            db.execute("CREATE TABLE IF NOT EXISTS partitions (name TEXT PRIMARY KEY, position INTEGER, "
+                       "filter_query TEXT, core_url TEXT, status TEXT DEFAULT 'pending', owner TEXT, token TEXT, "
+                       "expires REAL, attempts INTEGER DEFAULT 0, cursor_mark TEXT DEFAULT '*', "
+                       "last_batch INTEGER DEFAULT 0, docs INTEGER DEFAULT 0, batches INTEGER DEFAULT 0, "
+                       "keys TEXT DEFAULT '[]')")
+            db.execute("CREATE TABLE IF NOT EXISTS workers (worker TEXT PRIMARY KEY, partitions INTEGER, "
+                       "docs INTEGER, seconds REAL, last_seen REAL)")
+
+    @classmethod
+    def from_config(cls, data_config, file_path_prefix):
+        return cls(data_config.get('work_queue_path', f"{file_path_prefix}/work_queue.db"),
+                   data_config.get('work_queue_max_attempts', 3))
+
+    @contextmanager
+    def _transaction(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        finally:
+            db.close()
+
+    def publish(self, fingerprint, partitions):
+        encoded = json.dumps(fingerprint, sort_keys=True)
+        with self._transaction() as db:
+            row = db.execute("SELECT value FROM meta WHERE key = 'fingerprint'").fetchone()
+            if row is None:
+                db.execute("INSERT INTO meta (key, value) VALUES ('fingerprint', ?)", (encoded,))
+                db.executemany("INSERT INTO partitions (name, position, filter_query, core_url) VALUES (?, ?, ?, ?)",
+                               [(partition.name, position, partition.filter_query, partition.core_url)
+                                for position, partition in enumerate(partitions)])
+                logger.info(f"Published {len(partitions)} partitions to {self.path}")
+            elif row[0] != encoded:
+                raise WorkQueueException(name=self.path, reason="Export settings differ from the queued export")
+
+    def claim(self, worker, lease_seconds):
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute("SELECT name, filter_query, core_url, status, owner, cursor_mark, last_batch, docs, "
+                             "batches, keys FROM partitions WHERE attempts < ? AND (status = 'pending' OR "
+                             "(status = 'leased' AND expires < ?)) ORDER BY position LIMIT 1",
+                             (self.max_attempts, now)).fetchone()
+            if row is None:
+                return None
+            name, filter_query, core_url, status, owner, cursor_mark, last_batch, docs, batches, keys = row
+            token = uuid.uuid4().hex
+            expires = now + lease_seconds
+            db.execute("UPDATE partitions SET status = 'leased', owner = ?, token = ?, expires = ?, "
+                       "attempts = attempts + 1 WHERE name = ?", (worker, token, expires, name))
+        if status == 'leased':
+            logger.warning(f"Reassigning partition {name} from {owner}, its lease expired")
+        state = PartitionState(name)
+        state.cursor_mark, state.last_batch, state.docs, state.batches = cursor_mark, last_batch, docs, batches
+        state.keys = set(json.loads(keys))
+        return Lease(ExportPartition(name, filter_query, core_url), worker, token, expires, state)
+
+    def renew(self, lease, lease_seconds):
+        expires = time.time() + lease_seconds
+        with self._transaction() as db:
+            renewed = db.execute("UPDATE partitions SET expires = ? WHERE name = ? AND token = ?",
+                                 (expires, lease.partition.name, lease.token)).rowcount == 1
+        if renewed:
+            lease.expires = expires
+        return renewed
+
+    def checkpoint(self, lease, batch, cursor_mark, docs, keys):
+        with self._transaction() as db:
+            row = db.execute("SELECT keys FROM partitions WHERE name = ? AND token = ?",
+                             (lease.partition.name, lease.token)).fetchone()
+            if row is None:
+                return False
+            merged = sorted(set(json.loads(row[0])) | set(keys))
+            db.execute("UPDATE partitions SET cursor_mark = ?, last_batch = MAX(last_batch, ?), docs = docs + ?, "
+                       "batches = batches + 1, keys = ? WHERE name = ?",
+                       (cursor_mark, batch, docs, json.dumps(merged), lease.partition.name))
+        return True
+
+    def _finish(self, lease, status, docs, seconds, partitions, refund=False):
+        """
+        :param refund: give back the attempt the claim counted
+        """
+        with self._transaction() as db:
+            held = db.execute("UPDATE partitions SET status = ?, owner = NULL, token = NULL, expires = NULL, "
+                              "attempts = attempts - ? WHERE name = ? AND token = ?",
+                              (status, 1 if refund else 0, lease.partition.name, lease.token)).rowcount
+            db.execute("INSERT INTO workers (worker, partitions, docs, seconds, last_seen) VALUES (?, ?, ?, ?, ?) "
+                       "ON CONFLICT (worker) DO UPDATE SET partitions = partitions + excluded.partitions, "
+                       "docs = docs + excluded.docs, seconds = seconds + excluded.seconds, "
+                       "last_seen = excluded.last_seen",
+                       (lease.worker, partitions if held else 0, docs, seconds, time.time()))
+        return held == 1
+
+    def complete(self, lease, docs, seconds):
+        return self._finish(lease, 'done', docs, seconds, 1)
+
+    def release(self, lease, docs, seconds, failed=False):
+        return self._finish(lease, 'pending', docs, seconds, 0, refund=not failed)
+
+    def unfinished(self):
+        with self._transaction() as db:
+            return db.execute("SELECT COUNT(*) FROM partitions WHERE (attempts < ? AND status != 'done') OR "
+                              "(status = 'leased' AND expires >= ?)", (self.max_attempts, time.time())).fetchone()[0]
+
+    def abandoned(self):
+        # a worker that died on the last allowed attempt leaves an expired lease nobody may claim again
+        with self._transaction() as db:
+            rows = db.execute("SELECT name FROM partitions WHERE attempts >= ? AND (status = 'pending' OR "
+                              "(status = 'leased' AND expires < ?)) ORDER BY position",
+                              (self.max_attempts, time.time())).fetchall()
+        return [row[0] for row in rows]
+
+    def exported_docs(self):
+        with self._transaction() as db:
+            return db.execute("SELECT COALESCE(SUM(docs), 0) FROM partitions").fetchone()[0]
+
+    def last_batch(self):
+        with self._transaction() as db:
+            return db.execute("SELECT COALESCE(MAX(last_batch), 0) FROM partitions").fetchone()[0]
+
+    def worker_stats(self):
+        with self._transaction() as db:
+            rows = db.execute("SELECT worker, partitions, docs, seconds, last_seen FROM workers "
+                              "ORDER BY worker").fetchall()
+        return [{"worker": worker, "partitions": partitions, "docs": docs, "seconds": seconds,
+                 "last_seen": last_seen} for worker, partitions, docs, seconds, last_seen in rows]
+
+
+WORK_QUEUE_BACKENDS = {"sqlite": SqliteWorkQueue}
+
+
+def open_work_queue(data_config, file_path_prefix="migration_schema"):
+    """
+    :return: the WorkQueue of work_queue_backend
+    :raises WorkQueueException: for an unknown backend
+    """
+    backend = data_config.get('work_queue_backend', 'sqlite')
+    if backend not in WORK_QUEUE_BACKENDS:
+        raise WorkQueueException(name=backend, reason="Unknown work queue backend")
+    return WORK_QUEUE_BACKENDS[backend].from_config(data_config, file_path_prefix)
+
+
+class QueueJournal(object):
+    """
+    Journal for a PartitionCheckpoint that checkpoints the committed batches of a leased partition into the
+    work queue instead of a local file, so another worker can resume the partition
+    """
+
+    def __init__(self, queue, lease):
+        self._queue = queue
+        self._lease = lease
+        self.docs = 0
+
+    def record_batch(self, partition, batch, cursor_mark, docs, keys):
+        self.docs += docs
+        if not self._lease.lost and not self._queue.checkpoint(self._lease, batch, cursor_mark, docs, keys):
+            self._lease.lost = True
+            logger.warning(f"Lost the lease on partition {partition}, another worker continues it")
+
+    def record_done(self, partition):
+        # the worker completes the lease once the sink is closed
+        pass
+
+
+class LeaseKeeper(object):
+    """Background thread renewing the leases of a worker every third of lease_seconds"""
+
+    def __init__(self, queue, lease_seconds):
+        self._queue = queue
+        self._lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._leases = set()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lease-keeper", daemon=True)
+        self._thread.start()
+
+    def hold(self, lease):
+        with self._lock:
+            self._leases.add(lease)
+
+    def drop(self, lease):
+        with self._lock:
+            self._leases.discard(lease)
+
+    def renew_all(self):
+        with self._lock:
+            leases = list(self._leases)
+        for lease in leases:
+            try:
+                renewed = self._queue.renew(lease, self._lease_seconds)
+            except Exception as e:
+                # the lease stays valid until it expires, the next heartbeat tries again
+                logger.warning(f"Could not renew the lease on partition {lease.partition.name}: {str(e)}")
+                renewed = time.time() < lease.expires
+            if not renewed:
+                lease.lost = True
+                self.drop(lease)
+                logger.warning(f"Lost the lease on partition {lease.partition.name}, another worker continues it")
+
+    def _run(self):
+        while not self._stopped.wait(self._lease_seconds / 3):
+            self.renew_all()
+
+    def close(self):
+        self._stopped.set()
+        self._thread.join()
+
+
+class LeasedProgress(object):
+    """
+    ExportProgress of a worker that also stops the export of one partition once its lease is lost, or once
+    all workers together committed max_rows documents
+    """
+
+    def __init__(self, progress, lease, queue=None, max_rows=None):
+        self._progress = progress
+        self._lease = lease
+        self._queue = queue
+        self._max_rows = max_rows
+
+    def __getattr__(self, name):
+        return getattr(self._progress, name)
+
+    @property
+    def stopped(self):
+        return self._progress.stopped or self._lease.lost
+
+    def limit_reached(self):
+        if self._progress.limit_reached():
+            return True
+        return self._max_rows is not None and self._queue.exported_docs() >= self._max_rows
+
+    def should_stop(self):
+        return self.stopped or self.limit_reached()
@@ -0,0 +1,133 @@
+import fnmatch
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import get_custom_logger
+from migrate.export import RequestBudget
+from migrate.solr2os_migrate import Solr2OSMigrate
+from opensearch.opensearch_client import OpenSearchClient
+from reports.report import Report
+from solr.solr_client import SolrClient
+
+logger = get_custom_logger("migrate.orchestrator")
+
+GLOB_CHARACTERS = "*?["
+
+
+class MigrationOrchestrator(object):
+    """
+    Migrates the schema and data of many Solr collections in one process. Collections run in parallel, the
+    largest first so that the longest job does not start last, and the Solr requests, S3 calls and OpenSearch
+    package API calls of all of them share one budget each, so adding collections does not multiply the load
+    on any service. One consolidated report lists every collection.
+    """
+
+    def __init__(self, config, solr_client_factory=SolrClient, opensearch_client_factory=OpenSearchClient,
+                 migrator_factory=Solr2OSMigrate):
+        """
+        :param config: the whole migrate.toml; [solr] and [opensearch] are the templates of every collection
+        """
+        self._config = config
+        self._solr_client_factory = solr_client_factory
+        self._opensearch_client_factory = opensearch_client_factory
+        self._migrator_factory = migrator_factory
+        orchestration = config.get('orchestration', {})
+        self._max_parallel = max(1, orchestration.get('max_parallel_collections', 4))
+        self._index_name_template = orchestration.get('index_name_template', '{collection}')
+        self._output_dir = orchestration.get('output_dir', 'migration_schema')
+        self.solr_budget = RequestBudget("Solr requests", orchestration.get('solr_max_concurrent_requests', 16))
+        self.s3_budget = RequestBudget("S3 calls", orchestration.get('s3_max_concurrent_puts', 32))
+        self.package_budget = RequestBudget("OpenSearch package API calls",
+                                            orchestration.get('package_api_max_concurrent', 2))
+
+    def _solr_client(self, collection):
+        client = self._solr_client_factory(dict(self._config['solr'], collection=collection))
+        client.set_request_budget(self.solr_budget)
+        return client
+
+    def resolve_collections(self, patterns):
+        """
+        :param patterns: collection names and glob patterns such as "logs_*"
+        :return: matching collection names in the order of the patterns, without duplicates
+        """
+        available = None
+        collections = []
+        for pattern in patterns:
+            if any(character in pattern for character in GLOB_CHARACTERS):
+                if available is None:
+                    available = sorted(self._solr_client(self._config['solr']['collection']).list_collections())
+                matched = fnmatch.filter(available, pattern)
+                if not matched:
+                    logger.warning(f"No Solr collection matches {pattern}")
+            else:
+                matched = [pattern]
+            collections.extend(name for name in matched if name not in collections)
+        return collections
+
+    def plan(self, collections):
+        """
+        Size every collection and order them longest job first
+        :return: list of (collection, solr client, document count), largest first
+        """
+        jobs = []
+        for collection in collections:
+            client = self._solr_client(collection)
+            jobs.append((collection, client, client.count()))
+        jobs.sort(key=lambda job: job[2], reverse=True)
+        logger.info("Migration order: " + ", ".join(f"{name} ({docs} docs)" for name, _, docs in jobs))
+        return jobs
+
+    def run(self, patterns):
+        """
+        Migrate every collection matching patterns and write orchestration_report.html to the output directory
+        :return: one result dict per collection, in the order they were started
+        """
+        collections = self.resolve_collections(patterns)
+        if not collections:
+            logger.warning("No collections to migrate")
+            return []
+        jobs = self.plan(collections)
+        started = time.monotonic()
+        # the executor starts queued jobs in submission order, so the largest collections are started first
+        with ThreadPoolExecutor(max_workers=self._max_parallel, thread_name_prefix="collection") as executor:
+            results = list(executor.map(self._migrate_collection, jobs))
+        seconds = round(time.monotonic() - started, 1)
+        report_path = f"{self._output_dir}/orchestration_report.html"
+        Report.orchestration_report(report_path, results, self.budget_stats(), seconds)
+        failed = sum(1 for result in results if result["status"] != "completed")
+        logger.info(f"Migrated {len(results) - failed} of {len(results)} collections in {seconds}s, "
+                    f"report at {report_path}")
+        return results
+
+    def budget_stats(self):
+        return [budget.stats() for budget in (self.solr_budget, self.s3_budget, self.package_budget)]
+
+    def _migrate_collection(self, job):
+        collection, solr_client, docs = job
+        index = self._index_name_template.format(collection=collection)
+        prefix = f"{self._output_dir}/{collection}"
+        result = {"collection": collection, "index": index, "docs": docs, "exported": 0, "errors": 0,
+                  "seconds": 0.0, "status": "completed", "error": None}
+        started = time.monotonic()
+        logger.info(f"Migrating collection {collection} ({docs} docs) to index {index}")
+        try:
+            os.makedirs(prefix, exist_ok=True)
+            opensearch_client = self._opensearch_client_factory(dict(self._config['opensearch'], index=index))
+            opensearch_client.set_api_budgets(package_budget=self.package_budget, s3_budget=self.s3_budget)
+            data_config = self._config.get('data_migration', {})
+            migrator = self._migrator_factory(solr_client, opensearch_client, self._config['migration'],
+                                              data_config, s3_budget=self.s3_budget)
+            if self._config['migration'].get('migrate_schema', False):
+                migrator.migrate_schema(prefix)
+            if data_config.get('migrate_data', False):
+                if not migrator.export_data(prefix):
+                    result["status"] = "failed"
+                report = migrator.report
+                result.update(exported=report.data_migration_docs_exported, errors=report.data_migration_errors)
+        except Exception as e:
+            logger.error(f"Migration of collection {collection} failed: {str(e)}")
+            result.update(status="failed", error=str(e))
+        result["seconds"] = round(time.monotonic() - started, 1)
+        logger.info(f"Collection {collection} {result['status']} in {result['seconds']}s")
+        return result
@@ -1,10 +1,28 @@
 import boto3
 import json
-import re
-import requests
+import os
+import signal
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
 from reports.report import Report
 from migrate.copy_field.copy_field_helper import CopyFieldHelper
+from migrate.export import (CHILD_TRANSFORMER, CHILD_TRANSFORMER_LIMIT, DEFAULT_SHARDS_PREFERENCE, EXTRA, MISSING,
+                            PIPELINE_COMPRESSIONS, AdaptivePageSizer, AimdController, BatchWriter, BinaryFieldFixer,
+                            BucketChecksums, BudgetedClient, ChildStitcher, DeadLetterStore, DeltaWatermark,
+                            ExportFieldPlan, ExportJournal, ExportPartition, ExportPipeline, ExportProgress,
+                            ExportTelemetry, FieldProjection, LeaseKeeper, LeasedProgress, LocalDirectorySink,
+                            NestedStats, OpenSearchBulkSink, PartitionCheckpoint, PartitionException, PartitionState,
+                            PipelineStage, QueueJournal, ReconcileException, RetryPolicy, RollingS3Sink, S3BatchSink,
+                            SpillBuffer, StreamingDocsParser, SyncMetrics, TeeSink, WorkStealingPool, build_partitions,
+                            delta_filter_query, diff_buckets, export_batches, export_targets, extract_next_cursor_mark,
+                            merge_sorted_ids, merge_stored_fields, open_delta_window, open_work_queue,
+                            parallel_search_expression, read_id_chunks, resume_filter_query, shard_partitions,
+                            uncached_params, uncached_query)
 from migrate.dynamic_field.dynamic_field_helper import DynamicFieldHelper
 from migrate.fields.field_helper import FieldHelper, FieldException
 from migrate.fieldtype.field_type_helper import FieldTypeHelper, FieldTypeException
@@ -16,7 +34,10 @@ logger = get_custom_logger("migrate.solr2os_migrate")
 
 class Solr2OSMigrate:
 
-    def __init__(self, solrclient, opensearchclient, schema_config, data_config):
+    def __init__(self, solrclient, opensearchclient, schema_config, data_config, s3_budget=None):
+        """
+        :param s3_budget: optional RequestBudget for the S3 calls of the export, shared with other collections
+        """
         self._schema_config = schema_config
         self._data_config = data_config
         self._solr_client = solrclient
@@ -26,12 +47,27 @@ class Solr2OSMigrate:
         self._dynamic_field_service = DynamicFieldHelper(self._solr_client, self._opensearch_client,
                                                          self._field_type_service)
         self._report = Report()
+        self._binary_field_fixer = None
+        self._projection = None
+        self._delta = None
+        self._export_plan = None
+        self._nested = None
+        self._nested_stats = NestedStats()
+        self._telemetry = ExportTelemetry()
+        self._spill_buffer = None
+        self._concurrency = None
+        self._retry = RetryPolicy.from_config(self._data_config)
+        self._dead_letters = None
+        self._key_suffix = ""
+        self._binary_fields = []
         self._s3_client = None
         if self._data_config.get('migrate_data', False):
             region = self._data_config['region']
             # Explicitly set the region for the S3 client
             session = boto3.session.Session(region_name=region)
             self._s3_client = session.client('s3')
+            if s3_budget is not None:
+                self._s3_client = BudgetedClient(self._s3_client, s3_budget)
 
     def _migrate_field_types(self):
         """
@@ -131,14 +167,15 @@ class Solr2OSMigrate:
 
     def _fix_binary_fields_in_json(self, response_text, binary_fields):
         """Fix unquoted binary field values in JSON response"""
-        if binary_fields:
-            for field in binary_fields:
-                pattern = rf'"{field}":([^",:}}\s]+)'
-                replacement = rf'"{field}":"\1"'
-                response_text = re.sub(pattern, replacement, response_text)
-        return response_text
+        if not binary_fields:
+            return response_text
+        fixer = self._binary_field_fixer
+        if fixer is None or fixer.fields != tuple(binary_fields):
+            fixer = BinaryFieldFixer(binary_fields)
+            self._binary_field_fixer = fixer
+        return fixer.fix(response_text)
 
-    def _export_data_to_s3(self):
+    def _export_data_to_s3(self, file_path_prefix="migration_schema", resume=False):
         """
         Export Solr data to S3 
         """
@@ -147,85 +184,575 @@ class Solr2OSMigrate:
             return
 
         logger.info("Starting Solr data export to S3 using two-query approach")
-        self._export_regular_data()
+        self._export_regular_data(file_path_prefix, resume)
 
-    def _export_regular_data(self):
+    def _get_unique_key(self):
+        """Get the uniqueKey field name from schema"""
+        try:
+            return self._solr_client.read_schema().get('uniqueKey') or 'id'
+        except Exception as e:
+            logger.warning(f"Could not read uniqueKey from schema, using id: {str(e)}")
+            return 'id'
+
+    def _open_delta_window(self, watermark):
         """
-        Regular export for non-nested documents with binary field support
+        Choose the documents of a delta run: changed after the stored watermark, up to the current maximum.
+        The maximum is read before the export starts, so documents changed during the run are exported again
+        by the next run instead of being missed.
         """
-        solr_config = self._solr_client.get_config()
-        rows_per_page = self._data_config.get('rows_per_page', 500)
-        max_rows = self._data_config.get('max_rows', 100000)
-        s3_bucket = self._data_config.get('s3_export_bucket')
+        lower = watermark.load()
+        upper = self._solr_client.max_value(watermark.field)
         s3_prefix = self._data_config.get('s3_export_prefix', 'solr-data/')
+        window = open_delta_window(watermark.field, lower, upper, s3_prefix)
+        if lower is None:
+            logger.info(f"No watermark for {watermark.field}, running the base export up to {upper}")
+        else:
+            logger.info(f"Exporting documents with {watermark.field} in ({lower}, {upper}] "
+                        f"under {window['s3_export_prefix']}")
+        return window
 
-        query_url = f"{solr_config['host']}:{solr_config['port']}/solr/{solr_config['collection']}/select"
-        auth = None
-        if solr_config.get('username') and solr_config.get('password'):
-            auth = (solr_config['username'], solr_config['password'])
+    def _export_fingerprint(self, unique_key, partitions):
+        """Settings that must not change between an interrupted export and its resumption"""
+        return {
+            "collection": self._solr_client.get_config()['collection'],
+            "unique_key": unique_key,
+            "partitions": [[partition.name, partition.filter_query] for partition in partitions],
+            "s3_export_bucket": self._data_config.get('s3_export_bucket'),
+            "s3_export_prefix": self._data_config.get('s3_export_prefix', 'solr-data/'),
+            "export_format": self._data_config.get('export_format', 'json'),
+            "export_compression": self._data_config.get('export_compression', 'none'),
+            "rolling_objects": self._data_config.get('rolling_objects', False),
+            "export_target": self._data_config.get('export_target', 's3'),
+            "delta": self._delta,
+            "export_engine": self._data_config.get('export_engine', 'select') if self._export_plan else 'select',
+        }
 
-        binary_fields = self._get_binary_fields()
-        logger.info(f"Identified binary fields: {binary_fields}")
+    @staticmethod
+    def _install_stop_handlers(progress):
+        """
+        Drain the export on SIGINT/SIGTERM: stop fetching new pages, finish writing the pages already fetched
+        and journal them. A second signal gets the previous handler.
+        :return: the previous handlers, to be restored with signal.signal
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return {}
+
+        def stop(signum, frame):
+            logger.warning(f"Received {signal.Signals(signum).name}, draining in-flight batches before stopping")
+            progress.stop()
+            for restored_signal, handler in previous.items():
+                signal.signal(restored_signal, handler)
+
+        previous = {}
+        for stop_signal in (signal.SIGINT, signal.SIGTERM):
+            previous[stop_signal] = signal.signal(stop_signal, stop)
+        return previous
+
+    def _export_regular_data(self, file_path_prefix="migration_schema", resume=False):
+        """
+        Regular export for non-nested documents with binary field support.
+        The collection is split into partitions that are exported in parallel when export_partitions > 1.
+        Committed batches are journaled so that an interrupted export can be resumed.
+        """
+        max_rows = self._data_config.get('max_rows', 100000)
+        targets = export_targets(self._data_config)
+        if 'opensearch' in targets:
+            logger.info(f"Indexing documents directly into OpenSearch index {self._opensearch_client.index_name}")
+        if targets != ['opensearch']:
+            export_format = self._data_config.get('export_format', 'json')
+            export_compression = self._data_config.get('export_compression', 'none')
+            BatchWriter.validate(export_format, export_compression)
+            logger.info(f"Writing batches as {export_format} with {export_compression} compression, deploy the "
+                        f"pipeline with -c exportFormat={export_format} -c exportCompression={export_compression}")
+            if export_compression not in PIPELINE_COMPRESSIONS:
+                logger.warning(f"The OSIS pipeline S3 source cannot read {export_compression} compressed batches")
+
+        binary_fields, unique_key = self._load_export_fields()
+        self._dead_letters = DeadLetterStore(self._data_config.get('dead_letter_file',
+                                                                   f"{file_path_prefix}/dead_letter.jsonl"))
+        self._export_plan = None
+        if self._data_config.get('export_engine', 'select') != 'select':
+            self._export_plan = ExportFieldPlan.from_config(self._data_config, self._solr_client.read_schema(),
+                                                            unique_key, self._projection)
+        partitions = self._build_partitions(unique_key)
+        workers = self._data_config.get('export_workers', len(partitions)) if len(partitions) > 1 else 1
+        self._solr_client.configure_export_transport(min(workers, len(partitions)))
+        self._concurrency = AimdController.from_config(self._data_config, min(workers, len(partitions)))
+        self._solr_client.set_request_governor(self._concurrency)
+
+        journal = ExportJournal(f"{file_path_prefix}/export_journal.jsonl")
+        watermark = None
+        self._delta = None
+        if self._data_config.get('delta_export', False):
+            watermark = DeltaWatermark(f"{file_path_prefix}/export_watermark.json",
+                                       self._data_config.get('delta_field', 'last_modified'))
+            if resume:
+                # a resumed delta run keeps the window it was started with
+                self._delta = (journal.read_fingerprint() or {}).get("delta")
+            if self._delta is None:
+                self._delta = self._open_delta_window(watermark)
+        fingerprint = self._export_fingerprint(unique_key, partitions)
+        if resume:
+            states = journal.resume(fingerprint)
+            logger.info(f"Resuming export from {journal.path}")
+        else:
+            journal.start(fingerprint)
+            states = {}
 
         # Get total document count
-        params = {'q': '*:*', 'rows': 0, 'wt': 'json'}
-        response = requests.get(query_url, params=params, auth=auth, timeout=30)
-        response.raise_for_status()
-        total_docs = response.json()['response']['numFound']
+        count_fqs = [fq for fq in (delta_filter_query(self._delta),
+                                   self._nested.parent_filter_query if self._nested else None) if fq]
+        total_docs = self._solr_client.count(filter_queries=count_fqs) if count_fqs else self._solr_client.count()
         
         logger.info(f"Found {total_docs} documents")
+
+        progress = ExportProgress(limit=min(total_docs, max_rows),
+                                  exported_docs=sum(state.docs for state in states.values()),
+                                  batch_count=max((state.last_batch for state in states.values()), default=0))
+
+        completed = []
+        errors_before = self._report.data_migration_errors
+        self._telemetry = ExportTelemetry(self._data_config.get('telemetry_interval_seconds', 10),
+                                          self._data_config.get('slowest_batches', 10))
+        if self._data_config.get('pipeline', False) and self._export_plan is None:
+            # one budget for the pages of all partitions
+            self._spill_buffer = SpillBuffer.from_config(self._data_config, f"{file_path_prefix}/spill")
+
+        def export_partition(partition):
+            state = states.get(partition.name) or PartitionState(partition.name)
+            if self._export_partition(partition, binary_fields, unique_key, progress, journal, state):
+                completed.append(partition.name)
+
+        previous_handlers = self._install_stop_handlers(progress)
+        try:
+            if len(partitions) == 1:
+                export_partition(partitions[0])
+            else:
+                logger.info(f"Exporting {len(partitions)} partitions with {workers} workers")
+                for partition, error in WorkStealingPool(workers).run(partitions, export_partition):
+                    self._report.add_data_migration_error(f"Error exporting partition {partition.name}: {str(error)}")
+        finally:
+            for stop_signal, handler in previous_handlers.items():
+                signal.signal(stop_signal, handler)
+            journal.close()
+            if self._spill_buffer is not None:
+                self._spill_buffer.close()
+                self._report.update_buffer_stats(**self._spill_buffer.stats())
+                self._spill_buffer = None
+            if self._concurrency is not None:
+                self._solr_client.set_request_governor(None)
+                self._report.update_concurrency_stats(**self._concurrency.stats())
+                self._concurrency = None
+        if self._nested is not None:
+            self._report_nested_stats()
+        self._report.update_telemetry(self._telemetry.summary())
+        if self._dead_letters.count:
+            self._report.add_data_migration_error(
+                f"{self._dead_letters.count} documents could not be read and were written to "
+                f"{self._dead_letters.path}, export them with --replay-dead-letters once the cause is fixed")
+        self._report.update_recovery_stats(self._retry.retries, self._dead_letters.count)
+
+        # Update final report
+        self._report.update_data_migration_stats(
+            enabled=True,
+            total=total_docs,
+            exported=progress.exported_docs,
+            batches=progress.batch_count,
+            status="stopped" if progress.stopped else "resumed" if resume else "completed"
+        )
         
-        exported_docs = 0
-        batch_count = 0
-        cursor_mark = "*"
-        
-        while exported_docs < min(total_docs, max_rows):
-            batch_count += 1
-            logger.info(f"Processing batch {batch_count} with cursor {cursor_mark}")
+        if progress.stopped:
+            logger.warning(f"Data export stopped after {progress.exported_docs} documents, run with --resume to "
+                           f"continue from {journal.path}")
+            print(f"\n=== DATA MIGRATION STOPPED ===")
+            print(f"Total documents exported: {progress.exported_docs}")
+            print(f"Run again with --resume to continue")
+            print(f"==============================\n")
+            return
+        if watermark is not None:
+            # the run also stops once the counted documents are exported, before the cursors see their end
+            exported_all = len(completed) == len(partitions) or progress.exported_docs >= total_docs
+            if exported_all and self._report.data_migration_errors == errors_before:
+                watermark.save(self._delta["upper"])
+                logger.info(f"Advanced {watermark.field} watermark to {self._delta['upper']}")
+            else:
+                logger.warning(f"Export incomplete, {watermark.field} watermark stays at {self._delta['lower']}")
+        logger.info(f"Completed regular data export: {progress.exported_docs} documents")
+        print(f"\n=== DATA MIGRATION COMPLETE ===")
+        print(f"Total documents exported: {progress.exported_docs}")
+        print(f"================================\n")
+
+    def _load_export_fields(self):
+        """
+        Read binary fields, uniqueKey, field projection and nested document handling of the collection
+        :return: tuple of (binary fields, uniqueKey)
+        """
+        binary_fields = self._get_binary_fields()
+        self._binary_fields = binary_fields
+        logger.info(f"Identified binary fields: {binary_fields}")
+
+        unique_key = self._get_unique_key()
+        self._projection = FieldProjection.from_config(self._data_config, self._opensearch_client.get_index_json(),
+                                                       unique_key)
+        self._nested = ChildStitcher.from_config(self._data_config, self._solr_client.read_schema(), unique_key)
+        return binary_fields, unique_key
+
+    def _build_partitions(self, unique_key):
+        """Split the collection into the partitions of partition_mode"""
+        if self._data_config.get('partition_mode') == 'shard':
+            return shard_partitions(self._solr_client.cluster_status(), self._solr_client.get_config()['collection'],
+                                    self._data_config.get('shards_preference', DEFAULT_SHARDS_PREFERENCE))
+        return build_partitions(self._data_config, unique_key)
+
+    def _page_params(self, partition, unique_key, cursor_mark, rows=None):
+        """Build the cursor query parameters for one page of a partition"""
+        params = {
+            'q': '{!parent which="*:* -_nest_path_:*"}',
+            'fl': self._field_list(),
+            'sort': f'{unique_key} asc',
+            'cursorMark': cursor_mark,
+            'rows': rows or self._data_config.get('rows_per_page', 500),
+            'wt': 'json'
+        }
+        filter_queries = [fq for fq in (partition.filter_query, delta_filter_query(self._delta)) if fq]
+        if filter_queries:
+            params['fq'] = filter_queries if len(filter_queries) > 1 else filter_queries[0]
+        if partition.core_url:
+            params['distrib'] = 'false'
+        return self._uncached(params)
+
+    def _uncached(self, params):
+        """
+        Mark the queries of an export request cache=false, so a full scan does not evict the entries of the
+        production traffic from Solr's filterCache and queryResultCache, unless export_query_cache is set
+        """
+        if self._data_config.get('export_query_cache', False):
+            return params
+        return uncached_params(params)
+
+    def _field_list(self):
+        """fl of parent documents, with the [child] transformer unless children are fetched in bulk"""
+        if self._nested is not None:
+            return self._projection.flat_field_list if self._projection else '*'
+        return self._projection.field_list if self._projection else f'*,{CHILD_TRANSFORMER}'
+
+    def _project(self, docs):
+        """Attach the children of a page and apply the field projection to its documents"""
+        if self._nested is not None:
+            docs = self._fetch_children(list(docs))
+        if self._projection is None:
+            return docs
+        return self._projection.apply_all(docs)
+
+    def _fetch_children(self, parents):
+        """
+        Read all children of a page of parents, at any depth, with cursorMark paging over one query on the root
+        field and attach them to their parents. Memory is bounded by the children of one page of parents.
+        """
+        if not parents:
+            return parents
+        nested = self._nested
+        separator = "\x1f"
+        keys = separator.join(str(parent[nested.unique_key]) for parent in parents)
+        params = {
+            'q': f"{{!terms f={nested.root_field} separator='{separator}'}}{keys}",
+            'fq': nested.child_filter_query,
+            'fl': f"*,{nested.nest_path},{nested.root_field}",
+            'sort': f'{nested.unique_key} asc',
+            'rows': self._data_config.get('child_rows_per_page', 1000),
+            'wt': 'json'
+        }
+        params = self._uncached(params)
+        children = []
+        cursor_mark = '*'
+        while True:
+            params['cursorMark'] = cursor_mark
+            response = self._solr_client.select(params, post=True)
+            page = json.loads(self._fix_binary_fields_in_json(response.text, self._binary_fields))
+            children.extend(page['response']['docs'])
+            next_cursor_mark = page.get('nextCursorMark')
+            if not page['response']['docs'] or next_cursor_mark in (None, cursor_mark):
+                break
+            cursor_mark = next_cursor_mark
+        child_counts, orphans = nested.stitch(parents, children)
+        self._nested_stats.add(child_counts, orphans)
+        if orphans:
+            error_msg = f"Dropped {orphans} child documents whose parent is not in the page"
+            logger.error(error_msg)
+            self._report.add_data_migration_error(error_msg)
+        return parents
+
+    def _report_nested_stats(self):
+        stats = self._nested_stats
+        logger.info(f"Exported {stats.children} child documents of {stats.parents} parents, "
+                    f"at most {stats.max_children} per parent")
+        if stats.wide_parents:
+            logger.warning(f"{stats.wide_parents} parents have more than {CHILD_TRANSFORMER_LIMIT} children, "
+                           f"the [child] transformer would have truncated them")
+        self._report.update_nested_stats(stats.parents, stats.children, stats.max_children, stats.wide_parents,
+                                         stats.orphans)
+
+    def _create_sink(self, partition, unique_key, on_commit, state):
+        """
+        Create the sink that receives the documents of one partition; with several export targets a tee
+        writes the same read pass to a sink per target
+        """
+        targets = export_targets(self._data_config)
+        if len(targets) == 1:
+            return self._create_target_sink(targets[0], partition, unique_key, on_commit, state)
+        logger.info(f"Writing partition {partition.name} to {', '.join(targets)}")
+        factories = [lambda on_commit, target=target: self._create_target_sink(target, partition, unique_key,
+                                                                               on_commit, state)
+                     for target in targets]
+        return TeeSink(factories, on_commit=on_commit,
+                       queue_depth=self._data_config.get('tee_queue_depth', 4))
+
+    def _create_target_sink(self, target, partition, unique_key, on_commit, state):
+        sink = self._build_target_sink(target, partition, unique_key, on_commit, state)
+        sink.telemetry = self._telemetry
+        return sink
+
+    def _build_target_sink(self, target, partition, unique_key, on_commit, state):
+        if target == 'opensearch':
+            if self._projection is not None:
+                unique_key = self._projection.target_name(unique_key)
+            return OpenSearchBulkSink(self._opensearch_client, unique_key, self._data_config, on_commit=on_commit)
+        collection = self._solr_client.get_config()['collection'] + self._key_suffix
+        if self._delta is not None:
+            s3_prefix = self._delta['s3_export_prefix']
+        else:
+            s3_prefix = self._data_config.get('s3_export_prefix', 'solr-data/')
+        if target == 'local':
+            return LocalDirectorySink(self._data_config.get('local_export_dir', 'solr-export'),
+                                      f"{s3_prefix}{collection}", self._data_config, on_commit=on_commit)
+        s3_bucket = self._data_config.get('s3_export_bucket')
+        if self._data_config.get('rolling_objects', False):
+            return RollingS3Sink(self._s3_client, s3_bucket, f"{s3_prefix}{collection}_{partition.name}",
+                                 self._data_config, on_commit=on_commit, resume_keys=state.keys)
+        return S3BatchSink(self._s3_client, s3_bucket, f"{s3_prefix}{collection}", self._data_config,
+                           on_commit=on_commit)
+
+    def _report_sink(self, sink, partition):
+        """Add the objects and indexing failures of a partition sink to the report"""
+        self._report.add_exported_objects(sink.objects)
+        for target_sink in getattr(sink, 'sinks', [sink]):
+            if isinstance(target_sink, OpenSearchBulkSink):
+                for failure in target_sink.failures:
+                    self._report.add_data_migration_error(
+                        f"Could not index document {failure['id']}: {failure['status']} {failure['error']}")
+                logger.info(f"Indexed {target_sink.indexed_docs} documents of partition {partition.name} in "
+                            f"{target_sink.requests} bulk requests with {target_sink.retries} retries")
+
+    def _export_partition(self, partition, binary_fields, unique_key, progress, journal, state):
+        """
+        Export one partition with its own cursorMark loop, starting from its last committed cursorMark
+        :return: True when the whole partition is exported
+        """
+        if state.done:
+            logger.info(f"Skipping partition {partition.name}, already exported {state.docs} documents")
+            return True
+        if state.batches:
+            logger.info(f"Resuming partition {partition.name} after {state.docs} documents "
+                        f"with cursor {state.cursor_mark}")
+        started = time.monotonic()
+        complete = False
+        checkpoint = PartitionCheckpoint(journal, partition.name)
+        sink = self._create_sink(partition, unique_key, checkpoint.committed, state)
+        try:
+            if self._export_plan is not None:
+                partition_docs, partition_batches = self._export_partition_export_handler(
+                    partition, binary_fields, unique_key, progress, sink, checkpoint, state.cursor_mark)
+            elif self._data_config.get('pipeline', False):
+                partition_docs, partition_batches = self._export_partition_pipelined(
+                    partition, binary_fields, unique_key, progress, sink, checkpoint, state.cursor_mark)
+            else:
+                partition_docs, partition_batches = self._export_partition_sequential(
+                    partition, binary_fields, unique_key, progress, sink, checkpoint, state.cursor_mark)
+        finally:
+            try:
+                sink.close()
+                complete = checkpoint.close()
+            except Exception as e:
+                self._report.add_data_migration_error(f"Error closing sink of partition {partition.name}: {str(e)}")
+            self._report_sink(sink, partition)
+
+        elapsed = time.monotonic() - started
+        self._report.add_partition_stats(partition.name, partition_docs, partition_batches, elapsed)
+        logger.info(f"Completed partition {partition.name}: {partition_docs} documents in {elapsed:.2f}s")
+        return complete
+
+    def _export_page(self, batch_count, params, unique_key, binary_fields, sink, sizer, core_url=None):
+        """
+        Fetch one page, parse it as a whole and write its documents to the sink.
+        A page that cannot be fetched or parsed is fetched again with backoff; when it still cannot be parsed,
+        it is bisected to dead-letter the documents that break it and the rest of the page is exported.
+        :param core_url: shard replica core to read from instead of the collection
+        :return: tuple of (number of documents, nextCursorMark)
+        :raises json.JSONDecodeError: when not even the uniqueKey of a broken document can be read
+        """
+        response_bytes = 0
+
+        def fetch():
+            nonlocal response_bytes
+            started = time.monotonic()
+            response = self._solr_client.select(params, core_url=core_url)
+            seconds = time.monotonic() - started
+            self._telemetry.stage("solr", seconds, batch_count)
+            started = time.monotonic()
+            response_text = self._fix_binary_fields_in_json(response.text, binary_fields)
+            response_bytes = len(response_text)
+            batch_data = json.loads(response_text)
+            self._telemetry.stage("parse", time.monotonic() - started, batch_count)
+            sizer.observe(batch_count, len(batch_data['response']['docs']), response_bytes, seconds)
+            return batch_data
+
+        try:
+            batch_data = self._retry.call(fetch, f"Batch {batch_count}")
+            docs, next_cursor_mark = batch_data['response']['docs'], batch_data.get('nextCursorMark')
+        except json.JSONDecodeError as e:
+            docs, next_cursor_mark = self._bisect_page(batch_count, params, unique_key, binary_fields, core_url, e)
+        if docs:
+            # Export batch to S3
+            started = time.monotonic()
+            sink.write_batch(batch_count, self._project(docs))
+            self._telemetry.stage("write", time.monotonic() - started, batch_count)
+        self._telemetry.finish_batch(batch_count, len(docs), response_bytes)
+        return len(docs), next_cursor_mark
+
+    def _bisect_page(self, batch_count, params, unique_key, binary_fields, core_url, error):
+        """
+        Read a page that does not parse in smaller and smaller windows of rows from its cursorMark, down to
+        single documents, and dead-letter the documents that still do not parse
+        :return: tuple of (documents that parse, nextCursorMark after the page)
+        :raises json.JSONDecodeError: when the uniqueKey of a broken document cannot be read
+        """
+        rows = int(params.get('rows', 1))
+        logger.warning(f"Batch {batch_count} does not parse ({error}), bisecting its {rows} rows")
+        docs = []
+        cursor_mark = params['cursorMark']
+        next_cursor_mark = cursor_mark
+        # windows still to read, the next one last
+        windows = [rows]
+        while windows:
+            rows = windows.pop()
+            window_params = dict(params, cursorMark=cursor_mark, rows=rows)
+            response_text = self._retry.call(
+                lambda: self._solr_client.select(window_params, core_url=core_url).text, f"Batch {batch_count}")
+            try:
+                window = json.loads(self._fix_binary_fields_in_json(response_text, binary_fields))
+            except json.JSONDecodeError as e:
+                if rows > 1:
+                    windows.extend([rows - rows // 2, rows // 2])
+                    continue
+                next_cursor_mark = self._dead_letter_document(batch_count, window_params, unique_key, core_url,
+                                                              response_text, e)
+            else:
+                docs.extend(window['response']['docs'])
+                next_cursor_mark = window.get('nextCursorMark', cursor_mark)
+                if not window['response']['docs']:
+                    break
+            cursor_mark = next_cursor_mark
+        return docs, next_cursor_mark
+
+    def _dead_letter_document(self, batch_count, params, unique_key, core_url, response_text, error):
+        """
+        Write a single document that does not parse to the dead-letter store
+        :return: nextCursorMark after the document, read with a request for its uniqueKey only
+        """
+        id_params = dict(params, fl=unique_key, rows=1)
+        id_response = json.loads(self._retry.call(
+            lambda: self._solr_client.select(id_params, core_url=core_url).text, f"Batch {batch_count}"))
+        docs = id_response['response']['docs']
+        doc_id = docs[0][unique_key] if docs else None
+        self._dead_letters.add(doc_id, batch_count, params['cursorMark'], error, response_text)
+        return id_response.get('nextCursorMark', params['cursorMark'])
+
+    def _export_page_streaming(self, batch_count, params, binary_fields, sink, sizer, core_url=None):
+        """
+        Fetch one page and parse its documents one at a time while they are read from the socket,
+        handing each document straight to the sink.
+        The page time measured for the sizer includes writing to the sink, which overlaps with reading;
+        telemetry records the time to the response headers as solr and the rest as stream.
+        :return: tuple of (number of documents, nextCursorMark)
+        """
+        parser = StreamingDocsParser(lambda text: self._fix_binary_fields_in_json(text, binary_fields))
+        started = time.monotonic()
+        response = self._solr_client.select(params, stream=True, core_url=core_url)
+        headers_read = time.monotonic()
+        self._telemetry.stage("solr", headers_read - started, batch_count)
+        response_bytes = 0
+
+        def counted(chunks):
+            nonlocal response_bytes
+            for chunk in chunks:
+                response_bytes += len(chunk)
+                yield chunk
+
+        try:
+            chunks = response.iter_content(chunk_size=self._data_config.get('stream_chunk_bytes', 64 * 1024))
+            doc_count = sink.write_batch(batch_count, self._project(parser.iter_docs(counted(chunks))))
+            sizer.observe(batch_count, doc_count, response_bytes, time.monotonic() - started)
+            self._telemetry.stage("stream", time.monotonic() - headers_read, batch_count)
+            self._telemetry.finish_batch(batch_count, doc_count, response_bytes)
+            return doc_count, parser.next_cursor_mark
+        finally:
+            response.close()
+
+    def _export_partition_sequential(self, partition, binary_fields, unique_key, progress, sink, checkpoint,
+                                     cursor_mark="*"):
+        """
+        Fetch, parse and upload one page at a time
+        """
+        partition_docs = 0
+        partition_batches = 0
+        sizer = AdaptivePageSizer.from_config(self._data_config)
+
+        while not progress.should_stop():
+            batch_count = progress.next_batch()
+            checkpoint.fetched(batch_count)
+            partition_batches += 1
+            logger.info(f"Processing batch {batch_count} of partition {partition.name} with cursor {cursor_mark}")
+            self._telemetry.start_batch(batch_count, partition.name, cursor_mark)
             
             try:
-                params = {
-                    'q': '{!parent which="*:* -_nest_path_:*"}',
-                    'fl': '*,[child]',
-                    'sort': 'id asc',
-                    'cursorMark': cursor_mark,
-                    'rows': rows_per_page,
-                    'wt': 'json'
-                }
-                
-                response = requests.get(query_url, params=params, auth=auth, timeout=300)
-                response.raise_for_status()
+                params = self._page_params(partition, unique_key, cursor_mark, sizer.rows)
                 
                 # Handle JSON parsing with binary field support
                 try:
-                    response_text = self._fix_binary_fields_in_json(response.text, binary_fields)
-                    batch_data = json.loads(response_text)
+                    if self._data_config.get('stream_parse', False):
+                        try:
+                            doc_count, next_cursor_mark = self._export_page_streaming(
+                                batch_count, params, binary_fields, sink, sizer, partition.core_url)
+                        except Exception as e:
+                            # documents streamed before the error may reach the sink twice
+                            logger.warning(f"Streaming batch {batch_count} failed ({str(e)}), reading it again "
+                                           f"as a whole page")
+                            doc_count, next_cursor_mark = self._export_page(
+                                batch_count, params, unique_key, binary_fields, sink, sizer, partition.core_url)
+                    else:
+                        doc_count, next_cursor_mark = self._export_page(
+                            batch_count, params, unique_key, binary_fields, sink, sizer, partition.core_url)
                     
                 except json.JSONDecodeError as e:
+                    # the cursor cannot move past the page, fetching it again would not end
                     error_msg = f"JSON parsing error in batch {batch_count}: {str(e)}"
                     logger.error(error_msg)
                     self._report.add_data_migration_error(error_msg)
-                    continue
-                
-                docs = batch_data['response']['docs']
-                
-                if not docs:
+                    checkpoint.discard(batch_count)
                     break
                 
-                # Export batch to S3
-                s3_key = f"{s3_prefix}{solr_config['collection']}_batch_{batch_count}.json"
-                self._s3_client.put_object(
-                    Bucket=s3_bucket,
-                    Key=s3_key,
-                    Body=json.dumps(docs),
-                    ContentType='application/json'
-                )
+                if not doc_count:
+                    checkpoint.written(batch_count, 0, cursor_mark)
+                    checkpoint.exhausted()
+                    break
+                checkpoint.written(batch_count, doc_count, next_cursor_mark)
                 
-                exported_docs += len(docs)
-                logger.info(f"Exported {len(docs)} documents in batch {batch_count}")
+                progress.add_exported(doc_count)
+                partition_docs += doc_count
+                logger.info(f"Exported {doc_count} documents in batch {batch_count}")
                 
-                next_cursor_mark = batch_data.get('nextCursorMark')
                 if next_cursor_mark == cursor_mark:
+                    checkpoint.exhausted()
                     break
                 cursor_mark = next_cursor_mark
                 
@@ -234,19 +761,715 @@ class Solr2OSMigrate:
                 logger.error(error_msg)
                 self._report.add_data_migration_error(error_msg)
                 break
-        
-        # Update final report
-        self._report.update_data_migration_stats(
-            enabled=True,
-            total=total_docs,
-            exported=exported_docs,
-            batches=batch_count
+
+        return partition_docs, partition_batches
+
+    def _export_partition_export_handler(self, partition, binary_fields, unique_key, progress, sink, checkpoint,
+                                         last_key="*"):
+        """
+        Stream the partition in uniqueKey order from the /export handler, or from a parallel search streaming
+        expression, and cut the stream into batches of rows_per_page. The journaled position of a batch is its
+        last uniqueKey, so a resumed export continues after it.
+        """
+        plan = self._export_plan
+        filter_queries = [fq for fq in (partition.filter_query, delta_filter_query(self._delta),
+                                        self._nested.parent_filter_query if self._nested else None,
+                                        resume_filter_query(unique_key, last_key)) if fq]
+        if not self._data_config.get('export_query_cache', False):
+            filter_queries = [uncached_query(fq) for fq in filter_queries]
+        # a streaming expression reads the whole collection, a shard partition is exported from its core
+        if self._data_config.get('export_engine') == 'stream' and not partition.core_url:
+            expression = parallel_search_expression(self._solr_client.get_config()['collection'], plan,
+                                                    filter_queries, self._data_config.get('stream_workers', 1))
+            logger.info(f"Streaming partition {partition.name} with {expression}")
+            response = self._solr_client.stream_expression(expression)
+        else:
+            params = {'q': '*:*', 'sort': f'{unique_key} asc', 'fl': plan.export_fl, 'wt': 'json'}
+            if filter_queries:
+                params['fq'] = filter_queries
+            if partition.core_url:
+                params['distrib'] = 'false'
+            logger.info(f"Streaming partition {partition.name} from /export after {last_key}")
+            response = self._solr_client.export(params, core_url=partition.core_url)
+
+        partition_docs = 0
+        partition_batches = 0
+        response_bytes = 0
+
+        def counted(chunks):
+            nonlocal response_bytes
+            for chunk in chunks:
+                response_bytes += len(chunk)
+                yield chunk
+
+        try:
+            chunks = response.iter_content(chunk_size=self._data_config.get('stream_chunk_bytes', 64 * 1024))
+            docs_stream = StreamingDocsParser().iter_docs(counted(chunks))
+            # reading and parsing a batch from the stream is recorded as its solr time
+            started = time.monotonic()
+            batch_bytes = 0
+            for docs in export_batches(docs_stream, self._data_config.get('rows_per_page', 500)):
+                if progress.should_stop():
+                    break
+                batch_count = progress.next_batch()
+                partition_batches += 1
+                self._telemetry.start_batch(batch_count, partition.name, last_key)
+                self._telemetry.stage("solr", time.monotonic() - started, batch_count)
+                last_key = docs[-1][unique_key]
+                checkpoint.fetched(batch_count, last_key)
+                if plan.select_fl:
+                    started = time.monotonic()
+                    self._fetch_stored_fields(docs, unique_key, binary_fields)
+                    self._telemetry.stage("stored_fetch", time.monotonic() - started, batch_count)
+                started = time.monotonic()
+                sink.write_batch(batch_count, self._project(docs))
+                self._telemetry.stage("write", time.monotonic() - started, batch_count)
+                self._telemetry.finish_batch(batch_count, len(docs), response_bytes - batch_bytes)
+                batch_bytes = response_bytes
+                checkpoint.written(batch_count, len(docs))
+                progress.add_exported(len(docs))
+                partition_docs += len(docs)
+                logger.info(f"Exported {len(docs)} documents in batch {batch_count} of partition {partition.name}")
+                started = time.monotonic()
+            else:
+                checkpoint.exhausted()
+        except Exception as e:
+            error_msg = f"Error exporting partition {partition.name} after {partition_docs} documents: {str(e)}"
+            logger.error(error_msg)
+            self._report.add_data_migration_error(error_msg)
+        finally:
+            response.close()
+
+        return partition_docs, partition_batches
+
+    def _fetch_stored_fields(self, docs, unique_key, binary_fields):
+        """
+        Fill in the fields without docValues with one /select of the ids of an exported batch
+        """
+        # ids may contain commas, the default separator of the terms parser
+        separator = "\x1f"
+        keys = separator.join(str(doc[unique_key]) for doc in docs)
+        params = {
+            'q': f"{{!terms f={unique_key} separator='{separator}'}}{keys}",
+            'fl': self._export_plan.select_fl,
+            'rows': len(docs),
+            'wt': 'json'
+        }
+        response = self._solr_client.select(self._uncached(params), post=True)
+        stored_docs = json.loads(self._fix_binary_fields_in_json(response.text, binary_fields))['response']['docs']
+        merge_stored_fields(docs, stored_docs, unique_key)
+
+    def _export_partition_pipelined(self, partition, binary_fields, unique_key, progress, sink, checkpoint,
+                                    start_cursor_mark="*"):
+        """
+        Run fetch, parse and upload as pipeline stages connected by bounded queues.
+        The fetch stage reads nextCursorMark from the raw page and requests the next page while
+        earlier pages are still being parsed and uploaded.
+        With a spill buffer the fetch stage may run further ahead, holding pages within the byte budget of the
+        buffer and spilling the rest to disk.
+        """
+        partition_progress = ExportProgress()
+        buffer = self._spill_buffer
+        # the fetch stage reads rows while the parse stage observes pages, a few pages behind
+        sizer = AdaptivePageSizer.from_config(self._data_config)
+
+        def fetch():
+            cursor_mark = start_cursor_mark
+            # pages already queued are not counted yet, so the fetcher may run ahead of max_rows by the queue depth
+            while not progress.should_stop():
+                batch_count = progress.next_batch()
+                partition_progress.next_batch()
+                logger.info(f"Fetching batch {batch_count} of partition {partition.name} with cursor {cursor_mark}")
+                params = self._page_params(partition, unique_key, cursor_mark, sizer.rows)
+                self._telemetry.start_batch(batch_count, partition.name, cursor_mark)
+                started = time.monotonic()
+                response_text = self._retry.call(
+                    lambda: self._solr_client.select(params, core_url=partition.core_url).text,
+                    f"Batch {batch_count}")
+                seconds = time.monotonic() - started
+                self._telemetry.stage("solr", seconds, batch_count)
+                next_cursor_mark = extract_next_cursor_mark(response_text)
+                checkpoint.fetched(batch_count, next_cursor_mark)
+                if buffer is not None:
+                    page = buffer.put(response_text, lambda: pipeline.stopped)
+                    # the buffer holds the only reference while the fetcher waits for the next page
+                    response_text = None
+                    yield batch_count, page, seconds, params
+                else:
+                    yield batch_count, response_text, seconds, params
+                if next_cursor_mark is None:
+                    logger.error(f"No nextCursorMark in batch {batch_count}, stopping partition {partition.name}")
+                    return
+                if next_cursor_mark == cursor_mark:
+                    checkpoint.exhausted()
+                    return
+                cursor_mark = next_cursor_mark
+
+        def parse(item):
+            batch_count, response_text, seconds, params = item
+            started = time.monotonic()
+            if buffer is not None:
+                response_text = buffer.take(response_text)
+            try:
+                docs = json.loads(self._fix_binary_fields_in_json(response_text, binary_fields))['response']['docs']
+                sizer.observe(batch_count, len(docs), len(response_text), seconds)
+            except json.JSONDecodeError as e:
+                # the fetcher already moved on with the cursor read from the raw page
+                try:
+                    docs, _ = self._bisect_page(batch_count, params, unique_key, binary_fields, partition.core_url, e)
+                except Exception as bisect_error:
+                    # the batch stays uncommitted so the journal does not move past its documents, and the
+                    # error stops the pipeline as the sequential export stops the partition
+                    self._telemetry.finish_batch(batch_count, 0, len(response_text))
+                    raise PartitionException(name=partition.name,
+                                             reason=f"JSON parsing error in batch {batch_count}: {str(e)}, "
+                                                    f"bisecting failed: {bisect_error}")
+            if not docs:
+                checkpoint.written(batch_count, 0)
+                self._telemetry.finish_batch(batch_count, 0, len(response_text))
+                return None
+            docs = list(self._project(docs))
+            self._telemetry.stage("parse", time.monotonic() - started, batch_count)
+            return batch_count, docs, len(response_text)
+
+        def upload(item):
+            batch_count, docs, response_bytes = item
+            started = time.monotonic()
+            doc_count = sink.write_batch(batch_count, docs)
+            self._telemetry.stage("write", time.monotonic() - started, batch_count)
+            self._telemetry.finish_batch(batch_count, doc_count, response_bytes)
+            checkpoint.written(batch_count, doc_count)
+            progress.add_exported(doc_count)
+            partition_progress.add_exported(doc_count)
+            logger.info(f"Exported {doc_count} documents in batch {batch_count}")
+
+        if buffer is not None:
+            fetch_queue_depth = self._data_config.get('spill_queue_depth', 1000)
+            parse_stage = PipelineStage("parse", parse, discard=lambda item: buffer.release(item[1]))
+        else:
+            fetch_queue_depth = self._data_config.get('fetch_queue_depth', 2)
+            parse_stage = PipelineStage("parse", parse)
+        pipeline = ExportPipeline(
+            "fetch", fetch,
+            [parse_stage, PipelineStage("upload", upload, self._data_config.get('upload_workers', 1))],
+            [fetch_queue_depth, self._data_config.get('upload_queue_depth', 2)]
         )
-        
-        logger.info(f"Completed regular data export: {exported_docs} documents")
-        print(f"\n=== DATA MIGRATION COMPLETE ===")
-        print(f"Total documents exported: {exported_docs}")
-        print(f"================================\n")
+        for stage, error in pipeline.run():
+            error_msg = f"Error in {stage} stage of partition {partition.name}: {str(error)}"
+            self._report.add_data_migration_error(error_msg)
+        self._report.add_pipeline_stats([stage.stats() for stage in pipeline.stages])
+
+        return partition_progress.exported_docs, partition_progress.batch_count
+
+    def replay_dead_letters(self, file_path_prefix="migration_schema"):
+        """
+        Export the documents of the dead-letter store again by their uniqueKey, once the cause that broke them
+        is fixed. Replayed batches get their own object names; documents that still cannot be read stay in
+        the store.
+        :return: number of documents exported
+        """
+        binary_fields, unique_key = self._load_export_fields()
+        store = DeadLetterStore(self._data_config.get('dead_letter_file', f"{file_path_prefix}/dead_letter.jsonl"))
+        records = store.read()
+        ids = [record["id"] for record in records if record.get("id") is not None]
+        remaining = [record for record in records if record.get("id") is None]
+        if not ids:
+            logger.info(f"No dead-lettered documents to replay in {store.path}")
+            return 0
+        logger.info(f"Replaying {len(ids)} dead-lettered documents from {store.path}")
+        self._key_suffix = "_replay_" + datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        partition = ExportPartition("replay")
+        sink = self._create_sink(partition, unique_key, None, PartitionState(partition.name))
+        exported = 0
+        failed = set()
+        batch_size = self._data_config.get('rows_per_page', 500)
+        try:
+            batch_count = 0
+            for start in range(0, len(ids), batch_size):
+                docs = []
+                chunk = ids[start:start + batch_size]
+                try:
+                    docs = self._fetch_documents(chunk, unique_key, binary_fields)
+                except json.JSONDecodeError:
+                    # read the documents of a chunk that still breaks one at a time
+                    for doc_id in chunk:
+                        try:
+                            docs.extend(self._fetch_documents([doc_id], unique_key, binary_fields))
+                        except json.JSONDecodeError as e:
+                            logger.error(f"Dead-lettered document {doc_id} still cannot be read: {str(e)}")
+                            failed.add(doc_id)
+                if docs:
+                    batch_count += 1
+                    exported += sink.write_batch(batch_count, self._project(docs))
+        finally:
+            sink.close()
+            self._key_suffix = ""
+        remaining.extend(record for record in records if record.get("id") in failed)
+        store.rewrite(remaining)
+        logger.info(f"Replayed {exported} dead-lettered documents, {len(remaining)} left in {store.path}")
+        return exported
+
+    def _fetch_documents(self, ids, unique_key, binary_fields, extra_fields=()):
+        """
+        Read documents by uniqueKey with the exported field list
+        :param extra_fields: fields to read besides the field list, such as the version the projection drops
+        """
+        # ids may contain commas, the default separator of the terms parser
+        separator = "\x1f"
+        params = {
+            'q': f"{{!terms f={unique_key} separator='{separator}'}}{separator.join(str(i) for i in ids)}",
+            'fl': ",".join([self._field_list(), *extra_fields]),
+            'rows': len(ids),
+            'wt': 'json'
+        }
+        params = self._uncached(params)
+        response_text = self._retry.call(lambda: self._solr_client.select(params, post=True).text, "Replay")
+        return json.loads(self._fix_binary_fields_in_json(response_text, binary_fields))['response']['docs']
+
+    def diff_ids(self, file_path_prefix="migration_schema"):
+        """
+        Find the exact uniqueKeys missing from or extra in the OpenSearch index with a sorted merge of the ids
+        streamed from the Solr /export handler and from an OpenSearch point in time, in constant memory.
+        The ids are written one per line to missing_ids.txt and extra_ids.txt in file_path_prefix; the missing
+        ids are exported again with reexport_ids.
+        :return: dict with the number of missing and extra ids and the files they were written to
+        """
+        _, unique_key = self._load_export_fields()
+        sort_field = self._target_sort_field(unique_key)
+        paths = {MISSING: f"{file_path_prefix}/missing_ids.txt", EXTRA: f"{file_path_prefix}/extra_ids.txt"}
+        counts = {MISSING: 0, EXTRA: 0}
+        os.makedirs(file_path_prefix, exist_ok=True)
+        target_ids = self._target_ids(sort_field)
+        logger.info(f"Comparing the ids of Solr with OpenSearch index {self._opensearch_client.index_name} "
+                    f"sorted by {sort_field}")
+        with open(paths[MISSING], "w", encoding="utf-8") as missing, \
+                open(paths[EXTRA], "w", encoding="utf-8") as extra:
+            files = {MISSING: missing, EXTRA: extra}
+            for side, doc_id in merge_sorted_ids(self._solr_ids(unique_key), target_ids):
+                files[side].write(doc_id + "\n")
+                counts[side] += 1
+        logger.info(f"{counts[MISSING]} ids are missing from OpenSearch ({paths[MISSING]}), "
+                    f"{counts[EXTRA]} are only in OpenSearch ({paths[EXTRA]})")
+        return {"missing": counts[MISSING], "extra": counts[EXTRA],
+                "missing_file": paths[MISSING], "extra_file": paths[EXTRA]}
+
+    def _target_sort_field(self, unique_key):
+        """Field of the OpenSearch index that holds the uniqueKey in string order"""
+        sort_field = self._data_config.get('id_diff_sort_field')
+        if sort_field is None:
+            sort_field = self._projection.target_name(unique_key) if self._projection else unique_key
+        return sort_field
+
+    def _target_ids(self, sort_field):
+        """Stream every id of the OpenSearch index in ascending order"""
+        for hit in self._opensearch_client.scan(self._data_config.get('id_diff_page_size', 10000), source=False,
+                                                sort_field=sort_field):
+            yield str(hit["sort"][0])
+
+    def _existing_ids(self, ids, unique_key):
+        """
+        :return: the ids of the list that Solr has now
+        """
+        separator = "\x1f"
+        params = self._uncached({
+            'q': f"{{!terms f={unique_key} separator='{separator}'}}{separator.join(ids)}",
+            'fl': unique_key,
+            'rows': len(ids),
+            'wt': 'json'
+        })
+        response_text = self._retry.call(lambda: self._solr_client.select(params, post=True).text, "Id check")
+        return {str(doc[unique_key]) for doc in json.loads(response_text)['response']['docs']}
+
+    def _solr_ids(self, unique_key):
+        """Stream every uniqueKey of the collection in ascending order from the /export handler"""
+        params = {'q': '*:*', 'sort': f'{unique_key} asc', 'fl': unique_key, 'wt': 'json'}
+        if self._nested is not None:
+            params['fq'] = self._nested.parent_filter_query
+        response = self._solr_client.export(self._uncached(params))
+        try:
+            chunks = response.iter_content(chunk_size=self._data_config.get('stream_chunk_bytes', 64 * 1024))
+            for docs in export_batches(StreamingDocsParser().iter_docs(chunks), 1000):
+                for doc in docs:
+                    yield str(doc[unique_key])
+        finally:
+            response.close()
+
+    def reexport_ids(self, id_file):
+        """
+        Export the documents listed in a file of uniqueKeys, one per line, such as the missing ids of diff_ids.
+        Chunks of rows_per_page ids are fetched by export_workers threads in parallel and written to objects
+        named <collection>_reexport_<time>_batch_<n>.
+        :return: number of documents exported
+        """
+        binary_fields, unique_key = self._load_export_fields()
+        workers = max(1, self._data_config.get('export_workers', 4))
+        self._key_suffix = "_reexport_" + datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        partition = ExportPartition("reexport")
+        sink = self._create_sink(partition, unique_key, None, PartitionState(partition.name))
+        logger.info(f"Exporting the documents listed in {id_file} with {workers} workers")
+        exported = 0
+        batch_count = 0
+
+        def write(future):
+            nonlocal exported, batch_count
+            docs = future.result()
+            if docs:
+                batch_count += 1
+                exported += sink.write_batch(batch_count, self._project(docs))
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reexport") as executor:
+                # at most two chunks per worker are fetched ahead of the sink
+                pending = deque()
+                for chunk in read_id_chunks(id_file, self._data_config.get('rows_per_page', 500)):
+                    pending.append(executor.submit(self._fetch_documents, chunk, unique_key, binary_fields))
+                    if len(pending) >= 2 * workers:
+                        write(pending.popleft())
+                while pending:
+                    write(pending.popleft())
+        finally:
+            sink.close()
+            self._key_suffix = ""
+        logger.info(f"Exported {exported} documents listed in {id_file} in {batch_count} batches")
+        return exported
+
+    def run_export_worker(self, file_path_prefix="migration_schema", worker_id=None):
+        """
+        Export partitions claimed from the shared work queue of work_queue_backend until none is left. Any
+        number of workers, on one or several hosts, run the same export together; each holds leases on the
+        partitions it exports and renews them, and a partition whose lease expires is claimed by another worker
+        and continued from the last batch checkpointed into the queue. Objects are named
+        <collection>_<worker id>_batch_<n>, so workers never overwrite each other, and batches are numbered after
+        the highest batch checkpointed in the queue, so a restarted worker does not overwrite its previous run.
+        :param worker_id: name of the worker, worker_id of the config or <host>-<pid> by default
+        :return: number of partitions this worker completed
+        """
+        worker_id = worker_id or self._data_config.get('worker_id') or f"{socket.gethostname()}-{os.getpid()}"
+        lease_seconds = self._data_config.get('lease_seconds', 60)
+        poll_seconds = self._data_config.get('work_queue_poll_seconds', 5)
+        queue = open_work_queue(self._data_config, file_path_prefix)
+
+        binary_fields, unique_key = self._load_export_fields()
+        self._dead_letters = DeadLetterStore(self._data_config.get('dead_letter_file',
+                                                                   f"{file_path_prefix}/dead_letter.jsonl"))
+        self._export_plan = None
+        if self._data_config.get('export_engine', 'select') != 'select':
+            self._export_plan = ExportFieldPlan.from_config(self._data_config, self._solr_client.read_schema(),
+                                                            unique_key, self._projection)
+        self._delta = None
+        partitions = self._build_partitions(unique_key)
+        queue.publish(self._export_fingerprint(unique_key, partitions), partitions)
+        workers = max(1, self._data_config.get('export_workers', 1))
+        self._solr_client.configure_export_transport(workers)
+        self._concurrency = AimdController.from_config(self._data_config, workers)
+        self._solr_client.set_request_governor(self._concurrency)
+        self._telemetry = ExportTelemetry(self._data_config.get('telemetry_interval_seconds', 10),
+                                          self._data_config.get('slowest_batches', 10))
+        self._key_suffix = f"_{worker_id}"
+        # max_rows limits the documents of all workers together, counted in the queue
+        max_rows = self._data_config.get('max_rows', 100000)
+        # object keys do not name the partition, so a restarted worker numbers its batches after every batch
+        # already checkpointed instead of overwriting its own committed objects
+        progress = ExportProgress(batch_count=queue.last_batch())
+        keeper = LeaseKeeper(queue, lease_seconds)
+        completed = []
+        logger.info(f"Worker {worker_id} exporting partitions of {queue.path} with {workers} threads")
+
+        def work():
+            while not progress.stopped and queue.exported_docs() < max_rows:
+                lease = queue.claim(worker_id, lease_seconds)
+                if lease is None:
+                    if not queue.unfinished():
+                        return
+                    # partitions leased by other workers are claimed again if their leases expire
+                    progress.wait(poll_seconds)
+                    continue
+                if self._export_lease(queue, keeper, lease, binary_fields, unique_key, progress, max_rows):
+                    completed.append(lease.partition.name)
+
+        previous_handlers = self._install_stop_handlers(progress)
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export-worker") as executor:
+                for future in [executor.submit(work) for _ in range(workers)]:
+                    error = future.exception()
+                    if error is not None:
+                        self._report.add_data_migration_error(f"Error in export worker {worker_id}: {str(error)}")
+        finally:
+            for stop_signal, handler in previous_handlers.items():
+                signal.signal(stop_signal, handler)
+            keeper.close()
+            self._key_suffix = ""
+            if self._concurrency is not None:
+                self._solr_client.set_request_governor(None)
+                self._report.update_concurrency_stats(**self._concurrency.stats())
+                self._concurrency = None
+
+        for name in queue.abandoned():
+            self._report.add_data_migration_error(f"Partition {name} was abandoned after "
+                                                  f"{self._data_config.get('work_queue_max_attempts', 3)} attempts")
+        self._report.update_telemetry(self._telemetry.summary())
+        self._report.update_recovery_stats(self._retry.retries, self._dead_letters.count)
+        self._report.update_worker_stats(queue.worker_stats())
+        self._report.update_data_migration_stats(enabled=True, total=self._solr_client.count(),
+                                                 exported=progress.exported_docs, batches=progress.batch_count,
+                                                 status="stopped" if progress.stopped else "completed")
+        data_report_path = f"{file_path_prefix}/data_migration_report_{worker_id}.html"
+        self._report.data_migration_report(data_report_path)
+        logger.info(f"Worker {worker_id} completed {len(completed)} partitions with {progress.exported_docs} "
+                    f"documents, report at {data_report_path}")
+        return len(completed)
+
+    def _export_lease(self, queue, keeper, lease, binary_fields, unique_key, progress, max_rows):
+        """
+        Export a leased partition from the position checkpointed in the queue, renewing the lease meanwhile
+        :return: True when the partition is exported and still leased by this worker
+        """
+        keeper.hold(lease)
+        journal = QueueJournal(queue, lease)
+        leased_progress = LeasedProgress(progress, lease, queue, max_rows)
+        started = time.monotonic()
+        complete = False
+        try:
+            complete = self._export_partition(lease.partition, binary_fields, unique_key, leased_progress, journal,
+                                              lease.state)
+        except Exception as e:
+            self._report.add_data_migration_error(f"Error exporting partition {lease.partition.name}: {str(e)}")
+        finally:
+            keeper.drop(lease)
+        seconds = time.monotonic() - started
+        if complete and not lease.lost:
+            return queue.complete(lease, journal.docs, seconds)
+        # a partition stopped by a signal or by max_rows was not a failed attempt
+        queue.release(lease, journal.docs, seconds, failed=not leased_progress.should_stop())
+        return False
+
+    def sync(self, file_path_prefix="migration_schema", max_cycles=None):
+        """
+        Keep the OpenSearch index in step with Solr until SIGINT/SIGTERM, for the cutover.
+        Every sync_interval_seconds the documents whose delta_field changed since the last cycle are read with a
+        cursor and indexed through _bulk with their sync_version_field as external version, so a request that
+        arrives after a newer one for the same document cannot overwrite it. Every sync_delete_interval_seconds
+        the ids of both sides are merged to delete the documents Solr no longer has. Replication lag,
+        throughput and backlog are written to sync_metrics_file after every cycle.
+        :param max_cycles: stop after this many cycles, None to run until stopped
+        :return: the last metrics
+        """
+        binary_fields, unique_key = self._load_export_fields()
+        field = self._data_config.get('delta_field', 'last_modified')
+        interval = self._data_config.get('sync_interval_seconds', 5)
+        delete_interval = self._data_config.get('sync_delete_interval_seconds', 300)
+        watermark = DeltaWatermark(f"{file_path_prefix}/sync_watermark.json", field)
+        metrics = SyncMetrics(self._data_config.get('sync_metrics_file', f"{file_path_prefix}/sync_metrics.prom"))
+        target_key = self._projection.target_name(unique_key) if self._projection else unique_key
+        sink = OpenSearchBulkSink(self._opensearch_client, target_key, self._data_config)
+        progress = ExportProgress()
+        next_delete_check = time.monotonic() + delete_interval if delete_interval else None
+        batch_count = 0
+        cycles = 0
+        logger.info(f"Syncing changes of {field} into OpenSearch index {self._opensearch_client.index_name} "
+                    f"every {interval} seconds")
+        previous_handlers = self._install_stop_handlers(progress)
+        try:
+            while not progress.stopped:
+                started = time.time()
+                lower = watermark.load()
+                upper = self._solr_client.max_value(field)
+                applied = backlog = 0
+                if upper is not None and upper != lower:
+                    self._delta = {"field": field, "lower": lower, "upper": upper}
+                    filter_query = delta_filter_query(self._delta)
+                    backlog = (self._solr_client.count(filter_queries=[filter_query]) if filter_query
+                               else self._solr_client.count())
+                    applied, batch_count = self._sync_window(sink, unique_key, binary_fields, progress, batch_count)
+                    sink.flush()
+                    if progress.stopped:
+                        # the window is not complete, the next run applies it again
+                        break
+                    watermark.save(upper)
+                metrics.set_stale(sink.stale_docs)
+                metrics.finish_cycle(started, applied, backlog, upper)
+                logger.info(f"Synced {applied} of {backlog} changed documents up to {field} {upper}, "
+                            f"lag {metrics.lag_seconds}s")
+                if next_delete_check is not None and time.monotonic() >= next_delete_check:
+                    deleted, missing, batch_count = self._sync_deletes(sink, unique_key, binary_fields, batch_count)
+                    metrics.add_deletes(deleted, missing)
+                    next_delete_check = time.monotonic() + delete_interval
+                cycles += 1
+                if max_cycles is not None and cycles >= max_cycles:
+                    break
+                progress.wait(interval)
+        finally:
+            for stop_signal, handler in previous_handlers.items():
+                signal.signal(stop_signal, handler)
+            self._delta = None
+            sink.close()
+        return metrics.snapshot()
+
+    def _sync_window(self, sink, unique_key, binary_fields, progress, batch_count):
+        """
+        Index the documents of the current delta window with their external versions
+        :return: (documents written, last batch number)
+        """
+        version_field = self._data_config.get('sync_version_field', '_version_')
+        partition = ExportPartition("sync")
+        written = 0
+        cursor_mark = '*'
+        while not progress.stopped:
+            params = self._page_params(partition, unique_key, cursor_mark)
+            if self._projection is not None:
+                # the projection drops Solr internal fields such as _version_
+                params['fl'] = f"{params['fl']},{version_field}"
+            response_text = self._retry.call(lambda: self._solr_client.select(params).text, "Sync")
+            page = json.loads(self._fix_binary_fields_in_json(response_text, binary_fields))
+            docs = page['response']['docs']
+            if docs:
+                batch_count += 1
+                versions = [doc.get(version_field) for doc in docs]
+                written += sink.write_batch(batch_count, self._project(docs), versions)
+            next_cursor_mark = page.get('nextCursorMark', cursor_mark)
+            if not docs or next_cursor_mark == cursor_mark:
+                break
+            cursor_mark = next_cursor_mark
+        return written, batch_count
+
+    def _sync_deletes(self, sink, unique_key, binary_fields, batch_count):
+        """
+        Delete the documents of the index that Solr no longer has and index the Solr documents it is missing.
+        Ids only in OpenSearch are looked up in Solr again before they are deleted, since documents added after
+        the Solr ids were read are indexed already. Missing documents are indexed with their external versions,
+        so a newer copy written by the delta sync in the meantime is kept.
+        :return: (documents deleted, Solr documents missing from the index, last batch number)
+        """
+        rows = self._data_config.get('rows_per_page', 500)
+        version_field = self._data_config.get('sync_version_field', '_version_')
+        deleted = 0
+        missing = 0
+        reindexed = 0
+        chunk = []
+        missing_chunk = []
+
+        def delete(ids):
+            nonlocal deleted, batch_count
+            existing = self._existing_ids(ids, unique_key)
+            gone = [doc_id for doc_id in ids if doc_id not in existing]
+            if gone:
+                batch_count += 1
+                deleted += sink.delete_batch(batch_count, gone)
+
+        def reindex(ids):
+            nonlocal reindexed, batch_count
+            docs = self._fetch_documents(ids, unique_key, binary_fields, extra_fields=[version_field])
+            if docs:
+                batch_count += 1
+                versions = [doc.get(version_field) for doc in docs]
+                reindexed += sink.write_batch(batch_count, self._project(docs), versions)
+
+        sides = merge_sorted_ids(self._solr_ids(unique_key), self._target_ids(self._target_sort_field(unique_key)))
+        for side, doc_id in sides:
+            if side == MISSING:
+                missing += 1
+                missing_chunk.append(doc_id)
+                if len(missing_chunk) >= rows:
+                    reindex(missing_chunk)
+                    missing_chunk = []
+                continue
+            chunk.append(doc_id)
+            if len(chunk) >= rows:
+                delete(chunk)
+                chunk = []
+        if chunk:
+            delete(chunk)
+        if missing_chunk:
+            reindex(missing_chunk)
+        sink.flush()
+        logger.info(f"Deleted {deleted} documents Solr no longer has, indexed {reindexed} of {missing} Solr "
+                    f"documents missing from the index")
+        return deleted, missing, batch_count
+
+    def reconcile(self, file_path_prefix="migration_schema"):
+        """
+        Verify the OpenSearch index against Solr with a document count and a content checksum per bucket of the
+        uniqueKey hash space. Solr is read with a cursor per partition over the exported fields and projection
+        while OpenSearch is read from a point in time, in parallel; only ranges of buckets that differ are
+        descended into. OpenSearch documents are bucketed by the uniqueKey in their _source, since the OSIS
+        pipeline may index them under generated ids, and the fields the pipeline adds are not checksummed.
+        The result is written to reconcile.json in file_path_prefix.
+        :return: dict with the document totals of both sides and the differing buckets
+        """
+        binary_fields, unique_key = self._load_export_fields()
+        bits = self._data_config.get('reconcile_bucket_bits', 12)
+        target_key = self._projection.target_name(unique_key) if self._projection else unique_key
+        ignored_fields = set(self._data_config.get('reconcile_ignore_fields', ['@timestamp']))
+        partitions = self._build_partitions(unique_key)
+        workers = self._data_config.get('export_workers', len(partitions)) if len(partitions) > 1 else 1
+        self._solr_client.configure_export_transport(min(workers, len(partitions)))
+        source_parts = []
+        target = BucketChecksums(bits)
+        target_errors = []
+
+        def read_target():
+            try:
+                for hit in self._opensearch_client.scan(self._data_config.get('reconcile_page_size', 1000)):
+                    source = hit.get("_source", {})
+                    doc = {field: value for field, value in source.items() if field not in ignored_fields}
+                    target.add(source.get(target_key, hit["_id"]), doc)
+            except Exception as e:
+                target_errors.append(e)
+
+        def read_partition(partition):
+            checksums = BucketChecksums(bits)
+            cursor_mark = '*'
+            while True:
+                params = self._page_params(partition, unique_key, cursor_mark)
+                response_text = self._retry.call(
+                    lambda: self._solr_client.select(params, core_url=partition.core_url).text,
+                    f"Reconcile {partition.name}")
+                page = json.loads(self._fix_binary_fields_in_json(response_text, binary_fields))
+                docs = page['response']['docs']
+                ids = [doc[unique_key] for doc in docs]
+                for doc_id, doc in zip(ids, self._project(docs)):
+                    checksums.add(doc_id, doc)
+                next_cursor_mark = page.get('nextCursorMark', cursor_mark)
+                if not docs or next_cursor_mark == cursor_mark:
+                    break
+                cursor_mark = next_cursor_mark
+            source_parts.append(checksums)
+
+        logger.info(f"Reconciling {len(partitions)} partitions of Solr with OpenSearch index "
+                    f"{self._opensearch_client.index_name} over {1 << bits} buckets")
+        reader = threading.Thread(target=read_target, name="reconcile-opensearch", daemon=True)
+        reader.start()
+        errors = WorkStealingPool(workers).run(partitions, read_partition)
+        reader.join()
+        if errors:
+            partition, error = errors[0]
+            raise ReconcileException(name=partition.name, reason=f"Could not read partition: {str(error)}")
+        if target_errors:
+            raise ReconcileException(name=self._opensearch_client.index_name,
+                                     reason=f"Could not read index: {str(target_errors[0])}")
+        source = BucketChecksums(bits)
+        for checksums in source_parts:
+            source.merge(checksums)
+        differing, compared = diff_buckets(source, target, self._data_config.get('reconcile_fanout', 16))
+        result = {
+            "source_docs": source.total,
+            "target_docs": target.total,
+            "bucket_bits": bits,
+            "compared_ranges": compared,
+            "differing_buckets": differing
+        }
+        os.makedirs(file_path_prefix, exist_ok=True)
+        write_json_file_data(result, f"{file_path_prefix}/reconcile.json")
+        if differing:
+            logger.warning(f"{len(differing)} of {1 << bits} buckets differ between Solr ({source.total} documents) "
+                           f"and OpenSearch ({target.total} documents), see {file_path_prefix}/reconcile.json")
+        else:
+            logger.info(f"Solr and OpenSearch match: {source.total} documents, {compared} ranges compared")
+        return result
+
+    @property
+    def report(self):
+        return self._report
 
     def migrate_schema(self, file_path_prefix="migration_schema"):
         """
@@ -267,16 +1490,17 @@ class Solr2OSMigrate:
 
         return self._opensearch_client.get_index_json()
 
-    def export_data(self, file_path_prefix="migration_schema"):
+    def export_data(self, file_path_prefix="migration_schema", resume=False):
         """
         Method to export data to S3
+        :param resume: continue an interrupted export from the journal in file_path_prefix
         """
         if not self._data_config.get('migrate_data', False):
             logger.info("Skipping data export as migrate_data is set to false")
             return False
 
         try:
-            self._export_data_to_s3()
+            self._export_data_to_s3(file_path_prefix, resume)
 
             # Generate separate data migration report
             data_report_path = f"{file_path_prefix}/data_migration_report.html"
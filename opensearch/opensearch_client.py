@@ -11,6 +11,7 @@ from opensearchpy.helpers.mapping import Mapping
 
 
 from config import get_custom_logger
+from migrate.export.concurrency import BudgetedClient
 
 logger = get_custom_logger("opensearch.opensearch_client")
 
@@ -111,7 +112,55 @@ class OpenSearchClient(object):
         return self._opensearch_index.to_dict().get("settings", {}).get("analysis", {}).get("filter", {})
     def get_index_json(self):
         return self._opensearch_index.to_dict()
-        
+
+    @property
+    def index_name(self):
+        return self._index
+
+    def set_api_budgets(self, package_budget=None, s3_budget=None):
+        """
+        Send the package API calls and the S3 uploads of analyzer files through budgets shared with the
+        clients of other collections
+        """
+        if package_budget is not None:
+            self._opensearch_client_boto3 = BudgetedClient(self._opensearch_client_boto3, package_budget)
+        if s3_budget is not None:
+            self._s3_client_boto3 = BudgetedClient(self._s3_client_boto3, s3_budget)
+
+    def bulk(self, body, filter_path=None):
+        """
+        Send a _bulk request to the migration index
+        :param body: newline delimited action and document lines
+        :param filter_path: optional response filter
+        :return: the bulk response
+        """
+        return self._opensearch_client.bulk(body=body, index=self._index, filter_path=filter_path)
+
+    def scan(self, page_size=1000, source=True, keep_alive="5m", sort_field="_id"):
+        """
+        Read every document of the migration index in sort_field order from a point in time with search_after
+        :param source: True for the whole _source, False for ids only, or a list of fields
+        :param sort_field: unique field to page by, the first sort value of every hit
+        :return: generator of hits
+        """
+        pit_id = self._opensearch_client.create_pit(index=self._index, keep_alive=keep_alive)["pit_id"]
+        try:
+            search_after = None
+            while True:
+                body = {"size": page_size, "sort": [{sort_field: "asc"}], "_source": source,
+                        "pit": {"id": pit_id, "keep_alive": keep_alive}, "track_total_hits": False}
+                if search_after is not None:
+                    body["search_after"] = search_after
+                response = self._opensearch_client.search(body=body)
+                pit_id = response.get("pit_id", pit_id)
+                hits = response["hits"]["hits"]
+                if not hits:
+                    return
+                yield from hits
+                search_after = hits[-1]["sort"]
+        finally:
+            self._opensearch_client.delete_pit(body={"pit_id": [pit_id]})
+
     def _create_package(self, package_name, bucket, file):
 
         logger.info("Creating package with name %s", package_name)
@@ -1,3 +1,5 @@
+import threading
+
 from jinja2 import FileSystemLoader
 
 from config import get_custom_logger
@@ -30,25 +32,171 @@ class Report:
         self.data_migration_docs_total = 0
         self.data_migration_docs_exported = 0
         self.data_migration_batches = 0
+        self.data_migration_status = "completed"
         self.data_migration_errors = 0
+        self.data_migration_partitions = []
+        self.data_migration_pipeline_stages = {}
+        self.data_migration_objects = 0
+        self.data_migration_bytes = 0
+        self.data_migration_nested = None
+        self.data_migration_telemetry = None
+        self.data_migration_buffer = None
+        self.data_migration_retries = 0
+        self.data_migration_concurrency = None
+        self.data_migration_dead_letters = 0
+        self.data_migration_workers = []
 
         self.field_type_exception_list = []
         self.field_exception_list = []
         self.dynamic_field_exception_list = []
         self.copy_field_exception_list = []
         self.data_migration_error_list = []
+        self._lock = threading.Lock()
         
     def add_data_migration_error(self, error_msg):
         """Add data migration error to the report"""
-        self.data_migration_errors += 1
-        self.data_migration_error_list.append(str(error_msg))
+        with self._lock:
+            self.data_migration_errors += 1
+            self.data_migration_error_list.append(str(error_msg))
+
+    def add_partition_stats(self, name, docs, batches, seconds):
+        """Add export statistics of one partition to the report"""
+        with self._lock:
+            self.data_migration_partitions.append({
+                "name": name,
+                "docs": docs,
+                "batches": batches,
+                "seconds": round(seconds, 2),
+                "docs_per_second": round(docs / seconds, 2) if seconds > 0 else 0
+            })
         
-    def update_data_migration_stats(self, enabled=False, total=0, exported=0, batches=0):
-        """Update data migration statistics"""
+    def update_data_migration_stats(self, enabled=False, total=0, exported=0, batches=0, status="completed"):
+        """
+        Update data migration statistics
+        :param status: completed, resumed (completed from a journal) or stopped (interrupted, can be resumed)
+        """
         self.data_migration_enabled = enabled
         self.data_migration_docs_total = total
         self.data_migration_docs_exported = exported
         self.data_migration_batches = batches
+        self.data_migration_status = status
+
+    def update_nested_stats(self, parents, children, max_children, wide_parents, orphans=0):
+        """
+        Update child document statistics of a nested export
+        :param wide_parents: parents with more children than the [child] transformer returns by default
+        """
+        self.data_migration_nested = {
+            "parents": parents,
+            "children": children,
+            "max_children": max_children,
+            "wide_parents": wide_parents,
+            "orphans": orphans
+        }
+
+    def update_telemetry(self, summary):
+        """
+        Update per-batch stage latencies, throughput timeline and slowest batches
+        :param summary: ExportTelemetry.summary()
+        """
+        elapsed = summary["elapsed_seconds"]
+        docs = sum(point["docs"] for point in summary["timeline"])
+        self.data_migration_telemetry = dict(
+            summary,
+            megabytes_in=round(summary["bytes_in"] / (1024 * 1024), 2),
+            megabytes_out=round(summary["bytes_out"] / (1024 * 1024), 2),
+            docs_per_second=round(docs / elapsed, 1) if elapsed > 0 else 0
+        )
+
+    def update_buffer_stats(self, memory_bytes, peak_resident_bytes, spilled_pages, spilled_bytes, peak_spill_bytes):
+        """
+        Update the memory and spill usage of the buffer of fetched pages
+        """
+        megabytes = 1024 * 1024
+        self.data_migration_buffer = {
+            "memory_megabytes": round(memory_bytes / megabytes, 2),
+            "peak_resident_megabytes": round(peak_resident_bytes / megabytes, 2),
+            "spilled_pages": spilled_pages,
+            "spilled_megabytes": round(spilled_bytes / megabytes, 2),
+            "peak_spill_megabytes": round(peak_spill_bytes / megabytes, 2)
+        }
+
+    def update_concurrency_stats(self, limit, initial_limit, peak_limit, min_concurrency, max_concurrency, max_rps,
+                                 requests, overloads, increases, decreases, throttled_seconds, decisions,
+                                 chart_width=600, chart_height=120):
+        """
+        Update the decisions of the Solr concurrency controller, with the points of a step chart of its limit
+        """
+        end = max([decision["second"] for decision in decisions] + [1])
+        points = [(0, initial_limit)]
+        for decision in decisions:
+            points.extend([(decision["second"], points[-1][1]), (decision["second"], decision["limit"])])
+        points.append((end, limit))
+        self.data_migration_concurrency = {
+            "limit": limit,
+            "initial_limit": initial_limit,
+            "peak_limit": peak_limit,
+            "min_concurrency": min_concurrency,
+            "max_concurrency": max_concurrency,
+            "max_rps": max_rps,
+            "requests": requests,
+            "overloads": overloads,
+            "increases": increases,
+            "decreases": decreases,
+            "throttled_seconds": throttled_seconds,
+            "decisions": decisions,
+            "chart_width": chart_width,
+            "chart_height": chart_height,
+            "chart_points": " ".join(f"{round(second / end * chart_width, 1)},"
+                                     f"{round(chart_height - value / max_concurrency * chart_height, 1)}"
+                                     for second, value in points)
+        }
+
+    def update_recovery_stats(self, retries, dead_letters):
+        """
+        Update the number of batch retries and of documents written to the dead-letter store
+        """
+        self.data_migration_retries = retries
+        self.data_migration_dead_letters = dead_letters
+
+    def update_worker_stats(self, workers):
+        """
+        Update the throughput of the export workers of a distributed export
+        :param workers: dicts with worker, partitions, docs and seconds, as kept by the work queue
+        """
+        self.data_migration_workers = [
+            dict(worker, seconds=round(worker["seconds"], 1),
+                 docs_per_second=round(worker["docs"] / worker["seconds"], 1) if worker["seconds"] else 0.0)
+            for worker in workers]
+
+    def add_exported_objects(self, objects):
+        """Add the objects written by an export sink"""
+        with self._lock:
+            self.data_migration_objects += len(objects)
+            self.data_migration_bytes += sum(o["bytes"] for o in objects)
+
+    def add_pipeline_stats(self, stage_stats):
+        """Add busy and idle time of pipeline stages, summed over all partitions"""
+        with self._lock:
+            for stats in stage_stats:
+                total = self.data_migration_pipeline_stages.setdefault(
+                    stats["stage"], {"stage": stats["stage"], "items": 0, "busy_seconds": 0.0, "idle_seconds": 0.0})
+                total["items"] += stats["items"]
+                total["busy_seconds"] += stats["busy_seconds"]
+                total["idle_seconds"] += stats["idle_seconds"]
+
+    def _pipeline_stage_rows(self):
+        rows = []
+        for stats in self.data_migration_pipeline_stages.values():
+            elapsed = stats["busy_seconds"] + stats["idle_seconds"]
+            rows.append({
+                "stage": stats["stage"],
+                "items": stats["items"],
+                "busy_seconds": round(stats["busy_seconds"], 2),
+                "idle_seconds": round(stats["idle_seconds"], 2),
+                "utilization": round(stats["busy_seconds"] / elapsed * 100, 1) if elapsed > 0 else 0
+            })
+        return rows
 
     def __print_summary(self):
         report = "Summary Reports " + "\n"
@@ -124,6 +272,28 @@ class Report:
         with open(file, mode="w", encoding="utf-8") as message:
             message.write(content)
             
+    @staticmethod
+    def orchestration_report(file, collections, budgets, seconds):
+        """Generate the consolidated report of a multi-collection migration"""
+        environment = jinja2.Environment(loader=FileSystemLoader("reports/templates/"), autoescape=True)
+        template = environment.get_template("orchestration_report.html")
+
+        orchestration = {
+            "collections": collections,
+            "failed": sum(1 for collection in collections if collection["status"] != "completed"),
+            "total": sum(collection["docs"] for collection in collections),
+            "exported": sum(collection["exported"] for collection in collections),
+            "seconds": seconds,
+            "budgets": budgets
+        }
+        content = template.render({"orchestration": orchestration})
+
+        import os
+        os.makedirs(os.path.dirname(file) if os.path.dirname(file) else '.', exist_ok=True)
+
+        with open(file, mode="w", encoding="utf-8") as message:
+            message.write(content)
+
     def data_migration_report(self, file):
         """Generate a separate report for data migration"""
         environment = jinja2.Environment(loader=FileSystemLoader("reports/templates/"), autoescape=True)
@@ -134,8 +304,20 @@ class Report:
             "total": self.data_migration_docs_total,
             "exported": self.data_migration_docs_exported,
             "batches": self.data_migration_batches,
+            "status": self.data_migration_status,
             "errors": self.data_migration_errors,
-            "error_list": self.data_migration_error_list
+            "error_list": self.data_migration_error_list,
+            "objects": self.data_migration_objects,
+            "megabytes": round(self.data_migration_bytes / (1024 * 1024), 2),
+            "partitions": sorted(self.data_migration_partitions, key=lambda p: p["name"]),
+            "pipeline_stages": self._pipeline_stage_rows(),
+            "nested": self.data_migration_nested,
+            "telemetry": self.data_migration_telemetry,
+            "buffer": self.data_migration_buffer,
+            "retries": self.data_migration_retries,
+            "concurrency": self.data_migration_concurrency,
+            "dead_letters": self.data_migration_dead_letters,
+            "workers": self.data_migration_workers
         }
         
         context = {
@@ -1,9 +1,46 @@
+import threading
+from contextlib import ExitStack
+
 import pysolr
+import requests
+from requests.adapters import HTTPAdapter
 from config import get_custom_logger
 from typing import Optional, Tuple, Dict, Any
 
 logger = get_custom_logger("solr.solr_client")
 
+
+class StreamedResponse(object):
+    """
+    A streamed response that holds the slots of the request governor and budget until it is closed, since
+    Solr does the work of an /export or /stream request while the body is read
+    """
+
+    def __init__(self, response: requests.Response, slots: ExitStack, on_close=None):
+        self._response = response
+        self._slots = slots
+        self._on_close = on_close
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._response, name)
+
+    def close(self) -> None:
+        try:
+            self._response.close()
+        finally:
+            slots, self._slots = self._slots, None
+            if slots is not None:
+                slots.close()
+                if self._on_close is not None:
+                    self._on_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
 class SolrClient(object):
     def __init__(self, solr_config: Dict[str, Any]):
         # Store the config for later use
@@ -13,10 +50,19 @@ class SolrClient(object):
         url = solr_config['host'] + ":" + str(solr_config['port']) + "/solr/"
         self._client = pysolr.Solr(url=url)
         self._collection = solr_config['collection']
+        self._select_url = url + self._collection + "/select"
+        self._export_url = url + self._collection + "/export"
+        self._stream_url = url + self._collection + "/stream"
+        self._collections_url = url + "admin/collections"
         self._schema_url = url + self._collection + "/schema?wt=json"
         self._file_endpoint = url + f"{self._collection}/admin/file"
 
         self._auth = None
+        self._governor = None
+        self._budget = None
+        # streamed responses still open per thread, whose slots also cover the requests the thread sends meanwhile
+        self._streams = {}
+        self._streams_lock = threading.Lock()
         try:
             self._auth = (solr_config['username'], solr_config['password'])
         except KeyError:
@@ -68,3 +114,160 @@ class SolrClient(object):
         :return: Dictionary containing Solr configuration
         """
         return self._config
+
+    def configure_export_transport(self, pool_size: int) -> None:
+        """
+        Size the shared session for export traffic: a keep-alive connection pool with two connections per
+        concurrent export request, gzip compressed responses and the configured auth. The second connection
+        serves the /select requests a worker sends while its /export or /stream response is still streaming,
+        for stored fields and children. The pool does not block, so a request beyond it opens a new connection
+        instead of waiting for one a streaming response of the same thread holds.
+        :param pool_size: number of export requests that can be in flight at the same time
+        """
+        pool_size = 2 * max(1, int(pool_size))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=False)
+        session = self._client.get_session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+        if self._auth:
+            session.auth = self._auth
+        logger.info("Configured solr export transport with a pool of %s connections", pool_size)
+
+    def set_request_governor(self, governor: Any) -> None:
+        """
+        Send select, export and stream requests through a governor such as AimdController, whose request()
+        context manager waits for a slot and receives the response status
+        :param governor: the governor, or None to send requests directly
+        """
+        self._governor = governor
+
+    def set_request_budget(self, budget: Any) -> None:
+        """
+        Take a slot of a budget shared with the clients of other collections, such as a RequestBudget, for every
+        select, export and stream request, in addition to the request governor
+        :param budget: the budget, or None
+        """
+        self._budget = budget
+
+    def _send(self, send, stream: bool = False) -> requests.Response:
+        """
+        Send a request within a slot of the budget and the governor. The slots of a streamed request are held
+        until the response is closed; requests a thread sends while its streamed response is open, such as the
+        /select of stored fields, run within those slots instead of waiting for a slot of their own.
+        """
+        thread = threading.get_ident()
+        if self._streams.get(thread):
+            response = send()
+            response.raise_for_status()
+            return response
+        if not stream:
+            if self._budget is not None:
+                with self._budget.request():
+                    return self._send_governed(send)
+            return self._send_governed(send)
+        with ExitStack() as slots:
+            if self._budget is not None:
+                slots.enter_context(self._budget.request())
+            outcome = slots.enter_context(self._governor.request()) if self._governor is not None else None
+            response = send()
+            if outcome is not None:
+                outcome.status = response.status_code
+            response.raise_for_status()
+            slots = slots.pop_all()
+        self._track_stream(thread, 1)
+        return StreamedResponse(response, slots, on_close=lambda: self._track_stream(thread, -1))
+
+    def _track_stream(self, thread: int, change: int) -> None:
+        with self._streams_lock:
+            count = self._streams.get(thread, 0) + change
+            if count:
+                self._streams[thread] = count
+            else:
+                self._streams.pop(thread, None)
+
+    def _send_governed(self, send) -> requests.Response:
+        if self._governor is None:
+            response = send()
+            response.raise_for_status()
+            return response
+        with self._governor.request() as outcome:
+            response = send()
+            outcome.status = response.status_code
+            response.raise_for_status()
+            return response
+
+    def select(self, params: Dict[str, Any], timeout: int = 300, stream: bool = False,
+               post: bool = False, core_url: Optional[str] = None) -> requests.Response:
+        """
+        Run a query against the select handler of the collection over the shared session
+        :param params: query parameters
+        :param timeout: request timeout in seconds
+        :param stream: do not read the body before returning the response, a StreamedResponse that holds its
+                       request slots until it is closed
+        :param post: send the parameters as a form body, for queries longer than a URL may be
+        :param core_url: query this core of a shard replica instead of the collection
+        :rtype: requests.Response
+        """
+        session = self._client.get_session()
+        url = core_url + "/select" if core_url else self._select_url
+        if post:
+            return self._send(lambda: session.post(url, data=params, auth=self._auth, timeout=timeout, stream=stream),
+                              stream)
+        return self._send(lambda: session.get(url, params=params, auth=self._auth, timeout=timeout, stream=stream),
+                          stream)
+
+    def export(self, params: Dict[str, Any], timeout: int = 300, core_url: Optional[str] = None) -> requests.Response:
+        """
+        Stream the sorted docValues of all matching documents from the export handler of the collection
+        :param params: query parameters, including sort and fl
+        :param core_url: export from this core of a shard replica instead of the collection
+        :rtype: StreamedResponse, not read yet; closing it releases its request slots
+        """
+        url = core_url + "/export" if core_url else self._export_url
+        return self._send(lambda: self._client.get_session().get(url, params=params, auth=self._auth,
+                                                                  timeout=timeout, stream=True), stream=True)
+
+    def stream_expression(self, expression: str, timeout: int = 300) -> requests.Response:
+        """
+        Run a streaming expression on the stream handler of the collection
+        :rtype: StreamedResponse, not read yet; closing it releases its request slots
+        """
+        return self._send(lambda: self._client.get_session().post(self._stream_url, data={'expr': expression},
+                                                                   auth=self._auth, timeout=timeout, stream=True),
+                          stream=True)
+
+    def count(self, query: str = "*:*", filter_queries: Optional[list] = None) -> int:
+        """
+        Returns the number of documents matching the query
+        """
+        params = {'q': query, 'rows': 0, 'wt': 'json'}
+        if filter_queries:
+            params['fq'] = filter_queries
+        return self.select(params, timeout=30).json()['response']['numFound']
+
+    def max_value(self, field: str, query: str = "*:*") -> Optional[Any]:
+        """
+        Returns the largest value of a sortable single valued field, or None when no document has a value
+        """
+        params = {'q': query, 'fq': f'{field}:*', 'sort': f'{field} desc', 'fl': field, 'rows': 1, 'wt': 'json'}
+        docs = self.select(params, timeout=30).json()['response']['docs']
+        return docs[0].get(field) if docs else None
+
+    def list_collections(self) -> list:
+        """
+        Returns the names of all collections of the SolrCloud cluster
+        """
+        params = {'action': 'LIST', 'wt': 'json'}
+        response = self._client.get_session().get(self._collections_url, params=params, auth=self._auth, timeout=30)
+        response.raise_for_status()
+        return response.json()['collections']
+
+    def cluster_status(self) -> Dict[str, Any]:
+        """
+        Returns the SolrCloud layout of the collection: shards, their replicas and the live nodes
+        """
+        params = {'action': 'CLUSTERSTATUS', 'collection': self._collection, 'wt': 'json'}
+        response = self._client.get_session().get(self._collections_url, params=params, auth=self._auth, timeout=30)
+        response.raise_for_status()
+        return response.json()['cluster']
@@ -0,0 +1,59 @@
+import gzip
+import json
+
+import pytest
+
+from migrate.export import BatchWriter, BatchWriterException
+
+DOCS = [
+    {"id": "1", "title": "Größe", "name": ["a", "b"]},
+    {"id": "2", "comments": [{"id": "2/c1", "rating": 4}]},
+    {"id": "3"},
+]
+
+
+class TestBatchWriter:
+
+    def test_json_array_body(self):
+        with BatchWriter(spool_bytes=16) as writer:
+            for doc in DOCS:
+                writer.write(doc)
+            assert writer.doc_count == 3
+            assert json.loads(writer.body().read()) == DOCS
+
+    def test_empty_body(self):
+        with BatchWriter() as writer:
+            assert json.loads(writer.body().read()) == []
+
+    def test_ndjson_body(self):
+        with BatchWriter(export_format="ndjson") as writer:
+            for doc in DOCS:
+                writer.write(doc)
+            assert writer.content_type == "application/x-ndjson"
+            assert writer.extension == ".ndjson"
+            lines = writer.body().read().decode("utf-8").splitlines()
+            assert [json.loads(line) for line in lines] == DOCS
+
+    def test_gzip_body(self):
+        with BatchWriter(spool_bytes=16, export_format="ndjson", compression="gzip") as writer:
+            for doc in DOCS:
+                writer.write(doc)
+            assert writer.content_encoding == "gzip"
+            assert writer.extension == ".ndjson.gz"
+            body = writer.body().read()
+            assert writer.body().read() == body
+            assert len(gzip.decompress(body).splitlines()) == 3
+
+    def test_zstd_body(self):
+        zstandard = pytest.importorskip("zstandard")
+        with BatchWriter(compression="zstd") as writer:
+            for doc in DOCS:
+                writer.write(doc)
+            assert writer.extension == ".json.zst"
+            body = zstandard.ZstdDecompressor().stream_reader(writer.body()).read()
+            assert json.loads(body) == DOCS
+
+    def test_unknown_format(self):
+        with pytest.raises(BatchWriterException):
+            BatchWriter(export_format="xml")
+
@@ -0,0 +1,46 @@
+from unittest.mock import Mock
+
+from migrate.export import BinaryFieldFixer
+
+
+class TestBinaryFieldFixer:
+
+    def test_fixes_all_fields_in_one_pass(self):
+        fixer = BinaryFieldFixer(['attachment', 'thumbnail'])
+        text = '{"id":"1","attachment":UEsDBBQ,"thumbnail":iVBORw0=,"title":"test"}'
+        assert fixer.fix(text) == '{"id":"1","attachment":"UEsDBBQ","thumbnail":"iVBORw0=","title":"test"}'
+
+    def test_bytes(self):
+        fixer = BinaryFieldFixer(['attachment'])
+        assert fixer.fix(b'{"attachment":UEsDBBQ}') == b'{"attachment":"UEsDBBQ"}'
+
+    def test_unchanged_input_is_returned_as_is(self):
+        fixer = BinaryFieldFixer(['attachment'])
+        text = '{"id":"1","attachment":"UEsDBBQ"}'
+        assert fixer.fix(text) is text
+
+    def test_page_without_binary_keys_is_not_scanned(self):
+        fixer = BinaryFieldFixer(['attachment'])
+        fixer._pattern = fixer._bytes_pattern = Mock(split=Mock(side_effect=AssertionError("scanned")))
+        text = '{"id":"1","title":"attachment"}'
+        assert fixer.fix(text) is text
+        assert fixer.fix(text.encode("utf-8")) == text.encode("utf-8")
+
+    def test_no_binary_fields(self):
+        text = '{"id":"1"}'
+        assert BinaryFieldFixer([]).fix(text) is text
+
+    def test_field_names_are_escaped_and_not_prefix_matched(self):
+        fixer = BinaryFieldFixer(['file.bin', 'file'])
+        text = '{"file.bin":AAA,"fileXbin":BBB,"file":CCC}'
+        assert fixer.fix(text) == '{"file.bin":"AAA","fileXbin":BBB,"file":"CCC"}'
+
+    def test_matches_legacy_behaviour(self):
+        import re
+        fields = ['b%d' % i for i in range(12)]
+        text = '{"docs":[' + ','.join('{"id":"%d",%s}' % (n, ','.join('"%s":QUJD%d' % (f, n) for f in fields))
+                                      for n in range(5)) + ']}'
+        legacy = text
+        for field in fields:
+            legacy = re.sub(rf'"{field}":([^",:}}\s]+)', rf'"{field}":"\1"', legacy)
+        assert BinaryFieldFixer(fields).fix(text) == legacy
@@ -0,0 +1,146 @@
+import json
+import threading
+
+import pytest
+from opensearchpy import TransportError
+
+from migrate.export import BulkSinkException, OpenSearchBulkSink
+
+CONFIG = {'bulk_initial_backoff': 0, 'bulk_concurrency': 2}
+
+
+class FakeBulkClient(object):
+    """Records bulk bodies and answers with scripted per-item statuses"""
+
+    index_name = "demo"
+
+    def __init__(self, statuses=None):
+        self._statuses = list(statuses or [])
+        self._lock = threading.Lock()
+        self.requests = []
+
+    def bulk(self, body, filter_path=None):
+        lines = body.decode("utf-8").splitlines()
+        ids = [json.loads(action)["index"].get("_id") for action in lines[::2]]
+        with self._lock:
+            self.requests.append(ids)
+            statuses = self._statuses.pop(0) if self._statuses else None
+        if isinstance(statuses, Exception):
+            raise statuses
+        statuses = statuses or [201] * len(ids)
+        items = []
+        for status in statuses:
+            result = {"status": status}
+            if status == 429:
+                result["error"] = {"type": "es_rejected_execution_exception", "reason": "queue full"}
+            elif status >= 300:
+                result["error"] = {"type": "mapper_parsing_exception", "reason": "bad field"}
+            items.append({"index": result})
+        return {"errors": any(status >= 300 for status in statuses), "items": items}
+
+
+def docs(*ids):
+    return [{"id": doc_id, "title": "x" * 100} for doc_id in ids]
+
+
+class TestOpenSearchBulkSink:
+
+    def test_requests_sized_by_bytes(self):
+        client = FakeBulkClient()
+        commits = []
+        sink = OpenSearchBulkSink(client, "id", dict(CONFIG, bulk_bytes=400),
+                                  on_commit=lambda batches, index: commits.extend(batches))
+        assert sink.write_batch(1, docs("1", "2")) == 2
+        assert sink.write_batch(2, docs("3", "4", "5")) == 3
+        sink.close()
+        assert sorted(doc_id for ids in client.requests for doc_id in ids) == ["1", "2", "3", "4", "5"]
+        assert all(len(ids) <= 3 for ids in client.requests)
+        assert sorted(commits) == [1, 2]
+        assert sink.indexed_docs == 5
+
+    def test_only_rejected_items_retried(self):
+        client = FakeBulkClient([[201, 429, 201]])
+        sink = OpenSearchBulkSink(client, "id", CONFIG)
+        sink.write_batch(1, docs("1", "2", "3"))
+        sink.close()
+        assert client.requests == [["1", "2", "3"], ["2"]]
+        assert sink.retries == 1
+        assert sink.indexed_docs == 3
+
+    def test_rejected_request_retried(self):
+        client = FakeBulkClient([TransportError(429, "rejected")])
+        sink = OpenSearchBulkSink(client, "id", CONFIG)
+        sink.write_batch(1, docs("1"))
+        sink.close()
+        assert client.requests == [["1"], ["1"]]
+
+    def test_permanent_failures_not_retried(self):
+        client = FakeBulkClient([[201, 400]])
+        commits = []
+        sink = OpenSearchBulkSink(client, "id", CONFIG, on_commit=lambda batches, index: commits.extend(batches))
+        sink.write_batch(1, docs("1", "2"))
+        sink.close()
+        assert client.requests == [["1", "2"]]
+        assert sink.failures == [{"id": "2", "status": 400, "error": "mapper_parsing_exception: bad field"}]
+        assert commits == [1]
+
+    def test_failed_request_not_committed(self):
+        client = FakeBulkClient([TransportError(500, "boom")])
+        commits = []
+        sink = OpenSearchBulkSink(client, "id", CONFIG, on_commit=lambda batches, index: commits.extend(batches))
+        sink.write_batch(1, docs("1"))
+        with pytest.raises(BulkSinkException):
+            sink.close()
+        assert commits == []
+
+    def test_gives_up_after_max_retries(self):
+        client = FakeBulkClient([[429]] * 3)
+        sink = OpenSearchBulkSink(client, "id", dict(CONFIG, bulk_max_retries=2))
+        sink.write_batch(1, docs("1"))
+        with pytest.raises(BulkSinkException):
+            sink.close()
+        assert len(client.requests) == 3
+
+
+class ActionBulkClient(object):
+    """Answers bulk requests with a status per action line, by action and id"""
+
+    index_name = "demo"
+
+    def __init__(self, statuses):
+        self._statuses = statuses
+        self.actions = []
+
+    def bulk(self, body, filter_path=None):
+        items = []
+        errors = False
+        for line in body.decode("utf-8").splitlines():
+            entry = json.loads(line)
+            if set(entry) - {"index", "delete"}:
+                continue
+            action, meta = next(iter(entry.items()))
+            self.actions.append((action, meta))
+            status = self._statuses.get((action, meta["_id"]), 200)
+            result = {"status": status}
+            if status == 409:
+                result["error"] = {"type": "version_conflict_engine_exception", "reason": "newer version"}
+            errors = errors or status >= 300
+            items.append({action: result})
+        return {"errors": errors, "items": items}
+
+
+class TestVersionedBulkSink:
+
+    def test_external_versions_deletes_and_flush(self):
+        client = ActionBulkClient({("index", "2"): 409, ("delete", "8"): 404})
+        sink = OpenSearchBulkSink(client, "id", CONFIG)
+        sink.write_batch(1, [{"id": "1"}, {"id": "2"}], versions=[11, 12])
+        sink.delete_batch(2, ["8", "9"])
+        sink.flush()
+        assert ("index", {"_id": "1", "version": 11, "version_type": "external"}) in client.actions
+        assert (sink.indexed_docs, sink.stale_docs, sink.deleted_docs) == (1, 1, 2)
+        assert sink.failures == []
+        sink.write_batch(3, [{"id": "3"}])
+        sink.close()
+        assert client.actions[-1] == ("index", {"_id": "3"})
+        assert sink.indexed_docs == 2
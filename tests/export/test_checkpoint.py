@@ -0,0 +1,95 @@
+import json
+
+import pytest
+
+from migrate.export import CheckpointException, ExportJournal, PartitionCheckpoint
+
+FINGERPRINT = {"collection": "test", "partitions": [["all", None]]}
+
+
+def records(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+class TestExportJournal:
+
+    def test_resume_reads_committed_position(self, tmp_path):
+        journal = ExportJournal(str(tmp_path / "journal.jsonl"))
+        journal.start(FINGERPRINT)
+        journal.record_batch("p0", 1, "c1", 10, ["k1"])
+        journal.record_batch("p1", 2, "d1", 5, ["k2"])
+        journal.record_batch("p0", 3, "c2", 10, ["k3"])
+        journal.record_done("p1")
+        journal.close()
+
+        states = ExportJournal(journal.path).resume(FINGERPRINT)
+        assert (states["p0"].cursor_mark, states["p0"].docs, states["p0"].last_batch) == ("c2", 20, 3)
+        assert states["p0"].keys == {"k1", "k3"}
+        assert not states["p0"].done
+        assert states["p1"].done
+
+    def test_torn_last_line_ignored(self, tmp_path):
+        journal = ExportJournal(str(tmp_path / "journal.jsonl"))
+        journal.start(FINGERPRINT)
+        journal.record_batch("all", 1, "c1", 10, ["k1"])
+        journal.close()
+        with open(journal.path, "a") as f:
+            f.write('{"type": "batch", "partition": "all", "ba')
+
+        states = ExportJournal(journal.path).resume(FINGERPRINT)
+        assert states["all"].cursor_mark == "c1"
+
+    def test_changed_settings_rejected(self, tmp_path):
+        journal = ExportJournal(str(tmp_path / "journal.jsonl"))
+        journal.start(FINGERPRINT)
+        journal.close()
+        with pytest.raises(CheckpointException):
+            ExportJournal(journal.path).resume(dict(FINGERPRINT, collection="other"))
+
+    def test_missing_journal(self, tmp_path):
+        with pytest.raises(CheckpointException):
+            ExportJournal(str(tmp_path / "missing.jsonl")).resume(FINGERPRINT)
+
+
+class TestPartitionCheckpoint:
+
+    def setup_method(self, method):
+        self.journaled = []
+        journal = ExportJournal("unused")
+        journal.record_batch = lambda *args: self.journaled.append(args)
+        journal.record_done = lambda partition: self.journaled.append(("done", partition))
+        self.checkpoint = PartitionCheckpoint(journal, "all")
+
+    def test_out_of_order_commits_journaled_in_fetch_order(self):
+        for batch, cursor in [(1, "c1"), (2, "c2"), (3, "c3")]:
+            self.checkpoint.fetched(batch, cursor)
+        self.checkpoint.written(2, 10)
+        self.checkpoint.committed([2], "k2")
+        assert self.journaled == []
+        self.checkpoint.written(1, 10)
+        self.checkpoint.committed([1], "k1")
+        assert [entry[1] for entry in self.journaled] == [1, 2]
+        assert self.journaled[1] == ("all", 2, "c2", 10, {"k2"})
+
+    def test_written_batch_waits_for_commit(self):
+        self.checkpoint.fetched(1)
+        self.checkpoint.written(1, 10, "c1")
+        assert self.journaled == []
+        self.checkpoint.committed([1], "part_00001")
+        assert self.journaled == [("all", 1, "c1", 10, {"part_00001"})]
+
+    def test_discarded_and_empty_batches(self):
+        self.checkpoint.fetched(1)
+        self.checkpoint.fetched(2)
+        self.checkpoint.discard(1)
+        self.checkpoint.written(2, 0, "c1")
+        self.checkpoint.exhausted()
+        assert self.checkpoint.close()
+        assert self.journaled == [("all", 2, "c1", 0, set()), ("done", "all")]
+
+    def test_not_done_with_uncommitted_batch(self):
+        self.checkpoint.fetched(1, "c1")
+        self.checkpoint.exhausted()
+        assert not self.checkpoint.close()
+        assert self.journaled == []
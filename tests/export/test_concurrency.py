@@ -0,0 +1,116 @@
+from unittest.mock import patch
+
+import pytest
+
+from migrate.export import AimdController, BudgetedClient, RequestBudget
+
+
+class TestAimdController:
+
+    def test_from_config(self):
+        assert AimdController.from_config({}, 4) is None
+        controller = AimdController.from_config({'adaptive_concurrency': True, 'solr_max_concurrency': 8,
+                                                 'solr_initial_concurrency': 2, 'solr_target_latency_ms': 500}, 4)
+        assert (controller.limit, controller.max_concurrency, controller.target_latency) == (2, 8, 0.5)
+        throttled = AimdController.from_config({'solr_max_rps': 20}, 4)
+        assert (throttled.adaptive, throttled.limit, throttled.max_rps) == (False, 4, 20)
+
+    def test_additive_increase(self):
+        controller = AimdController(4, initial_concurrency=2, target_latency=1)
+        for _ in range(2):
+            controller.acquire()
+            controller.release(0.1)
+        assert controller.limit == 3
+        for _ in range(3):
+            controller.acquire()
+            controller.release(0.1)
+        assert controller.limit == 4
+        for _ in range(10):
+            controller.acquire()
+            controller.release(0.1)
+        assert controller.limit == 4
+        assert [decision["limit"] for decision in controller.stats()["decisions"]] == [3, 4]
+
+    @pytest.mark.parametrize("latency,status", [(2.0, 200), (0.1, 503), (0.1, 429), (0.1, None)])
+    def test_multiplicative_decrease(self, latency, status):
+        controller = AimdController(8, min_concurrency=2, target_latency=1)
+        controller.acquire()
+        controller.release(latency, status)
+        assert controller.limit == 4
+        stats = controller.stats()
+        assert stats["decreases"] == 1
+        assert stats["decisions"][0]["limit"] == 4
+
+    def test_decrease_once_per_target_latency(self):
+        controller = AimdController(8, min_concurrency=1, target_latency=1)
+        for now in (100, 100.5, 101.5):
+            with patch("migrate.export.concurrency.time.monotonic", return_value=now):
+                controller.release(0.1, 503)
+        assert controller.limit == 2
+        assert controller.overloads == 3
+
+    def test_not_below_min_concurrency(self):
+        controller = AimdController(4, min_concurrency=3, target_latency=0)
+        controller.release(5, 503)
+        controller.release(5, 503)
+        assert controller.limit == 3
+
+    def test_not_adaptive_keeps_limit(self):
+        controller = AimdController(4, adaptive=False)
+        controller.release(5, 503)
+        assert controller.limit == 4
+        assert controller.overloads == 1
+
+    @patch("migrate.export.concurrency.time.sleep")
+    def test_requests_per_second_ceiling(self, sleep):
+        controller = AimdController(10, max_rps=2, adaptive=False)
+        with patch("migrate.export.concurrency.time.monotonic", return_value=50.0):
+            for _ in range(3):
+                controller.acquire()
+        assert [call.args[0] for call in sleep.call_args_list] == [0.5, 1.0]
+        assert controller.stats()["throttled_seconds"] == 1.5
+
+    def test_request_records_status(self):
+        controller = AimdController(4, target_latency=1)
+        with pytest.raises(RuntimeError):
+            with controller.request() as outcome:
+                outcome.status = 503
+                raise RuntimeError("503 Service Unavailable")
+        assert controller.limit == 2
+        with controller.request():
+            pass
+        stats = controller.stats()
+        assert (stats["requests"], stats["overloads"]) == (2, 1)
+
+
+class TestRequestBudget:
+
+    def test_limits_requests_in_flight(self):
+        budget = RequestBudget("solr", 2)
+        with budget.request():
+            with budget.request():
+                assert not budget._slots.acquire(blocking=False)
+        with budget.request():
+            pass
+        stats = budget.stats()
+        assert (stats["limit"], stats["requests"], stats["peak_in_flight"]) == (2, 3, 2)
+
+    def test_releases_on_error(self):
+        budget = RequestBudget("s3", 1)
+        with pytest.raises(RuntimeError):
+            with budget.request():
+                raise RuntimeError("boom")
+        assert budget._slots.acquire(blocking=False)
+
+    def test_budgeted_client(self):
+        class Client:
+            region = "us-east-1"
+
+            def put_object(self, **kwargs):
+                return budget.stats()["peak_in_flight"]
+
+        budget = RequestBudget("s3", 4)
+        client = BudgetedClient(Client(), budget)
+        assert client.put_object(Bucket="b", Key="k") == 1
+        assert client.region == "us-east-1"
+        assert budget.stats()["requests"] == 1
@@ -0,0 +1,23 @@
+import os
+
+from migrate.export import DeadLetterStore
+
+
+class TestDeadLetterStore:
+
+    def test_add_read_rewrite(self, tmp_path):
+        store = DeadLetterStore(str(tmp_path / "out" / "dead_letter.jsonl"))
+        assert store.read() == []
+        store.add("3", 7, "c2", ValueError("Expecting value"), '{"id":"3","bin":UEsD}')
+        store.add("9", 8, "c8", ValueError("Expecting value"), '{"id":"9"')
+        records = store.read()
+        assert store.count == 2
+        assert [(r["id"], r["batch"], r["cursor_mark"]) for r in records] == [("3", 7, "c2"), ("9", 8, "c8")]
+        assert records[0]["raw"] == '{"id":"3","bin":UEsD}'
+        assert records[0]["error"] == "Expecting value"
+
+        store.rewrite(records[1:])
+        assert [r["id"] for r in store.read()] == ["9"]
+        store.rewrite([])
+        assert not os.path.exists(store.path)
+        assert store.count == 0
@@ -0,0 +1,42 @@
+import os
+import tempfile
+
+from migrate.export import DeltaWatermark, delta_filter_query, open_delta_window
+
+
+class TestDeltaWatermark:
+
+    def test_missing_watermark(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            assert DeltaWatermark(os.path.join(output_dir, "watermark.json"), "last_modified").load() is None
+
+    def test_roundtrip(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            path = os.path.join(output_dir, "watermark.json")
+            DeltaWatermark(path, "last_modified").save("2024-05-01T10:00:00Z")
+            assert DeltaWatermark(path, "last_modified").load() == "2024-05-01T10:00:00Z"
+
+    def test_other_field_is_ignored(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            path = os.path.join(output_dir, "watermark.json")
+            DeltaWatermark(path, "last_modified").save("2024-05-01T10:00:00Z")
+            assert DeltaWatermark(path, "_version_").load() is None
+
+
+class TestDeltaWindow:
+
+    def test_base_load(self):
+        window = open_delta_window("_version_", None, 42, "solr-data/")
+        assert window["s3_export_prefix"] == "solr-data/"
+        assert delta_filter_query(window) is None
+        assert delta_filter_query(None) is None
+
+    def test_delta_run(self):
+        window = open_delta_window("last_modified", "2024-05-01T10:00:00Z", "2024-05-02T10:00:00Z", "solr-data/")
+        assert window["s3_export_prefix"].startswith("solr-data/delta_")
+        assert window["s3_export_prefix"].endswith("/")
+        assert delta_filter_query(window) == 'last_modified:{"2024-05-01T10:00:00Z" TO "2024-05-02T10:00:00Z"]'
+
+    def test_open_upper_bound(self):
+        window = open_delta_window("_version_", 41, None, "solr-data/")
+        assert delta_filter_query(window) == '_version_:{"41" TO *]'
@@ -0,0 +1,93 @@
+import pytest
+
+from migrate.export import (ExportFieldPlan, ExportHandlerException, FieldProjection, export_batches,
+                            merge_stored_fields, parallel_search_expression, resume_filter_query)
+
+SCHEMA = {
+    "version": 1.6,
+    "uniqueKey": "id",
+    "fieldTypes": [
+        {"name": "string", "class": "solr.StrField"},
+        {"name": "plong", "class": "solr.LongPointField"},
+        {"name": "text_general", "class": "solr.TextField"},
+        {"name": "binary", "class": "solr.BinaryField"},
+        {"name": "string_nodv", "class": "solr.StrField", "docValues": False},
+    ],
+    "fields": [
+        {"name": "id", "type": "string"},
+        {"name": "_version_", "type": "plong"},
+        {"name": "price", "type": "plong"},
+        {"name": "title", "type": "text_general"},
+        {"name": "data", "type": "binary"},
+        {"name": "tag", "type": "string_nodv"},
+        {"name": "code", "type": "string", "docValues": False, "stored": False},
+    ],
+    "dynamicFields": [{"name": "*_txt", "type": "text_general"}],
+}
+
+
+class TestExportFieldPlan:
+
+    def test_split_by_docvalues(self):
+        plan = ExportFieldPlan(SCHEMA, "id")
+        assert plan.export_fields == ["id", "price"]
+        assert plan.select_fields == ["title", "data", "tag", "*_txt"]
+        assert plan.export_fl == "id,price"
+        assert plan.select_fl == "id,title,data,tag,*_txt"
+        assert plan.usable
+
+    def test_stored_multivalued_fields_from_select(self):
+        schema = dict(SCHEMA, fieldTypes=SCHEMA["fieldTypes"] + [
+            {"name": "strings", "class": "solr.StrField", "multiValued": True}])
+        schema["fields"] = [{"name": "id", "type": "string"},
+                            {"name": "tags", "type": "strings"},
+                            {"name": "sizes", "type": "plong", "multiValued": True},
+                            {"name": "codes", "type": "strings", "stored": False}]
+        plan = ExportFieldPlan(schema, "id")
+        assert plan.export_fields == ["id", "codes"]
+        assert plan.select_fields == ["tags", "sizes", "*_txt"]
+
+    def test_old_schema_has_no_default_docvalues(self):
+        plan = ExportFieldPlan(dict(SCHEMA, version=1.5), "id")
+        assert plan.export_fields == []
+        assert not plan.usable
+
+    def test_projected_fields(self):
+        projection = FieldProjection({"mappings": {"properties": {"price": {"type": "long"}}}}, "id")
+        plan = ExportFieldPlan(SCHEMA, "id", projection.fields)
+        assert plan.export_fl == "id,price"
+        assert plan.select_fl is None
+
+    def test_from_config(self):
+        assert ExportFieldPlan.from_config({}, SCHEMA, "id") is None
+        assert ExportFieldPlan.from_config({'export_engine': 'export'}, SCHEMA, "id").usable
+        assert ExportFieldPlan.from_config({'export_engine': 'export'}, SCHEMA, "tag") is None
+        with pytest.raises(ExportHandlerException):
+            ExportFieldPlan.from_config({'export_engine': 'sql'}, SCHEMA, "id")
+
+
+class TestExportStream:
+
+    def test_resume_filter_query(self):
+        assert resume_filter_query("id", "*") is None
+        assert resume_filter_query("id", "doc 7") == 'id:{"doc 7" TO *]'
+
+    def test_parallel_search_expression(self):
+        plan = ExportFieldPlan(SCHEMA, "id")
+        expression = parallel_search_expression("books", plan, ['id:{"a" TO *]'], 4)
+        assert expression == ('parallel(books, search(books, q="*:*", fl="id,price", sort="id asc", qt="/export", '
+                              'fq="id:{\\"a\\" TO *]", partitionKeys=id), workers=4, sort="id asc")')
+        assert parallel_search_expression("books", plan, [], 1).startswith("search(books, ")
+
+    def test_export_batches(self):
+        docs = [{"id": str(i)} for i in range(5)] + [{"EOF": True, "RESPONSE_TIME": 3}]
+        assert [len(batch) for batch in export_batches(docs, 2)] == [2, 2, 1]
+
+    def test_export_batches_exception(self):
+        with pytest.raises(ExportHandlerException):
+            list(export_batches([{"id": "1"}, {"EXCEPTION": "no docValues", "EOF": True}], 10))
+
+    def test_merge_stored_fields(self):
+        docs = [{"id": "1", "price": 3}, {"id": "2", "price": 4}]
+        merged = merge_stored_fields(docs, [{"id": "2", "title": "t"}], "id")
+        assert merged == [{"id": "1", "price": 3}, {"id": "2", "price": 4, "title": "t"}]
@@ -0,0 +1,25 @@
+import pytest
+
+from migrate.export import EXTRA, MISSING, IdDiffException, merge_sorted_ids, read_id_chunks
+
+
+class TestIdDiff:
+
+    def test_merge_sorted_ids(self):
+        source = iter(["a", "b", "d", "f", "g"])
+        target = iter(["b", "c", "d", "g", "h"])
+        assert list(merge_sorted_ids(source, target)) == [(MISSING, "a"), (EXTRA, "c"), (MISSING, "f"), (EXTRA, "h")]
+
+    def test_one_side_empty(self):
+        assert list(merge_sorted_ids(iter([]), iter(["1", "2"]))) == [(EXTRA, "1"), (EXTRA, "2")]
+        assert list(merge_sorted_ids(iter([""]), iter([]))) == [(MISSING, "")]
+
+    def test_unsorted_ids_are_rejected(self):
+        # a numeric uniqueKey sorted by number is not in string order
+        with pytest.raises(IdDiffException):
+            list(merge_sorted_ids(iter(["9", "10"]), iter(["10", "9"])))
+
+    def test_read_id_chunks(self, tmp_path):
+        path = tmp_path / "ids.txt"
+        path.write_text("1\n2\n\n3\r\n4\n5\n", encoding="utf-8")
+        assert list(read_id_chunks(str(path), 2)) == [["1", "2"], ["3", "4"], ["5"]]
@@ -0,0 +1,77 @@
+import os
+import xml.etree.ElementTree as ElementTree
+
+from migrate.export import ChildStitcher, NestedStats, nest_path_field, readable_field
+
+SCHEMA = {
+    "fieldTypes": [{"name": "string", "class": "solr.StrField"},
+                   {"name": "_nest_path_", "class": "solr.NestPathField"}],
+    "fields": [{"name": "id", "type": "string"}, {"name": "_root_", "type": "string"},
+               {"name": "_nest_path_", "type": "_nest_path_"}],
+}
+SAMPLE_SCHEMA = os.path.join(os.path.dirname(__file__), "..", "..", "docker", "config", "conf", "managed-schema")
+
+
+def read_sample_schema():
+    """The sample managed-schema in the shape of the Schema API response"""
+    root = ElementTree.parse(SAMPLE_SCHEMA).getroot()
+
+    def attributes(element):
+        return {key: {"true": True, "false": False}.get(value, value) for key, value in element.attrib.items()}
+    return {"version": float(root.get("version")),
+            "fieldTypes": [attributes(element) for element in root.iter("fieldType")],
+            "fields": [attributes(element) for element in root.iter("field")]}
+
+
+class TestChildStitcher:
+
+    def test_nest_path_field(self):
+        assert nest_path_field(SCHEMA) == "_nest_path_"
+        assert nest_path_field({"fieldTypes": [], "fields": [{"name": "id", "type": "string"}]}) is None
+
+    def test_from_config(self):
+        assert ChildStitcher.from_config({}, SCHEMA, "id").nest_path == "_nest_path_"
+        assert ChildStitcher.from_config({'nested_engine': 'child'}, SCHEMA, "id") is None
+        assert ChildStitcher.from_config({}, {"fields": []}, "id") is None
+
+    def test_sample_schema_root_not_readable(self):
+        schema = read_sample_schema()
+        assert nest_path_field(schema) == "_nest_path_"
+        assert not readable_field(schema, "_root_")
+        assert readable_field(schema, "id")
+        # without a readable _root_ children cannot be joined to their parents in bulk
+        assert ChildStitcher.from_config({}, schema, "id") is None
+        stored_root = dict(schema, fields=[dict(field, stored=True) if field["name"] == "_root_" else field
+                                           for field in schema["fields"]])
+        assert ChildStitcher.from_config({}, stored_root, "id") is not None
+
+    def test_stitch_in_nest_path_order(self):
+        parents = [{"id": "1"}, {"id": "2"}]
+        children = [
+            {"id": "1/c1/r0", "_root_": "1", "_nest_path_": "/comments#1/replies#0"},
+            {"id": "1/c1", "_root_": "1", "_nest_path_": "/comments#1"},
+            {"id": "1/c0", "_root_": "1", "_nest_path_": "/comments#0"},
+            {"id": "2/a", "_root_": "2", "_nest_path_": "/author#"},
+        ]
+        counts, orphans = ChildStitcher("id").stitch(parents, children)
+        assert counts == [3, 1]
+        assert orphans == 0
+        assert [child["id"] for child in parents[0]["comments"]] == ["1/c0", "1/c1"]
+        assert parents[0]["comments"][1]["replies"][0]["id"] == "1/c1/r0"
+        assert parents[1]["author"]["id"] == "2/a"
+
+    def test_more_children_than_child_transformer_limit(self):
+        parents = [{"id": "1"}]
+        children = [{"id": f"1/c{i}", "_root_": "1", "_nest_path_": f"/comments#{i}"} for i in range(25)]
+        counts, _ = ChildStitcher("id").stitch(parents, children)
+        assert [child["id"] for child in parents[0]["comments"]] == [f"1/c{i}" for i in range(25)]
+        stats = NestedStats()
+        stats.add(counts)
+        stats.add([2, 0])
+        assert (stats.parents, stats.children, stats.max_children, stats.wide_parents) == (3, 27, 25, 1)
+
+    def test_orphans(self):
+        counts, orphans = ChildStitcher("id").stitch([{"id": "1"}], [
+            {"id": "9/c0", "_root_": "9", "_nest_path_": "/comments#0"}])
+        assert counts == [0]
+        assert orphans == 1
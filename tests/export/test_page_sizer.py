@@ -0,0 +1,39 @@
+from migrate.export import AdaptivePageSizer
+
+
+class TestAdaptivePageSizer:
+
+    def test_fixed_when_not_adaptive(self):
+        sizer = AdaptivePageSizer.from_config({'rows_per_page': 500})
+        assert sizer.observe(1, 500, 100, 0.1) == 500
+        assert sizer.observe(2, 500, 100 * 1024 * 1024, 100) == 500
+
+    def test_grows_at_most_twice_per_page(self):
+        sizer = AdaptivePageSizer(100, min_rows=10, max_rows=10000, target_bytes=1024 * 1024, max_seconds=30)
+        # 100 bytes per document would allow about 10000 rows
+        assert sizer.observe(1, 100, 100 * 100, 0.1) == 200
+        assert sizer.observe(2, 200, 200 * 100, 0.2) == 400
+
+    def test_shrinks_toward_target_bytes(self):
+        sizer = AdaptivePageSizer(1000, min_rows=10, max_rows=10000, target_bytes=1024 * 1024, max_seconds=300)
+        # 10 KiB per document allows about 100 rows
+        assert sizer.observe(1, 1000, 1000 * 10 * 1024, 1) == 500
+        assert sizer.observe(2, 500, 500 * 10 * 1024, 1) == 250
+        assert sizer.observe(3, 250, 250 * 10 * 1024, 1) == 125
+        assert sizer.observe(4, 125, 125 * 10 * 1024, 1) == 102
+
+    def test_latency_ceiling(self):
+        sizer = AdaptivePageSizer(1000, min_rows=10, max_rows=10000, target_bytes=1024 * 1024 * 1024, max_seconds=10)
+        # 40s for 1000 documents allows 250 rows within 10s
+        assert sizer.observe(1, 1000, 1000, 40) == 500
+        assert sizer.observe(2, 500, 500, 20) == 250
+
+    def test_bounds(self):
+        sizer = AdaptivePageSizer(100, min_rows=80, max_rows=150, target_bytes=1024, max_seconds=30)
+        assert sizer.observe(1, 100, 100 * 1024, 1) == 80
+        sizer = AdaptivePageSizer(100, min_rows=80, max_rows=150, target_bytes=1024 * 1024, max_seconds=30)
+        assert sizer.observe(1, 100, 100, 0.01) == 150
+
+    def test_empty_page_keeps_rows(self):
+        sizer = AdaptivePageSizer(100, min_rows=10, max_rows=1000)
+        assert sizer.observe(1, 0, 50, 0.01) == 100
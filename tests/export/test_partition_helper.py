@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from migrate.export import (ExportPartition, ExportProgress, PartitionException, WorkStealingPool, build_partitions,
+                            uncached_params, uncached_query)
+
+
+class TestBuildPartitions:
+
+    def test_single_partition_by_default(self):
+        partitions = build_partitions({})
+        assert len(partitions) == 1
+        assert partitions[0].filter_query is None
+
+    def test_export_workers_do_not_partition(self):
+        assert len(build_partitions({'export_workers': 3})) == 1
+
+    def test_hash_partitions(self):
+        partitions = build_partitions({'export_partitions': 3}, unique_key='doc_id')
+        assert [p.name for p in partitions] == ['hash_0', 'hash_1', 'hash_2']
+        assert partitions[1].filter_query == '{!hash workers=3 worker=1 partitionKeys=doc_id}'
+
+    def test_range_partitions(self):
+        partitions = build_partitions({'partition_mode': 'range', 'partition_boundaries': ['n', 'g']})
+        assert [p.filter_query for p in partitions] == [
+            'id:[* TO "g"}',
+            'id:["g" TO "n"}',
+            'id:["n" TO *]',
+        ]
+
+    def test_unknown_mode(self):
+        with pytest.raises(PartitionException):
+            build_partitions({'partition_mode': 'modulo'})
+
+
+class TestExportProgress:
+
+    def test_limit(self):
+        progress = ExportProgress(limit=10)
+        assert progress.next_batch() == 1
+        assert progress.next_batch() == 2
+        progress.add_exported(6)
+        assert not progress.limit_reached()
+        progress.add_exported(4)
+        assert progress.limit_reached()
+
+
+class TestWorkStealingPool:
+
+    def test_runs_every_item_once(self):
+        done = []
+        lock = threading.Lock()
+
+        def work(item):
+            with lock:
+                done.append(item)
+
+        errors = WorkStealingPool(3).run(list(range(20)), work)
+        assert errors == []
+        assert sorted(done) == list(range(20))
+
+    def test_idle_worker_steals(self):
+        # worker 0 gets items 0 and 2, worker 1 gets item 1; item 0 blocks worker 0 so item 2 must be stolen
+        workers = {}
+
+        def work(item):
+            workers[item] = threading.current_thread().name
+            if item == 0:
+                time.sleep(0.2)
+
+        WorkStealingPool(2).run([0, 1, 2], work)
+        assert workers[2] == workers[1]
+
+    def test_errors_are_collected(self):
+        def work(item):
+            if item.name == 'bad':
+                raise ValueError("boom")
+
+        items = [ExportPartition('good'), ExportPartition('bad')]
+        errors = WorkStealingPool(2).run(items, work)
+        assert len(errors) == 1
+        assert errors[0][0].name == 'bad'
+
+
+class TestUncachedQuery:
+
+    def test_uncached_query(self):
+        assert uncached_query('*:*') == '{!cache=false}*:*'
+        assert uncached_query('{!parent which="*:* -_nest_path_:*"}') == \
+            '{!parent which="*:* -_nest_path_:*" cache=false}'
+        assert uncached_query('{!terms f=id cache=true}a,b') == '{!terms f=id cache=true}a,b'
+
+    def test_uncached_params(self):
+        params = {'q': '*:*', 'fq': ['a:1', '{!frange l=0 u=1}hash(id)'], 'rows': 10}
+        assert uncached_params(params) == {'q': '{!cache=false}*:*',
+                                           'fq': ['{!cache=false}a:1', '{!frange l=0 u=1 cache=false}hash(id)'],
+                                           'rows': 10}
+        assert params['q'] == '*:*'
+        assert uncached_params({'q': 'a', 'fq': 'b:1'})['fq'] == '{!cache=false}b:1'
@@ -0,0 +1,93 @@
+import threading
+
+from migrate.export import ExportPipeline, PipelineStage, extract_next_cursor_mark
+
+
+class TestExtractNextCursorMark:
+
+    def test_cursor_after_docs(self):
+        text = '{"response":{"docs":[{"id":"1","nextCursorMark":"fake"}]},"nextCursorMark":"AoE/ABC="}'
+        assert extract_next_cursor_mark(text) == 'AoE/ABC='
+
+    def test_whitespace(self):
+        text = '{\n  "response":{"docs":[]},\n  "nextCursorMark" : "AoE"\n}'
+        assert extract_next_cursor_mark(text) == 'AoE'
+
+    def test_missing(self):
+        assert extract_next_cursor_mark('invalid json {{{') is None
+
+
+class TestExportPipeline:
+
+    def test_items_flow_through_all_stages(self):
+        uploaded = []
+        lock = threading.Lock()
+
+        def source():
+            for i in range(10):
+                yield i
+
+        def upload(item):
+            with lock:
+                uploaded.append(item)
+
+        pipeline = ExportPipeline("fetch", source,
+                                  [PipelineStage("parse", lambda i: i * 2), PipelineStage("upload", upload, 3)],
+                                  [1, 1])
+        errors = pipeline.run()
+
+        assert errors == []
+        assert sorted(uploaded) == [i * 2 for i in range(10)]
+        assert [s.items for s in pipeline.stages] == [10, 10, 10]
+
+    def test_none_drops_item(self):
+        uploaded = []
+        pipeline = ExportPipeline("fetch", lambda: iter(range(6)),
+                                  [PipelineStage("parse", lambda i: i if i % 2 else None),
+                                   PipelineStage("upload", uploaded.append)],
+                                  [2, 2])
+        pipeline.run()
+        assert uploaded == [1, 3, 5]
+
+    def test_stage_error_stops_source(self):
+        fetched = []
+
+        def source():
+            for i in range(1000):
+                fetched.append(i)
+                yield i
+
+        def parse(item):
+            if item == 2:
+                raise ValueError("bad page")
+            return item
+
+        pipeline = ExportPipeline("fetch", source, [PipelineStage("parse", parse), PipelineStage("upload", str)],
+                                  [1, 1])
+        errors = pipeline.run()
+
+        assert len(errors) == 1
+        assert errors[0][0] == "parse"
+        assert len(fetched) < 1000
+
+    def test_source_error(self):
+        def source():
+            yield 1
+            raise ConnectionError("solr down")
+
+        errors = ExportPipeline("fetch", source, [PipelineStage("upload", str)], [1]).run()
+        assert errors[0][0] == "fetch"
+
+    def test_discard_items_drained_after_error(self):
+        discarded = []
+
+        def parse(item):
+            if item == 0:
+                raise ValueError("bad page")
+            return item
+
+        stage = PipelineStage("parse", parse, discard=discarded.append)
+        errors = ExportPipeline("fetch", lambda: iter(range(5)), [stage], [10]).run()
+
+        assert errors[0][0] == "parse"
+        assert stage.items + len(discarded) == 4
@@ -0,0 +1,37 @@
+from migrate.export import FieldProjection
+
+INDEX_JSON = {
+    "mappings": {
+        "properties": {"_version_": {"type": "long"}, "_root_": {"type": "keyword"}, "title": {"type": "text"},
+                       "comments": {"type": "nested"}, "id": {"type": "keyword"}},
+        "dynamic_templates": [{"*_txt": {"match": "*_txt", "mapping": {"type": "text"}}}],
+    }
+}
+
+
+class TestFieldProjection:
+
+    def test_field_list_from_mapping(self):
+        projection = FieldProjection(INDEX_JSON, "id")
+        assert projection.field_list == "comments,id,title,*_txt,[child limit=-1]"
+
+    def test_unique_key_always_exported(self):
+        projection = FieldProjection({"mappings": {"properties": {"title": {"type": "text"}}}}, "key")
+        assert projection.field_list == "key,title,[child limit=-1]"
+
+    def test_empty_mapping_exports_all_fields(self):
+        assert FieldProjection({}, "id").field_list == "*,[child limit=-1]"
+
+    def test_prunes_internal_fields_of_children(self):
+        doc = {"id": "1", "_version_": 7, "_root_": "1",
+               "comments": [{"id": "1/c", "_nest_path_": "/comments#0", "_root_": "1", "text": "hi"}]}
+        assert FieldProjection(INDEX_JSON, "id").apply(doc) == {"id": "1", "comments": [{"id": "1/c", "text": "hi"}]}
+
+    def test_rename(self):
+        projection = FieldProjection(INDEX_JSON, "id", {"title": "name", "id": "doc_id"})
+        assert list(projection.apply_all([{"id": "1", "title": "t"}])) == [{"doc_id": "1", "name": "t"}]
+        assert projection.target_name("id") == "doc_id"
+        assert projection.target_name("other") == "other"
+
+    def test_disabled_by_default(self):
+        assert FieldProjection.from_config({}, INDEX_JSON, "id") is None
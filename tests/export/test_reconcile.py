@@ -0,0 +1,50 @@
+import pytest
+
+from migrate.export import BucketChecksums, diff_buckets, document_digest, id_bucket
+
+
+def _checksums(docs, bits=8):
+    checksums = BucketChecksums(bits)
+    for doc in docs:
+        checksums.add(doc["id"], doc)
+    return checksums
+
+
+class TestReconcile:
+
+    def test_digest_ignores_field_order(self):
+        assert document_digest("1", {"a": 1, "b": [1, 2]}) == document_digest("1", {"b": [1, 2], "a": 1})
+        assert document_digest("1", {"a": 1}) != document_digest("1", {"a": 2})
+        assert document_digest("1", {"a": 1}) != document_digest("2", {"a": 1})
+
+    def test_id_bucket(self):
+        assert all(0 <= id_bucket(str(i), 4) < 16 for i in range(100))
+        assert id_bucket("doc-1", 12) == id_bucket("doc-1", 12)
+
+    def test_order_independent_and_mergeable(self):
+        docs = [{"id": str(i), "title": f"t{i}"} for i in range(50)]
+        merged = _checksums(docs[:20])
+        merged.merge(_checksums(docs[20:]))
+        assert diff_buckets(_checksums(list(reversed(docs))), merged)[0] == []
+        assert merged.total == 50
+
+    def test_finds_changed_missing_and_swapped_documents(self):
+        docs = [{"id": str(i), "title": f"t{i}"} for i in range(200)]
+        target_docs = [dict(doc) for doc in docs[1:]]
+        target_docs[10]["title"] = "changed"
+        # a missing and an extra document keep the totals equal
+        target_docs.append({"id": "extra", "title": "x"})
+        source, target = _checksums(docs), _checksums(target_docs)
+        assert source.total == target.total
+
+        differing, compared = diff_buckets(source, target)
+        buckets = {bucket["bucket"]: bucket for bucket in differing}
+        assert set(buckets) == {id_bucket("0", 8), id_bucket("11", 8), id_bucket("extra", 8)}
+        changed = buckets[id_bucket("11", 8)]
+        assert changed["source_docs"] == changed["target_docs"]
+        # only differing ranges are descended into
+        assert compared < 256
+
+    def test_bucket_bits_must_match(self):
+        with pytest.raises(ValueError):
+            diff_buckets(BucketChecksums(4), BucketChecksums(5))
@@ -0,0 +1,52 @@
+from unittest.mock import Mock, patch
+
+import pytest
+import requests
+
+from migrate.export import RetryPolicy, is_transient
+
+
+class TestRetryPolicy:
+
+    def test_from_config(self):
+        policy = RetryPolicy.from_config({'batch_max_retries': 5, 'batch_initial_backoff': 2})
+        assert (policy.max_retries, policy.initial_backoff, policy.max_backoff) == (5, 2.0, 30.0)
+
+    @patch("migrate.export.retry.time.sleep")
+    def test_retries_until_success_with_backoff(self, sleep):
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise ConnectionError("solr timeout")
+            return "page"
+
+        policy = RetryPolicy(max_retries=3, initial_backoff=1, max_backoff=1.5)
+        assert policy.call(flaky, "Batch 1") == "page"
+        assert policy.retries == 2
+        delays = [call.args[0] for call in sleep.call_args_list]
+        assert 0.5 <= delays[0] <= 1
+        assert 0.75 <= delays[1] <= 1.5
+
+    @patch("migrate.export.retry.time.sleep")
+    def test_raises_last_error(self, sleep):
+        policy = RetryPolicy(max_retries=2)
+        with pytest.raises(requests.Timeout):
+            policy.call(Mock(side_effect=requests.Timeout("read timed out")), "Batch 1")
+        assert sleep.call_count == 2
+
+    @patch("migrate.export.retry.time.sleep")
+    def test_raises_permanent_error_at_once(self, sleep):
+        policy = RetryPolicy(max_retries=2)
+        with pytest.raises(ValueError):
+            policy.call(lambda: int("x"), "Batch 1")
+        assert sleep.call_count == 0 and policy.retries == 0
+
+    def test_is_transient(self):
+        def http_error(status):
+            return requests.HTTPError(response=Mock(status_code=status))
+        assert is_transient(requests.ConnectionError()) and is_transient(requests.Timeout())
+        assert is_transient(http_error(429)) and is_transient(http_error(503))
+        assert not is_transient(http_error(400)) and not is_transient(http_error(404))
+        assert not is_transient(KeyError("response"))
@@ -0,0 +1,56 @@
+import pytest
+
+from migrate.export import PartitionException, order_replicas, parse_shards_preference, shard_partitions
+
+
+def _replica(core, replica_type, leader=False, node="n1:8983_solr", state="active"):
+    return {"core": core, "base_url": f"http://{node.split('_')[0]}/solr", "node_name": node, "state": state,
+            "type": replica_type, "leader": "true" if leader else "false"}
+
+
+CLUSTER_STATUS = {
+    "live_nodes": ["n1:8983_solr", "n2:8983_solr", "n3:8983_solr"],
+    "collections": {"books": {"shards": {
+        "shard2": {"state": "active", "replicas": {
+            "core_node1": _replica("books_shard2_replica_n1", "NRT", leader=True),
+            "core_node2": _replica("books_shard2_replica_n2", "NRT", node="n2:8983_solr"),
+        }},
+        "shard1": {"state": "active", "replicas": {
+            "core_node3": _replica("books_shard1_replica_t1", "TLOG", leader=True),
+            "core_node4": _replica("books_shard1_replica_p1", "PULL", node="n4:8983_solr"),
+            "core_node5": _replica("books_shard1_replica_p2", "PULL", node="n3:8983_solr"),
+        }},
+        "shard3": {"state": "inactive", "replicas": {}},
+    }}},
+}
+
+
+class TestShardPartitions:
+
+    def test_prefers_pull_and_non_leader_replicas(self):
+        partitions = shard_partitions(CLUSTER_STATUS, "books")
+        assert [partition.name for partition in partitions] == ["shard1", "shard2"]
+        # the first PULL replica is on a node that is not live
+        assert partitions[0].core_url == "http://n3:8983/solr/books_shard1_replica_p2"
+        assert partitions[1].core_url == "http://n2:8983/solr/books_shard2_replica_n2"
+        assert partitions[0].filter_query is None
+
+    def test_custom_preference(self):
+        partitions = shard_partitions(CLUSTER_STATUS, "books", "replica.leader:true")
+        assert partitions[0].core_url.endswith("books_shard1_replica_t1")
+        assert partitions[1].core_url.endswith("books_shard2_replica_n1")
+
+    def test_order_by_rule_priority(self):
+        replicas = [_replica("a", "NRT"), _replica("b", "TLOG", node="n2:8983_solr"), _replica("c", "TLOG")]
+        rules = parse_shards_preference("replica.type:TLOG,replica.location:http://n2")
+        assert [replica["core"] for replica in order_replicas(replicas, rules)] == ["b", "c", "a"]
+
+    def test_unsupported_rule(self):
+        with pytest.raises(PartitionException):
+            parse_shards_preference("node.sysprop:sysprop.rack")
+
+    def test_shard_without_active_replica(self):
+        status = {"live_nodes": [], "collections": {"books": {"shards": {"shard1": {"replicas": {
+            "core_node1": _replica("books_shard1_replica_n1", "NRT", state="down")}}}}}}
+        with pytest.raises(PartitionException):
+            shard_partitions(status, "books")
@@ -0,0 +1,211 @@
+import json
+import os
+import tempfile
+import threading
+from unittest.mock import Mock
+
+import pytest
+
+from migrate.export import (ExportSink, LocalDirectorySink, RollingS3Sink, S3BatchSink, SinkException, TeeSink,
+                            export_targets)
+from migrate.export.sinks import MIN_PART_BYTES
+
+
+def recording_s3():
+    s3 = Mock()
+    s3.objects = {}
+    s3.parts = {}
+
+    def put_object(Bucket, Key, Body, **kwargs):
+        s3.objects[Key] = Body if isinstance(Body, bytes) else Body.read()
+
+    def upload_part(Bucket, Key, UploadId, PartNumber, Body):
+        s3.parts.setdefault(Key, {})[PartNumber] = Body
+        return {'ETag': f'etag-{PartNumber}'}
+
+    def complete_multipart_upload(Bucket, Key, UploadId, MultipartUpload):
+        numbers = [part['PartNumber'] for part in MultipartUpload['Parts']]
+        assert numbers == sorted(numbers)
+        s3.objects[Key] = b"".join(s3.parts[Key][number] for number in numbers)
+
+    s3.put_object.side_effect = put_object
+    s3.upload_part.side_effect = upload_part
+    s3.complete_multipart_upload.side_effect = complete_multipart_upload
+    s3.create_multipart_upload.return_value = {'UploadId': 'upload-1'}
+    return s3
+
+
+def ndjson_docs(body):
+    return [json.loads(line) for line in body.splitlines()]
+
+
+class TestS3BatchSink:
+
+    def test_one_object_per_batch(self):
+        s3 = recording_s3()
+        sink = S3BatchSink(s3, "bucket", "solr-data/test", {})
+        assert sink.write_batch(3, iter([{"id": "1"}, {"id": "2"}])) == 2
+        assert json.loads(s3.objects["solr-data/test_batch_3.json"]) == [{"id": "1"}, {"id": "2"}]
+        assert s3.put_object.call_args.kwargs['ContentType'] == "application/json"
+        assert sink.objects == [{"key": "solr-data/test_batch_3.json", "docs": 2, "bytes": 25}]
+
+    def test_empty_batch_not_uploaded(self):
+        s3 = recording_s3()
+        assert S3BatchSink(s3, "bucket", "p", {}).write_batch(1, []) == 0
+        s3.put_object.assert_not_called()
+
+
+class TestRollingS3Sink:
+
+    def test_small_object_single_put(self):
+        s3 = recording_s3()
+        sink = RollingS3Sink(s3, "bucket", "data/test_all", {'export_format': 'ndjson'})
+        sink.write_batch(1, [{"id": "1"}])
+        sink.write_batch(2, [{"id": "2"}])
+        sink.close()
+        assert ndjson_docs(s3.objects["data/test_all_part_00001.ndjson"]) == [{"id": "1"}, {"id": "2"}]
+        s3.create_multipart_upload.assert_not_called()
+        assert sink.objects[0]["docs"] == 2
+
+    def test_rolls_at_target_size(self):
+        s3 = recording_s3()
+        sink = RollingS3Sink(s3, "bucket", "p", {'export_format': 'ndjson', 'target_object_bytes': 40})
+        docs = [{"id": str(i), "pad": "x" * 10} for i in range(5)]
+        assert sink.write_batch(1, docs) == 5
+        sink.close()
+        keys = sorted(s3.objects)
+        assert keys == ["p_part_00001.ndjson", "p_part_00002.ndjson", "p_part_00003.ndjson"]
+        assert [doc for key in keys for doc in ndjson_docs(s3.objects[key])] == docs
+        assert sum(obj["docs"] for obj in sink.objects) == 5
+
+    def test_large_object_multipart(self):
+        s3 = recording_s3()
+        sink = RollingS3Sink(s3, "bucket", "p", {'export_format': 'ndjson', 'multipart_part_bytes': MIN_PART_BYTES,
+                                                   'multipart_concurrency': 2})
+        docs = [{"id": str(i), "pad": "x" * 1000} for i in range(12000)]
+        sink.write_batch(1, docs)
+        sink.close()
+        body = s3.objects["p_part_00001.ndjson"]
+        assert len(s3.parts["p_part_00001.ndjson"]) == 3
+        assert all(len(part) == MIN_PART_BYTES for part in list(s3.parts["p_part_00001.ndjson"].values())[:-1])
+        assert ndjson_docs(body) == docs
+        assert sink.objects[0]["bytes"] == len(body)
+
+    def test_failed_part_aborts_upload(self):
+        s3 = recording_s3()
+        s3.upload_part.side_effect = RuntimeError("part failed")
+        sink = RollingS3Sink(s3, "bucket", "p", {'export_format': 'ndjson', 'multipart_part_bytes': MIN_PART_BYTES})
+        sink.write_batch(1, [{"id": str(i), "pad": "x" * 1000} for i in range(6000)])
+        with pytest.raises(RuntimeError):
+            sink.close()
+        s3.abort_multipart_upload.assert_called_once()
+        assert sink.objects == []
+
+    def test_batches_committed_with_their_last_object(self):
+        s3 = recording_s3()
+        commits = []
+        sink = RollingS3Sink(s3, "bucket", "p", {'export_format': 'ndjson', 'target_object_bytes': 60},
+                             on_commit=lambda batches, key: commits.append((batches, key)),
+                             resume_keys=["p_part_00007.ndjson"])
+        sink.write_batch(1, [{"id": "1", "pad": "x" * 10}])
+        sink.write_batch(2, [{"id": str(i), "pad": "x" * 10} for i in range(2, 4)])
+        assert commits == [([1], "p_part_00008.ndjson")]
+        sink.close()
+        assert commits == [([1], "p_part_00008.ndjson"), ([2], "p_part_00009.ndjson")]
+
+
+class TestLocalDirectorySink:
+
+    def test_writes_one_file_per_batch(self):
+        committed = []
+        with tempfile.TemporaryDirectory() as directory:
+            sink = LocalDirectorySink(directory, "solr-data/books", {'export_format': 'ndjson'},
+                                      on_commit=lambda batches, key: committed.append((batches, key)))
+            assert sink.write_batch(3, iter([{"id": "1"}, {"id": "2"}])) == 2
+            assert sink.write_batch(4, iter([])) == 0
+            path = os.path.join(directory, "solr-data", "books_batch_3.ndjson")
+            with open(path, "rb") as f:
+                assert ndjson_docs(f.read()) == [{"id": "1"}, {"id": "2"}]
+            assert os.listdir(os.path.join(directory, "solr-data")) == ["books_batch_3.ndjson"]
+            assert committed == [([3], path)]
+            assert sink.objects[0]["docs"] == 2
+
+
+class _SlowSink(ExportSink):
+    """Commits only once released, to stand in for a slow target"""
+
+    def __init__(self, on_commit, release):
+        super().__init__(on_commit)
+        self._release = release
+        self.batches = []
+
+    def write_batch(self, batch_count, docs):
+        self._release.wait(5)
+        self.batches.append(batch_count)
+        self._on_commit([batch_count], "slow")
+        return len(docs)
+
+
+class _FailingSink(ExportSink):
+
+    def write_batch(self, batch_count, docs):
+        raise IOError("disk full")
+
+
+class TestTeeSink:
+
+    def test_export_targets(self):
+        assert export_targets({}) == ["s3"]
+        assert export_targets({'export_target': ["local", "s3"]}) == ["local", "s3"]
+        with pytest.raises(SinkException):
+            export_targets({'export_target': "kafka"})
+
+    def test_commits_once_every_sink_has_the_batch(self):
+        committed = []
+        release = threading.Event()
+        with tempfile.TemporaryDirectory() as directory:
+            tee = TeeSink([lambda on_commit: LocalDirectorySink(directory, "books", {}, on_commit=on_commit),
+                           lambda on_commit: _SlowSink(on_commit, release)],
+                          on_commit=lambda batches, keys: committed.append((batches, keys)), queue_depth=4)
+            assert tee.write_batch(1, iter([{"id": "1"}])) == 1
+            assert tee.write_batch(2, iter([{"id": "2"}])) == 1
+            # the local sink is not held back by the slow one
+            for _ in range(100):
+                if len(tee.sinks[0].objects) == 2:
+                    break
+                threading.Event().wait(0.01)
+            assert len(tee.sinks[0].objects) == 2
+            assert committed == []
+            release.set()
+            tee.close()
+            assert [batches for batches, _ in committed] == [[1], [2]]
+            assert committed[0][1] == [os.path.join(directory, "books_batch_1.json"), "slow"]
+            assert tee.sinks[1].batches == [1, 2]
+            assert tee.objects == tee.sinks[0].objects and tee.telemetry is None
+
+    def test_batch_is_shared_by_the_sinks(self):
+        received = {1: [], 2: []}
+
+        class _RecordingSink(ExportSink):
+            def write_batch(self, batch_count, docs):
+                received[batch_count].append(docs)
+                return len(docs)
+
+        tee = TeeSink([_RecordingSink, _RecordingSink])
+        docs = [{"id": "1"}]
+        tee.write_batch(1, docs)
+        tee.write_batch(2, iter([{"id": "2"}]))
+        tee.close()
+        assert received[1][0] is docs and received[1][1] is docs
+        assert received[2][0] is received[2][1]
+
+    def test_failing_sink(self):
+        with tempfile.TemporaryDirectory() as directory:
+            tee = TeeSink([lambda on_commit: LocalDirectorySink(directory, "books", {}, on_commit=on_commit),
+                           lambda on_commit: _FailingSink(on_commit)], queue_depth=1)
+            tee.write_batch(1, [{"id": "1"}])
+            with pytest.raises(SinkException):
+                tee.close()
+            assert len(tee.sinks[0].objects) == 1
+            with pytest.raises(SinkException):
+                tee.write_batch(2, [{"id": "2"}])
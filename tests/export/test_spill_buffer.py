@@ -0,0 +1,71 @@
+import os
+import threading
+
+from migrate.export import SpillBuffer
+
+
+class TestSpillBuffer:
+
+    def test_from_config(self, tmp_path):
+        assert SpillBuffer.from_config({}, str(tmp_path)) is None
+        buffer = SpillBuffer.from_config({'buffer_memory_bytes': 100}, str(tmp_path / "spill"))
+        assert os.path.isdir(tmp_path / "spill")
+        buffer.close()
+        assert not os.path.exists(tmp_path / "spill")
+
+    def test_spills_beyond_memory_budget(self, tmp_path):
+        buffer = SpillBuffer(10, str(tmp_path), segment_bytes=10)
+        pages = [buffer.put(text) for text in ("aaaaaa", "bbbbbb", "cccccc", "ddddé")]
+        assert [page.spilled for page in pages] == [False, True, True, True]
+        assert buffer.resident_bytes == 6
+        assert sorted(os.listdir(tmp_path)) == ["segment_00001", "segment_00002"]
+        assert [buffer.take(page) for page in pages] == ["aaaaaa", "bbbbbb", "cccccc", "ddddé"]
+        stats = buffer.stats()
+        assert stats["peak_resident_bytes"] == 6
+        assert stats["spilled_pages"] == 3
+        assert stats["spilled_bytes"] == 18
+        assert buffer.resident_bytes == 0 and buffer.spill_bytes == 0
+        # the sealed segment is removed once read, the current one on close
+        assert os.listdir(tmp_path) == ["segment_00002"]
+        buffer.close()
+        assert not os.path.exists(tmp_path)
+
+    def test_budget_counts_encoded_bytes(self, tmp_path):
+        buffer = SpillBuffer(8, str(tmp_path))
+        first = buffer.put("éé")
+        second = buffer.put("€€")
+        assert not first.spilled and buffer.resident_bytes == 4
+        assert second.spilled and second.length == 6
+        assert buffer.take(second) == "€€"
+        buffer.close()
+
+    def test_release_frees_budget_once(self, tmp_path):
+        buffer = SpillBuffer(4, str(tmp_path))
+        first = buffer.put("abcd")
+        second = buffer.put("efgh")
+        buffer.release(first)
+        buffer.release(first)
+        buffer.release(second)
+        assert buffer.resident_bytes == 0
+        assert buffer.spill_bytes == 0
+        assert not buffer.put("ijkl").spilled
+        buffer.close()
+
+    def test_put_blocks_while_spill_is_full(self, tmp_path):
+        buffer = SpillBuffer(1, str(tmp_path), max_spill_bytes=4)
+        buffer.put("a")
+        spilled = buffer.put("bcd")
+        done = threading.Event()
+
+        def put():
+            buffer.put("efg")
+            done.set()
+
+        thread = threading.Thread(target=put)
+        thread.start()
+        assert not done.wait(0.2)
+        assert buffer.take(spilled) == "bcd"
+        assert done.wait(5)
+        thread.join()
+        assert buffer.put("hij", cancelled=lambda: True).spilled
+        buffer.close()
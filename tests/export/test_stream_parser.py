@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from migrate.export import StreamingDocsParser
+
+DOCS = [
+    {"id": "1", "title": "braces {inside} \"quoted\" and \\ backslash", "name": ["Größe", "日本"]},
+    {"id": "2", "comments": [{"id": "2/c1", "comment": "nested {", "rating": 4}]},
+    {"id": "3"},
+]
+RESPONSE = json.dumps({
+    "responseHeader": {"status": 0, "params": {"q": "\"docs\":[ tricky"}},
+    "response": {"numFound": 3, "start": 0, "docs": DOCS},
+    "nextCursorMark": "AoE/Mw==",
+}, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestStreamingDocsParser:
+
+    @pytest.mark.parametrize("size", [1, 7, 64, 100000])
+    def test_docs_across_chunk_sizes(self, size):
+        parser = StreamingDocsParser()
+        assert list(parser.iter_docs(chunked(RESPONSE, size))) == DOCS
+        assert parser.next_cursor_mark == "AoE/Mw=="
+
+    def test_empty_docs(self):
+        parser = StreamingDocsParser()
+        docs = list(parser.iter_docs([b'{"response":{"numFound":0,"docs":[]},"nextCursorMark":"same"}']))
+        assert docs == []
+        assert parser.next_cursor_mark == "same"
+
+    def test_fix_document_applied_per_doc(self):
+        seen = []
+
+        def fix(text):
+            seen.append(text)
+            return text.replace(':UEsDBBQ', ':"UEsDBBQ"')
+
+        parser = StreamingDocsParser(fix)
+        body = b'{"response":{"docs":[{"id":"1","attachment":UEsDBBQ},{"id":"2"}]},"nextCursorMark":"c"}'
+        docs = list(parser.iter_docs(chunked(body, 5)))
+        assert docs == [{"id": "1", "attachment": "UEsDBBQ"}, {"id": "2"}]
+        assert seen == ['{"id":"1","attachment":UEsDBBQ}', '{"id":"2"}']
+
+    def test_invalid_response(self):
+        with pytest.raises(json.JSONDecodeError):
+            list(StreamingDocsParser().iter_docs([b'invalid json {{{']))
+
+    def test_truncated_response(self):
+        with pytest.raises(json.JSONDecodeError):
+            list(StreamingDocsParser().iter_docs([RESPONSE[:len(RESPONSE) // 2]]))
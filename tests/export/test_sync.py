@@ -0,0 +1,29 @@
+from unittest.mock import patch
+
+from migrate.export import SyncMetrics
+
+
+class TestSyncMetrics:
+
+    def test_cycles_and_deletes(self, tmp_path):
+        path = tmp_path / "metrics" / "sync.prom"
+        metrics = SyncMetrics(str(path))
+        assert metrics.lag_seconds is None
+        with patch("migrate.export.sync.time.time", return_value=110.0):
+            metrics.finish_cycle(100.0, 50, 60, "2024-05-01T00:00:00Z")
+            metrics.add_deletes(3, 1)
+            snapshot = metrics.snapshot()
+        assert snapshot["lag_seconds"] == 10.0
+        assert snapshot["docs_per_second"] == 5.0
+        assert (snapshot["applied_docs"], snapshot["backlog_docs"], snapshot["cycles"]) == (50, 60, 1)
+        assert (snapshot["deleted_docs"], snapshot["missing_docs"]) == (3, 1)
+        text = path.read_text()
+        assert "# TYPE solr_sync_lag_seconds gauge" in text
+        assert "solr_sync_deleted_docs 3" in text
+        assert "watermark" not in text
+
+    def test_in_memory(self):
+        metrics = SyncMetrics()
+        metrics.set_stale(2)
+        metrics.finish_cycle(0, 0, 0, None)
+        assert metrics.snapshot()["stale_docs"] == 2
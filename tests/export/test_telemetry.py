@@ -0,0 +1,57 @@
+from unittest.mock import patch
+
+from migrate.export import ExportTelemetry, percentile
+
+
+class TestExportTelemetry:
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert percentile(values, 0.5) == 50
+        assert percentile(values, 0.95) == 95
+        assert percentile(values, 0.99) == 99
+        assert percentile([7], 0.99) == 7
+        assert percentile([], 0.5) == 0
+
+    def test_stage_latencies_and_histogram(self):
+        telemetry = ExportTelemetry()
+        for seconds in (0.005, 0.02, 0.2, 3):
+            telemetry.stage("solr", seconds)
+        telemetry.stage("upload", 0.1, bytes_out=2048)
+        summary = telemetry.summary()
+        solr = summary["stages"][0]
+        assert [stage["stage"] for stage in summary["stages"]] == ["solr", "upload"]
+        assert solr["count"] == 4
+        assert solr["p50_ms"] == 20.0
+        assert solr["p99_ms"] == 3000.0
+        assert summary["histogram"][0]["counts"] == [1, 1, 0, 1, 0, 0, 0, 1, 0, 0]
+        assert len(summary["histogram_buckets"]) == len(summary["histogram"][0]["counts"])
+        assert summary["bytes_out"] == 2048
+
+    def test_slowest_batches_keep_cursor_and_stages(self):
+        telemetry = ExportTelemetry(slowest=2)
+        for batch, seconds in ((1, 0.1), (2, 0.5), (3, 0.3)):
+            telemetry.start_batch(batch, "p0", f"cursor{batch}")
+            telemetry.stage("solr", seconds, batch)
+            telemetry.stage("upload", 0.1, batch)
+            telemetry.finish_batch(batch, 10, 100)
+        # stages recorded after the batch was handed to the sink only count as latencies
+        telemetry.stage("upload", 5, 2)
+        slowest = telemetry.summary()["slowest"]
+        assert [batch["batch"] for batch in slowest] == [2, 3]
+        assert slowest[0]["cursor_mark"] == "cursor2"
+        assert slowest[0]["seconds"] == 0.6
+        assert slowest[0]["stages"] == "solr 500ms, upload 100ms"
+
+    def test_throughput_timeline(self):
+        with patch("migrate.export.telemetry.time.monotonic") as monotonic:
+            monotonic.return_value = 100
+            telemetry = ExportTelemetry(interval=10)
+            for now, docs in ((101, 500), (105, 500), (123, 200)):
+                monotonic.return_value = now
+                telemetry.finish_batch(None, docs, 1024 * 1024)
+            timeline = telemetry.summary()["timeline"]
+        assert [(point["second"], point["docs"], point["batches"]) for point in timeline] == [(0, 1000, 2),
+                                                                                             (20, 200, 1)]
+        assert timeline[0]["docs_per_second"] == 100.0
+        assert timeline[0]["megabytes_in"] == 2.0
@@ -0,0 +1,145 @@
+import pytest
+
+from migrate.export import (ExportPartition, ExportProgress, LeasedProgress, LeaseKeeper, QueueJournal,
+                            SqliteWorkQueue, WorkQueueException, open_work_queue)
+
+FINGERPRINT = {"collection": "test", "partitions": [["hash_0", "fq0"], ["hash_1", "fq1"]]}
+PARTITIONS = [ExportPartition("hash_0", "fq0"), ExportPartition("hash_1", "fq1")]
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = SqliteWorkQueue(str(tmp_path / "queue.db"), max_attempts=2)
+    queue.publish(FINGERPRINT, PARTITIONS)
+    return queue
+
+
+class TestSqliteWorkQueue:
+
+    def test_publish_once(self, queue):
+        queue.publish(FINGERPRINT, PARTITIONS[:1])
+        assert queue.unfinished() == 2
+        with pytest.raises(WorkQueueException):
+            queue.publish({"collection": "other"}, PARTITIONS)
+
+    def test_claims_each_partition_once(self, queue):
+        first = queue.claim("w1", 60)
+        second = queue.claim("w2", 60)
+        assert (first.partition.name, first.partition.filter_query) == ("hash_0", "fq0")
+        assert second.partition.name == "hash_1"
+        assert queue.claim("w3", 60) is None
+        assert queue.complete(first, 10, 2.0)
+        assert queue.unfinished() == 1
+
+    def test_expired_lease_resumes_from_checkpoint(self, queue):
+        dead = queue.claim("w1", -1)
+        assert queue.checkpoint(dead, 3, "c3", 500, ["k1"])
+        lease = queue.claim("w2", 60)
+
+        assert lease.partition.name == "hash_0"
+        state = lease.state
+        assert (state.cursor_mark, state.last_batch, state.docs, state.batches, state.keys) == ("c3", 3, 500, 1,
+                                                                                               {"k1"})
+        assert not queue.renew(dead, 60)
+        assert not queue.checkpoint(dead, 4, "c4", 100, [])
+        assert not queue.complete(dead, 500, 1.0)
+        assert queue.complete(lease, 200, 4.0)
+        stats = {worker["worker"]: worker for worker in queue.worker_stats()}
+        assert (stats["w1"]["partitions"], stats["w1"]["docs"]) == (0, 500)
+        assert (stats["w2"]["partitions"], stats["w2"]["docs"], stats["w2"]["seconds"]) == (1, 200, 4.0)
+
+    def test_abandons_after_max_attempts(self, queue):
+        for _ in range(2):
+            lease = queue.claim("w1", 60)
+            assert lease.partition.name == "hash_0"
+            queue.release(lease, 0, 1.0, failed=True)
+        assert queue.claim("w1", 60).partition.name == "hash_1"
+        assert queue.abandoned() == ["hash_0"]
+
+    def test_stopped_release_keeps_attempts(self, queue):
+        for _ in range(3):
+            lease = queue.claim("w1", 60)
+            assert lease.partition.name == "hash_0"
+            queue.release(lease, 0, 1.0)
+        assert queue.abandoned() == []
+        assert queue.unfinished() == 2
+
+    def test_expired_last_attempt_is_abandoned(self, tmp_path):
+        queue = SqliteWorkQueue(str(tmp_path / "queue.db"), max_attempts=1)
+        queue.publish(FINGERPRINT, PARTITIONS[:1])
+        queue.claim("dead", -1)
+        assert queue.claim("w1", 60) is None
+        assert queue.unfinished() == 0
+        assert queue.abandoned() == ["hash_0"]
+
+    def test_live_last_attempt_is_unfinished(self, tmp_path):
+        queue = SqliteWorkQueue(str(tmp_path / "queue.db"), max_attempts=1)
+        queue.publish(FINGERPRINT, PARTITIONS[:1])
+        queue.claim("w1", 60)
+        assert queue.unfinished() == 1
+        assert queue.abandoned() == []
+
+    def test_exported_docs_of_all_workers(self, queue):
+        first = queue.claim("w1", 60)
+        second = queue.claim("w2", 60)
+        queue.checkpoint(first, 1, "c1", 10, [])
+        queue.checkpoint(second, 1, "c1", 5, [])
+        assert queue.exported_docs() == 15
+
+    def test_last_batch_of_all_workers(self, queue):
+        assert queue.last_batch() == 0
+        first = queue.claim("w1", 60)
+        second = queue.claim("w2", 60)
+        queue.checkpoint(first, 7, "c7", 10, [])
+        queue.checkpoint(second, 3, "c3", 5, [])
+        assert queue.last_batch() == 7
+
+    def test_open_work_queue(self, tmp_path):
+        queue = open_work_queue({}, str(tmp_path))
+        assert queue.path == f"{tmp_path}/work_queue.db"
+        with pytest.raises(WorkQueueException):
+            open_work_queue({'work_queue_backend': 'redis'}, str(tmp_path))
+
+
+class TestLeases:
+
+    def test_keeper_renews_and_detects_lost_lease(self, queue):
+        lease = queue.claim("w1", 60)
+        keeper = LeaseKeeper(queue, 60)
+        try:
+            keeper.hold(lease)
+            expires = lease.expires
+            keeper.renew_all()
+            assert lease.expires >= expires and not lease.lost
+            lease.token = "stolen"
+            keeper.renew_all()
+            assert lease.lost
+        finally:
+            keeper.close()
+
+    def test_queue_journal_checkpoints(self, queue):
+        lease = queue.claim("w1", 60)
+        journal = QueueJournal(queue, lease)
+        journal.record_batch("hash_0", 1, "c1", 5, ["k1"])
+        assert journal.docs == 5 and not lease.lost
+        lease.token = "stolen"
+        journal.record_batch("hash_0", 2, "c2", 5, ["k2"])
+        assert lease.lost
+
+    def test_leased_progress_stops_on_lost_lease(self, queue):
+        progress = ExportProgress(limit=100)
+        lease = queue.claim("w1", 60)
+        leased = LeasedProgress(progress, lease)
+        assert not leased.should_stop()
+        assert leased.next_batch() == 1
+        lease.lost = True
+        assert leased.should_stop() and not progress.should_stop()
+
+    def test_leased_progress_shares_max_rows(self, queue):
+        lease = queue.claim("w1", 60)
+        other = queue.claim("w2", 60)
+        leased = LeasedProgress(ExportProgress(), lease, queue, max_rows=10)
+        queue.checkpoint(lease, 1, "c1", 4, [])
+        assert not leased.should_stop()
+        queue.checkpoint(other, 1, "c1", 6, [])
+        assert leased.limit_reached() and leased.should_stop()
@@ -281,3 +281,20 @@ def test_migration_package_no_expansion_index(monkeypatch):
 
     assert_dictionary_properties(result, expected_content)
 
+
+
+def test_data_migration_bulk_to_opensearch():
+    config = toml.load(os.path.join(os.path.dirname(__file__), "no_package_no_expansion_index", "migrate.toml"))
+    config['migration']['create_package'] = False
+    config['migration']['create_index'] = True
+    config['data_migration']['migrate_data'] = True
+    config['data_migration']['export_target'] = "opensearch"
+
+    solrclient = SolrClient(config['solr'])
+    opensearchclient = OpenSearchClient(config['opensearch'])
+    file_path = f"migration_schema/{config['solr']['collection']}/"
+    Solr2OSMigrate(solrclient, opensearchclient, config['migration'], config['data_migration']).migrate(file_path)
+
+    index = config['opensearch']['index']
+    opensearchclient._opensearch_client.indices.refresh(index=index)
+    assert opensearchclient._opensearch_client.count(index=index)["count"] == solrclient.count()
@@ -1,6 +1,7 @@
 import unittest
 from unittest.mock import Mock, patch, MagicMock
 import json
+import tempfile
 from migrate.solr2os_migrate import Solr2OSMigrate
 from reports.report import Report
 
@@ -9,6 +10,10 @@ class TestDataMigration(unittest.TestCase):
 
     def setUp(self):
         """Set up test fixtures"""
+        output_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(output_dir.cleanup)
+        # the journal, spill and dead-letter files of export_data
+        self.output_dir = output_dir.name
         self.mock_solr_client = Mock()
         self.mock_opensearch_client = Mock()
         self.schema_config = {'create_index': False}
@@ -18,12 +23,12 @@ class TestDataMigration(unittest.TestCase):
             's3_export_bucket': 'test-bucket',
             's3_export_prefix': 'solr-data/',
             'rows_per_page': 100,
-            'max_rows': 1000
+            'max_rows': 1000,
+            'batch_initial_backoff': 0
         }
 
     @patch('migrate.solr2os_migrate.boto3')
-    @patch('migrate.solr2os_migrate.requests')
-    def test_successful_data_migration(self, mock_requests, mock_boto3):
+    def test_successful_data_migration(self, mock_boto3):
         """Test successful data migration with binary fields"""
         # Mock schema with binary fields
         schema = {
@@ -43,8 +48,7 @@ class TestDataMigration(unittest.TestCase):
         }
 
         # Mock successful responses
-        count_response = Mock()
-        count_response.json.return_value = {'response': {'numFound': 2}}
+        self.mock_solr_client.count.return_value = 2
         
         # First batch with data
         data_response1 = Mock()
@@ -54,7 +58,7 @@ class TestDataMigration(unittest.TestCase):
         data_response2 = Mock()
         data_response2.text = '{"response":{"docs":[{"id":"2","title":"test2"}],"numFound":1},"nextCursorMark":"cursor2"}'
         
-        mock_requests.get.side_effect = [count_response, data_response1, data_response2]
+        self.mock_solr_client.select.side_effect = [data_response1, data_response2]
         
         # Mock S3 client
         mock_s3 = Mock()
@@ -64,7 +68,7 @@ class TestDataMigration(unittest.TestCase):
         migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client, 
                                  self.schema_config, self.data_config)
         
-        result = migrator.export_data()
+        result = migrator.export_data(self.output_dir)
         
         # Assertions
         self.assertTrue(result)
@@ -73,8 +77,7 @@ class TestDataMigration(unittest.TestCase):
         self.assertEqual(mock_s3.put_object.call_count, 2)
 
     @patch('migrate.solr2os_migrate.boto3')
-    @patch('migrate.solr2os_migrate.requests')
-    def test_json_parsing_error(self, mock_requests, mock_boto3):
+    def test_json_parsing_error(self, mock_boto3):
         """Test JSON parsing error handling"""
         # Mock schema
         self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
@@ -85,13 +88,12 @@ class TestDataMigration(unittest.TestCase):
         }
 
         # Mock responses - count works, but data response is invalid JSON
-        count_response = Mock()
-        count_response.json.return_value = {'response': {'numFound': 1}}
+        self.mock_solr_client.count.return_value = 1
         
         data_response = Mock()
         data_response.text = 'invalid json {{{'
         
-        mock_requests.get.side_effect = [count_response, data_response]
+        self.mock_solr_client.select.return_value = data_response
         
         # Mock S3 client
         mock_s3 = Mock()
@@ -101,7 +103,7 @@ class TestDataMigration(unittest.TestCase):
         migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client, 
                                  self.schema_config, self.data_config)
         
-        result = migrator.export_data()
+        result = migrator.export_data(self.output_dir)
         
         # Assertions
         self.assertTrue(result)
@@ -110,8 +112,7 @@ class TestDataMigration(unittest.TestCase):
         mock_s3.put_object.assert_not_called()
 
     @patch('migrate.solr2os_migrate.boto3')
-    @patch('migrate.solr2os_migrate.requests')
-    def test_binary_field_json_error(self, mock_requests, mock_boto3):
+    def test_binary_field_json_error(self, mock_boto3):
         """Test binary field with unquoted Base64 that can't be fixed"""
         # Mock schema with binary fields
         schema = {
@@ -124,14 +125,13 @@ class TestDataMigration(unittest.TestCase):
         }
 
         # Mock responses
-        count_response = Mock()
-        count_response.json.return_value = {'response': {'numFound': 1}}
+        self.mock_solr_client.count.return_value = 1
         
         # Response with completely broken JSON that can't be fixed
         data_response = Mock()
         data_response.text = 'completely broken json { [ } invalid'
         
-        mock_requests.get.side_effect = [count_response, data_response]
+        self.mock_solr_client.select.return_value = data_response
         
         # Mock S3 client
         mock_s3 = Mock()
@@ -141,7 +141,7 @@ class TestDataMigration(unittest.TestCase):
         migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client, 
                                  self.schema_config, self.data_config)
         
-        result = migrator.export_data()
+        result = migrator.export_data(self.output_dir)
         
         # Assertions
         self.assertTrue(result)
@@ -149,8 +149,7 @@ class TestDataMigration(unittest.TestCase):
         self.assertIn("JSON parsing error", str(migrator._report.data_migration_error_list))
 
     @patch('migrate.solr2os_migrate.boto3')
-    @patch('migrate.solr2os_migrate.requests')
-    def test_request_error(self, mock_requests, mock_boto3):
+    def test_request_error(self, mock_boto3):
         """Test request error handling"""
         # Mock schema
         self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
@@ -161,21 +160,20 @@ class TestDataMigration(unittest.TestCase):
         }
         
         # Mock request failure
-        mock_requests.get.side_effect = Exception("Connection failed")
+        self.mock_solr_client.count.side_effect = Exception("Connection failed")
 
         # Create migrator and run
         migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client, 
                                  self.schema_config, self.data_config)
         
-        result = migrator.export_data()
+        result = migrator.export_data(self.output_dir)
         
         # Assertions
         self.assertFalse(result)
         self.assertGreater(migrator._report.data_migration_errors, 0)
 
     @patch('migrate.solr2os_migrate.boto3')
-    @patch('migrate.solr2os_migrate.requests')
-    def test_binary_field_missing_name(self, mock_requests, mock_boto3):
+    def test_binary_field_missing_name(self, mock_boto3):
         """Test binary field type with missing name"""
         # Mock schema with binary field type missing name
         schema = {
@@ -193,13 +191,12 @@ class TestDataMigration(unittest.TestCase):
         }
 
         # Mock successful responses
-        count_response = Mock()
-        count_response.json.return_value = {'response': {'numFound': 1}}
+        self.mock_solr_client.count.return_value = 1
         
         data_response = Mock()
         data_response.text = '{"response":{"docs":[{"id":"1","title":"test"}],"numFound":1},"nextCursorMark":"same"}'
         
-        mock_requests.get.side_effect = [count_response, data_response]
+        self.mock_solr_client.select.side_effect = [data_response]
         
         # Mock S3 client
         mock_s3 = Mock()
@@ -209,7 +206,7 @@ class TestDataMigration(unittest.TestCase):
         migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
                                  self.schema_config, self.data_config)
         
-        result = migrator.export_data()
+        result = migrator.export_data(self.output_dir)
         
         # Assertions
         self.assertTrue(result)
@@ -282,15 +279,14 @@ class TestDataMigration(unittest.TestCase):
         migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
                                  self.schema_config, data_config)
         
-        result = migrator.export_data()
+        result = migrator.export_data(self.output_dir)
         
         # Should return False when migration is disabled
         self.assertFalse(result)
 
 
     @patch('migrate.solr2os_migrate.boto3')
-    @patch('migrate.solr2os_migrate.requests')
-    def test_empty_batch_handling(self, mock_requests, mock_boto3):
+    def test_empty_batch_handling(self, mock_boto3):
         """Test handling of empty batch response"""
         # Mock schema
         self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
@@ -301,14 +297,13 @@ class TestDataMigration(unittest.TestCase):
         }
 
         # Mock responses
-        count_response = Mock()
-        count_response.json.return_value = {'response': {'numFound': 1}}
+        self.mock_solr_client.count.return_value = 1
         
         # Empty batch response
         data_response = Mock()
         data_response.text = '{"response":{"docs":[],"numFound":0},"nextCursorMark":"same"}'
         
-        mock_requests.get.side_effect = [count_response, data_response]
+        self.mock_solr_client.select.side_effect = [data_response]
         
         # Mock S3 client
         mock_s3 = Mock()
@@ -318,13 +313,1095 @@ class TestDataMigration(unittest.TestCase):
         migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
                                  self.schema_config, self.data_config)
         
-        result = migrator.export_data()
+        result = migrator.export_data(self.output_dir)
         
         # Assertions
         self.assertTrue(result)
         self.assertEqual(migrator._report.data_migration_errors, 0)
         mock_s3.put_object.assert_not_called()  # No docs to export
 
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_partitioned_export(self, mock_boto3):
+        """Test that each partition runs its own cursor with its own fq"""
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': [], 'uniqueKey': 'id'}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+
+        self.mock_solr_client.count.return_value = 4
+        seen_fq = []
+
+        def select(params, **kwargs):
+            seen_fq.append(params['fq'])
+            worker = params['fq'].split('worker=')[1].split(' ')[0]
+            response = Mock()
+            if params['cursorMark'] == '*':
+                response.text = json.dumps({'response': {'docs': [{'id': f'{worker}a'}, {'id': f'{worker}b'}]},
+                                            'nextCursorMark': 'next'})
+            else:
+                response.text = json.dumps({'response': {'docs': []}, 'nextCursorMark': 'next'})
+            return response
+
+        self.mock_solr_client.select.side_effect = select
+        mock_s3 = Mock()
+        mock_boto3.session.Session.return_value.client.return_value = mock_s3
+
+        data_config = dict(self.data_config, export_partitions=2, export_workers=2)
+        migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                 self.schema_config, data_config)
+
+        result = migrator.export_data(self.output_dir)
+
+        self.assertTrue(result)
+        self.assertEqual(migrator._report.data_migration_docs_exported, 4)
+        self.assertEqual(mock_s3.put_object.call_count, 2)
+        self.assertEqual(len(set(seen_fq)), 2)
+        self.mock_solr_client.configure_export_transport.assert_called_once_with(2)
+        keys = {c.kwargs['Key'] for c in mock_s3.put_object.call_args_list}
+        self.assertEqual(len(keys), 2)
+        partitions = {p['name']: p['docs'] for p in migrator._report.data_migration_partitions}
+        self.assertEqual(partitions, {'hash_0': 2, 'hash_1': 2})
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_pipelined_export(self, mock_boto3):
+        """Test that the pipelined export prefetches pages and uploads every batch"""
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+
+        self.mock_solr_client.count.return_value = 3
+        pages = []
+        for i, cursor in enumerate(['c1', 'c2', 'c3']):
+            page = Mock()
+            page.text = json.dumps({'response': {'docs': [{'id': str(i)}]}, 'nextCursorMark': cursor})
+            pages.append(page)
+        last_page = Mock()
+        last_page.text = '{"response":{"docs":[]},"nextCursorMark":"c3"}'
+
+        self.mock_solr_client.select.side_effect = pages + [last_page]
+        mock_s3 = Mock()
+        mock_boto3.session.Session.return_value.client.return_value = mock_s3
+
+        data_config = dict(self.data_config, pipeline=True, fetch_queue_depth=1, upload_queue_depth=1)
+        migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                 self.schema_config, data_config)
+
+        result = migrator.export_data(self.output_dir)
+
+        self.assertTrue(result)
+        self.assertEqual(migrator._report.data_migration_errors, 0)
+        self.assertEqual(migrator._report.data_migration_docs_exported, 3)
+        self.assertEqual(mock_s3.put_object.call_count, 3)
+        cursors = [c.args[0]['cursorMark'] for c in self.mock_solr_client.select.call_args_list]
+        self.assertEqual(cursors, ['*', 'c1', 'c2', 'c3'])
+        self.assertEqual(set(migrator._report.data_migration_pipeline_stages), {'fetch', 'parse', 'upload'})
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_pipelined_export_json_error(self, mock_boto3):
+        """Test that a page without a cursor stops the pipelined export without spinning"""
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 1
+        data_response = Mock()
+        data_response.text = 'invalid json {{{'
+        self.mock_solr_client.select.side_effect = [data_response]
+        mock_s3 = Mock()
+        mock_boto3.session.Session.return_value.client.return_value = mock_s3
+
+        data_config = dict(self.data_config, pipeline=True)
+        migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                 self.schema_config, data_config)
+
+        result = migrator.export_data(self.output_dir)
+
+        self.assertTrue(result)
+        self.assertIn("JSON parsing error", str(migrator._report.data_migration_error_list))
+        mock_s3.put_object.assert_not_called()
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_streaming_export(self, mock_boto3):
+        """Test that stream_parse reads documents from the response chunks and uploads a file body"""
+        schema = {
+            'fieldTypes': [{'name': 'binary_type', 'class': 'solr.BinaryField'}],
+            'fields': [{'name': 'attachment', 'type': 'binary_type'}]
+        }
+        self.mock_solr_client.read_schema.return_value = schema
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 2
+
+        body = b'{"response":{"docs":[{"id":"1","attachment":UEsDBBQ},{"id":"2"}]},"nextCursorMark":"c1"}'
+        data_response = Mock()
+        data_response.iter_content.return_value = [body[i:i + 10] for i in range(0, len(body), 10)]
+        last_response = Mock()
+        last_response.iter_content.return_value = [b'{"response":{"docs":[]},"nextCursorMark":"c1"}']
+        self.mock_solr_client.select.side_effect = [data_response, last_response]
+
+        uploaded = []
+        mock_s3 = Mock()
+        mock_s3.put_object.side_effect = lambda **kwargs: uploaded.append(kwargs['Body'].read())
+        mock_boto3.session.Session.return_value.client.return_value = mock_s3
+
+        data_config = dict(self.data_config, stream_parse=True)
+        migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                 self.schema_config, data_config)
+
+        result = migrator.export_data(self.output_dir)
+
+        self.assertTrue(result)
+        self.assertEqual(migrator._report.data_migration_errors, 0)
+        self.assertEqual(migrator._report.data_migration_docs_exported, 2)
+        self.assertEqual(json.loads(uploaded[0]), [{'id': '1', 'attachment': 'UEsDBBQ'}, {'id': '2'}])
+        self.assertTrue(self.mock_solr_client.select.call_args_list[0].kwargs['stream'])
+        data_response.close.assert_called_once()
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_compressed_ndjson_export(self, mock_boto3):
+        """Test that batches are uploaded with the key, content type and encoding of the export format"""
+        import gzip
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 2
+        data_response = Mock()
+        data_response.text = '{"response":{"docs":[{"id":"1"},{"id":"2"}]},"nextCursorMark":"c1"}'
+        last_response = Mock()
+        last_response.text = '{"response":{"docs":[]},"nextCursorMark":"c1"}'
+        self.mock_solr_client.select.side_effect = [data_response, last_response]
+
+        uploaded = []
+        mock_s3 = Mock()
+        mock_s3.put_object.side_effect = lambda **kwargs: uploaded.append(dict(kwargs, Body=kwargs['Body'].read()))
+        mock_boto3.session.Session.return_value.client.return_value = mock_s3
+
+        data_config = dict(self.data_config, export_format='ndjson', export_compression='gzip')
+        migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                 self.schema_config, data_config)
+
+        self.assertTrue(migrator.export_data(self.output_dir))
+        self.assertEqual(len(uploaded), 1)
+        self.assertEqual(uploaded[0]['Key'], 'solr-data/test_batch_1.ndjson.gz')
+        self.assertEqual(uploaded[0]['ContentType'], 'application/x-ndjson')
+        self.assertEqual(uploaded[0]['ContentEncoding'], 'gzip')
+        self.assertEqual(gzip.decompress(uploaded[0]['Body']), b'{"id": "1"}\n{"id": "2"}\n')
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_rolling_objects_export(self, mock_boto3):
+        """Test that pages are appended to one rolling object per partition"""
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 3
+        first_response = Mock()
+        first_response.text = '{"response":{"docs":[{"id":"1"},{"id":"2"}]},"nextCursorMark":"c1"}'
+        second_response = Mock()
+        second_response.text = '{"response":{"docs":[{"id":"3"}]},"nextCursorMark":"c2"}'
+        last_response = Mock()
+        last_response.text = '{"response":{"docs":[]},"nextCursorMark":"c2"}'
+        self.mock_solr_client.select.side_effect = [first_response, second_response, last_response]
+
+        uploaded = {}
+        mock_s3 = Mock()
+        mock_s3.put_object.side_effect = lambda **kwargs: uploaded.update({kwargs['Key']: kwargs['Body']})
+        mock_boto3.session.Session.return_value.client.return_value = mock_s3
+
+        data_config = dict(self.data_config, export_format='ndjson', rolling_objects=True)
+        migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                 self.schema_config, data_config)
+
+        self.assertTrue(migrator.export_data(self.output_dir))
+        self.assertEqual(list(uploaded), ['solr-data/test_all_part_00001.ndjson'])
+        self.assertEqual(uploaded['solr-data/test_all_part_00001.ndjson'],
+                         b'{"id": "1"}\n{"id": "2"}\n{"id": "3"}\n')
+        self.assertEqual(migrator._report.data_migration_objects, 1)
+
+    def _page(self, docs, cursor_mark):
+        response = Mock()
+        response.text = json.dumps({"response": {"docs": docs}, "nextCursorMark": cursor_mark})
+        return response
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_resume_after_failed_batch(self, mock_boto3):
+        """Test that a resumed export continues from the last committed cursorMark"""
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 3
+        uploaded = []
+        mock_s3 = Mock()
+        mock_s3.put_object.side_effect = lambda **kwargs: uploaded.append(kwargs['Key'])
+        mock_boto3.session.Session.return_value.client.return_value = mock_s3
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            self.mock_solr_client.select.side_effect = [
+                self._page([{"id": "1"}, {"id": "2"}], "c1"), Exception("502 Bad Gateway")]
+            migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                      self.schema_config, self.data_config)
+            self.assertTrue(migrator.export_data(output_dir))
+            self.assertEqual(migrator._report.data_migration_docs_exported, 2)
+
+            self.mock_solr_client.select.reset_mock()
+            self.mock_solr_client.select.side_effect = [self._page([{"id": "3"}], "c2"), self._page([], "c2")]
+            migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                      self.schema_config, self.data_config)
+            self.assertTrue(migrator.export_data(output_dir, resume=True))
+            self.assertEqual(self.mock_solr_client.select.call_args_list[0][0][0]['cursorMark'], 'c1')
+            self.assertEqual(migrator._report.data_migration_docs_exported, 3)
+            self.assertEqual(migrator._report.data_migration_status, 'resumed')
+            self.assertEqual(uploaded, ['solr-data/test_batch_1.json', 'solr-data/test_batch_2.json'])
+
+            # a completed partition is not exported again
+            self.mock_solr_client.select.reset_mock()
+            migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                      self.schema_config, self.data_config)
+            self.assertTrue(migrator.export_data(output_dir, resume=True))
+            self.mock_solr_client.select.assert_not_called()
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_signal_drains_export(self, mock_boto3):
+        """Test that SIGTERM finishes the batch in flight and stops before the next page"""
+        import signal
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 3
+
+        def select(params, **kwargs):
+            signal.raise_signal(signal.SIGTERM)
+            return self._page([{"id": "1"}], "c1")
+
+        self.mock_solr_client.select.side_effect = select
+        mock_s3 = Mock()
+        mock_boto3.session.Session.return_value.client.return_value = mock_s3
+        previous_handler = signal.getsignal(signal.SIGTERM)
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                      self.schema_config, self.data_config)
+            self.assertTrue(migrator.export_data(output_dir))
+            with open(f"{output_dir}/export_journal.jsonl") as f:
+                journal = [json.loads(line) for line in f]
+
+        self.assertEqual(self.mock_solr_client.select.call_count, 1)
+        self.assertEqual(mock_s3.put_object.call_count, 1)
+        self.assertEqual(migrator._report.data_migration_status, 'stopped')
+        self.assertEqual(journal[-1]['cursor_mark'], 'c1')
+        self.assertIs(signal.getsignal(signal.SIGTERM), previous_handler)
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_opensearch_bulk_export(self, mock_boto3):
+        """Test that export_target opensearch indexes documents with _bulk instead of writing to S3"""
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': [], 'uniqueKey': 'id'}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 2
+        self.mock_solr_client.select.side_effect = [
+            self._page([{"id": "1"}, {"id": "2"}], "c1"), self._page([], "c1")]
+        self.mock_opensearch_client.index_name = 'demo'
+        self.mock_opensearch_client.bulk.return_value = {"errors": False}
+        mock_s3 = Mock()
+        mock_boto3.session.Session.return_value.client.return_value = mock_s3
+
+        data_config = dict(self.data_config, export_target='opensearch', bulk_initial_backoff=0)
+        migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                 self.schema_config, data_config)
+
+        self.assertTrue(migrator.export_data(self.output_dir))
+        mock_s3.put_object.assert_not_called()
+        body = self.mock_opensearch_client.bulk.call_args[0][0].decode('utf-8').splitlines()
+        self.assertEqual(body, ['{"index": {"_id": "1"}}', '{"id": "1"}', '{"index": {"_id": "2"}}', '{"id": "2"}'])
+        self.assertEqual(migrator._report.data_migration_docs_exported, 2)
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_adaptive_page_size(self, mock_boto3):
+        """Test that the rows of the next page follow the observed page size"""
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 10
+        rows = []
+
+        def select(params, **kwargs):
+            rows.append(params['rows'])
+            if len(rows) == 1:
+                return self._page([{"id": "1"}, {"id": "2"}], "c1")
+            return self._page([], "c1")
+
+        self.mock_solr_client.select.side_effect = select
+        mock_boto3.session.Session.return_value.client.return_value = Mock()
+
+        data_config = dict(self.data_config, adaptive_page_size=True, min_rows_per_page=10, max_rows_per_page=150)
+        migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                 self.schema_config, data_config)
+
+        self.assertTrue(migrator.export_data(self.output_dir))
+        self.assertEqual(rows, [100, 150])
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_field_projection(self, mock_boto3):
+        """Test that fl follows the mapping and internal fields are pruned before upload"""
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 1
+        self.mock_solr_client.select.side_effect = [
+            self._page([{"id": "1", "title": "t", "_version_": 3}], "c1"), self._page([], "c1")]
+        self.mock_opensearch_client.get_index_json.return_value = {
+            "mappings": {"properties": {"title": {"type": "text"}, "_version_": {"type": "long"}}}}
+        uploaded = []
+        mock_s3 = Mock()
+        mock_s3.put_object.side_effect = lambda **kwargs: uploaded.append(json.loads(kwargs['Body'].read()))
+        mock_boto3.session.Session.return_value.client.return_value = mock_s3
+
+        data_config = dict(self.data_config, field_projection=True, rename_fields={'title': 'name'})
+        migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                 self.schema_config, data_config)
+
+        self.assertTrue(migrator.export_data(self.output_dir))
+        self.assertEqual(self.mock_solr_client.select.call_args_list[0][0][0]['fl'], 'id,title,[child limit=-1]')
+        self.assertEqual(uploaded, [[{"id": "1", "name": "t"}]])
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_delta_export(self, mock_boto3):
+        """Test that a delta run only exports documents changed after the watermark of the previous run"""
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 1
+        uploaded = []
+        mock_s3 = Mock()
+        mock_s3.put_object.side_effect = lambda **kwargs: uploaded.append(kwargs['Key'])
+        mock_boto3.session.Session.return_value.client.return_value = mock_s3
+        data_config = dict(self.data_config, delta_export=True, delta_field='_version_')
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            self.mock_solr_client.max_value.return_value = 10
+            self.mock_solr_client.select.side_effect = [self._page([{"id": "1"}], "c1"), self._page([], "c1")]
+            migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                      self.schema_config, data_config)
+            self.assertTrue(migrator.export_data(output_dir))
+            self.assertNotIn('fq', self.mock_solr_client.select.call_args_list[0][0][0])
+            self.assertEqual(uploaded, ['solr-data/test_batch_1.json'])
+
+            self.mock_solr_client.max_value.return_value = 12
+            self.mock_solr_client.select.reset_mock()
+            self.mock_solr_client.select.side_effect = [self._page([{"id": "2"}], "c1"), self._page([], "c1")]
+            migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                      self.schema_config, data_config)
+            self.assertTrue(migrator.export_data(output_dir))
+            self.assertEqual(self.mock_solr_client.select.call_args_list[0][0][0]['fq'],
+                             '{!cache=false}_version_:{"10" TO "12"]')
+            self.mock_solr_client.count.assert_called_with(filter_queries=['_version_:{"10" TO "12"]'])
+            self.assertRegex(uploaded[1], r'^solr-data/delta_\d{8}T\d{6}Z/test_batch_1\.json$')
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_export_handler_engine(self, mock_boto3):
+        """Test that docValues fields stream from /export and stored-only fields are fetched by id"""
+        self.mock_solr_client.read_schema.return_value = {
+            'uniqueKey': 'id',
+            'fieldTypes': [{'name': 'string', 'class': 'solr.StrField'},
+                           {'name': 'text_general', 'class': 'solr.TextField'}],
+            'fields': [{'name': 'id', 'type': 'string'}, {'name': 'title', 'type': 'text_general'}]
+        }
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 3
+        export_response = Mock()
+        export_response.iter_content.return_value = [
+            b'{"responseHeader":{"status":0},"response":{"numFound":3,"docs":[{"id":"1"},{"id":"2"},',
+            b'{"id":"3"}]}}']
+        self.mock_solr_client.export.return_value = export_response
+        self.mock_solr_client.select.side_effect = [
+            self._page([{"id": "1", "title": "a"}, {"id": "2", "title": "b"}], None),
+            self._page([{"id": "3", "title": "c"}], None)]
+        uploaded = []
+        mock_s3 = Mock()
+        mock_s3.put_object.side_effect = lambda **kwargs: uploaded.append(json.loads(kwargs['Body'].read()))
+        mock_boto3.session.Session.return_value.client.return_value = mock_s3
+
+        data_config = dict(self.data_config, export_engine='export', rows_per_page=2, max_rows=10)
+        migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                 self.schema_config, data_config)
+
+        self.assertTrue(migrator.export_data(self.output_dir))
+        params = self.mock_solr_client.export.call_args[0][0]
+        self.assertEqual(params['fl'], 'id')
+        self.assertEqual(params['sort'], 'id asc')
+        self.assertEqual(self.mock_solr_client.select.call_args_list[0][0][0]['fl'], 'id,title')
+        self.assertEqual(self.mock_solr_client.select.call_args_list[0][1], {'post': True})
+        self.assertEqual(uploaded, [[{"id": "1", "title": "a"}, {"id": "2", "title": "b"}],
+                                    [{"id": "3", "title": "c"}]])
+        self.assertEqual(migrator._report.data_migration_errors, 0)
+        export_response.close.assert_called_once()
+
+
+    def test_export_engine_fetches_stored_fields_while_streaming(self):
+        """Test that the /select of stored fields is served while the /export response is still streaming"""
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from solr.solr_client import SolrClient
+        schema = {'uniqueKey': 'id', 'version': 1.6,
+                  'fieldTypes': [{'name': 'string', 'class': 'solr.StrField'},
+                                 {'name': 'text_general', 'class': 'solr.TextField'}],
+                  'fields': [{'name': 'id', 'type': 'string'}, {'name': 'title', 'type': 'text_general'}]}
+        stored_fetched = threading.Event()
+
+        class FakeSolr(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _json(self, body):
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                if '/schema' in self.path:
+                    self._json({'schema': schema})
+                elif '/export' in self.path:
+                    self.send_response(200)
+                    self.end_headers()
+                    self.wfile.write(b'{"response":{"numFound":3,"docs":[{"id":"1"},{"id":"2"},')
+                    self.wfile.flush()
+                    # the rest of the stream only follows once the first batch got its stored fields
+                    stored_fetched.wait(10)
+                    self.wfile.write(b'{"id":"3"}]}}')
+                    self.close_connection = True
+                else:
+                    self._json({'response': {'numFound': 3, 'docs': []}})
+
+            def do_POST(self):
+                length = int(self.headers['Content-Length'])
+                ids = self.rfile.read(length).decode()
+                docs = [{'id': i, 'title': f"title {i}"} for i in ('1', '2', '3') if f"%7D{i}" in ids or
+                        f"%1F{i}" in ids]
+                stored_fetched.set()
+                self._json({'response': {'docs': docs}})
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), FakeSolr)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            solr_client = SolrClient({'host': 'http://127.0.0.1', 'port': server.server_address[1],
+                                      'collection': 'test'})
+            with tempfile.TemporaryDirectory() as output_dir:
+                data_config = dict(self.data_config, export_engine='export', export_target='local',
+                                   local_export_dir=output_dir, rows_per_page=2, stream_chunk_bytes=1)
+                migrator = Solr2OSMigrate(solr_client, self.mock_opensearch_client, self.schema_config,
+                                          data_config)
+                result = []
+                export = threading.Thread(target=lambda: result.append(migrator.export_data(output_dir)),
+                                          daemon=True)
+                export.start()
+                export.join(30)
+                self.assertFalse(export.is_alive(), "export hung waiting for a pooled connection")
+                self.assertEqual(result, [True])
+                self.assertEqual(migrator._report.data_migration_docs_exported, 3)
+                self.assertEqual(migrator._report.data_migration_errors, 0)
+                self.assertTrue(stored_fetched.is_set())
+                import glob
+                exported = []
+                for path in glob.glob(f"{output_dir}/**/*_batch_*", recursive=True):
+                    with open(path) as f:
+                        exported.extend(json.load(f))
+                self.assertEqual(sorted(doc['title'] for doc in exported), ['title 1', 'title 2', 'title 3'])
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_nested_bulk_children(self, mock_boto3):
+        """Test that children of a page of parents are fetched in one query and stitched by nest path"""
+        self.mock_solr_client.read_schema.return_value = {
+            'uniqueKey': 'id',
+            'fieldTypes': [{'name': 'string', 'class': 'solr.StrField'},
+                           {'name': '_nest_path_', 'class': 'solr.NestPathField'}],
+            'fields': [{'name': 'id', 'type': 'string'}, {'name': '_root_', 'type': 'string'},
+                       {'name': '_nest_path_', 'type': '_nest_path_'}]
+        }
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 2
+        children = [{"id": f"1/c{i}", "_root_": "1", "_nest_path_": f"/comments#{i}"} for i in range(12)]
+        self.mock_solr_client.select.side_effect = [
+            self._page([{"id": "1"}, {"id": "2"}], "p1"),
+            self._page(children[:8], "k1"), self._page(children[8:], "k2"), self._page([], "k2"),
+            self._page([], "p1")]
+        uploaded = []
+        mock_s3 = Mock()
+        mock_s3.put_object.side_effect = lambda **kwargs: uploaded.append(json.loads(kwargs['Body'].read()))
+        mock_boto3.session.Session.return_value.client.return_value = mock_s3
+
+        data_config = dict(self.data_config, child_rows_per_page=8)
+        migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                 self.schema_config, data_config)
+
+        self.assertTrue(migrator.export_data(self.output_dir))
+        calls = self.mock_solr_client.select.call_args_list
+        self.assertEqual(calls[0][0][0]['fl'], '*')
+        self.assertEqual(calls[1][0][0]['fq'], '{!cache=false}_nest_path_:*')
+        self.assertTrue(calls[1][0][0]['q'].startswith('{!terms f=_root_'))
+        self.mock_solr_client.count.assert_called_with(filter_queries=['-_nest_path_:*'])
+        self.assertEqual(len(uploaded[0][0]['comments']), 12)
+        self.assertNotIn('comments', uploaded[0][1])
+        self.assertEqual(migrator._report.data_migration_nested,
+                         {"parents": 2, "children": 12, "max_children": 12, "wide_parents": 1, "orphans": 0})
+
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_nested_without_readable_root(self, mock_boto3):
+        """Test that children are read with an unlimited [child] transformer when _root_ cannot be returned"""
+        self.mock_solr_client.read_schema.return_value = {
+            'uniqueKey': 'id',
+            'fieldTypes': [{'name': 'string', 'class': 'solr.StrField'},
+                           {'name': 'nested', 'class': 'solr.NestPathField'}],
+            'fields': [{'name': 'id', 'type': 'string'},
+                       {'name': '_root_', 'type': 'string', 'stored': False, 'docValues': False},
+                       {'name': '_nest_path_', 'type': 'nested'}]
+        }
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 1
+        self.mock_solr_client.select.side_effect = [self._page([{"id": "1"}], "p1"), self._page([], "p1")]
+        mock_boto3.session.Session.return_value.client.return_value = Mock()
+
+        migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                  self.schema_config, self.data_config)
+
+        self.assertTrue(migrator.export_data(self.output_dir))
+        self.assertEqual(self.mock_solr_client.select.call_args_list[0][0][0]['fl'], '*,[child limit=-1]')
+        self.mock_solr_client.count.assert_called_with()
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_nested_orphans_are_errors(self, mock_boto3):
+        """Test that children whose parent is not in the page are reported as migration errors"""
+        self.mock_solr_client.read_schema.return_value = {
+            'uniqueKey': 'id',
+            'fieldTypes': [{'name': 'string', 'class': 'solr.StrField'},
+                           {'name': '_nest_path_', 'class': 'solr.NestPathField'}],
+            'fields': [{'name': 'id', 'type': 'string'}, {'name': '_root_', 'type': 'string'},
+                       {'name': '_nest_path_', 'type': '_nest_path_'}]
+        }
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 1
+        self.mock_solr_client.select.side_effect = [
+            self._page([{"id": "1"}], "p1"),
+            self._page([{"id": "9/c0", "_nest_path_": "/comments#0"}], "k1"), self._page([], "k1"),
+            self._page([], "p1")]
+        mock_boto3.session.Session.return_value.client.return_value = Mock()
+
+        migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                  self.schema_config, self.data_config)
+
+        migrator.export_data(self.output_dir)
+        self.assertEqual(migrator._report.data_migration_errors, 1)
+        self.assertIn("Dropped 1 child documents", migrator._report.data_migration_error_list[0])
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_shard_direct_export(self, mock_boto3):
+        """Test that each shard is exported from its preferred replica core with distrib=false"""
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        replica = {"state": "active", "base_url": "http://n1:8983/solr", "node_name": "n1:8983_solr"}
+        self.mock_solr_client.cluster_status.return_value = {"live_nodes": ["n1:8983_solr"], "collections": {
+            "test": {"shards": {
+                "shard1": {"replicas": {"a": dict(replica, core="test_shard1_replica_n1", type="NRT", leader="true"),
+                                        "b": dict(replica, core="test_shard1_replica_p1", type="PULL")}},
+                "shard2": {"replicas": {"c": dict(replica, core="test_shard2_replica_n1", type="NRT", leader="true")}},
+            }}}}
+        self.mock_solr_client.count.return_value = 2
+        cores = []
+
+        def select(params, core_url=None, **kwargs):
+            cores.append((core_url, params['distrib']))
+            if params['cursorMark'] == '*':
+                return self._page([{"id": core_url[-2:]}], "c1")
+            return self._page([], "c1")
+
+        self.mock_solr_client.select.side_effect = select
+        mock_boto3.session.Session.return_value.client.return_value = Mock()
+
+        data_config = dict(self.data_config, partition_mode='shard')
+        migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                 self.schema_config, data_config)
+
+        self.assertTrue(migrator.export_data(self.output_dir))
+        self.assertEqual(sorted(set(cores)), [('http://n1:8983/solr/test_shard1_replica_p1', 'false'),
+                                              ('http://n1:8983/solr/test_shard2_replica_n1', 'false')])
+        self.assertEqual(migrator._report.data_migration_docs_exported, 2)
+        self.assertEqual(sorted(p["name"] for p in migrator._report.data_migration_partitions), ['shard1', 'shard2'])
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_tee_local_and_s3(self, mock_boto3):
+        """Test that one read pass is written to a local directory and S3 and journaled once both have it"""
+        import os
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 2
+        self.mock_solr_client.select.side_effect = [self._page([{"id": "1"}, {"id": "2"}], "c1"),
+                                                    self._page([], "c1")]
+        mock_s3 = Mock()
+        mock_boto3.session.Session.return_value.client.return_value = mock_s3
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            data_config = dict(self.data_config, export_target=['local', 's3'],
+                               local_export_dir=os.path.join(output_dir, 'archive'))
+            migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                      self.schema_config, data_config)
+            self.assertTrue(migrator.export_data(output_dir))
+            self.assertTrue(os.path.exists(os.path.join(output_dir, 'archive', 'solr-data', 'test_batch_1.json')))
+            self.assertEqual(mock_s3.put_object.call_args[1]['Key'], 'solr-data/test_batch_1.json')
+            self.assertEqual(migrator._report.data_migration_objects, 2)
+            with open(os.path.join(output_dir, 'export_journal.jsonl')) as f:
+                batch = [json.loads(line) for line in f if '"batch"' in line][0]
+            self.assertEqual(batch['keys'], [os.path.join(output_dir, 'archive', 'solr-data', 'test_batch_1.json'),
+                                             'solr-data/test_batch_1.json'])
+
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_batch_telemetry(self, mock_boto3):
+        """Test that stage latencies, throughput and slowest batches reach the data migration report"""
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 2
+        self.mock_solr_client.select.side_effect = [self._page([{"id": "1"}, {"id": "2"}], "c1"),
+                                                    self._page([], "c1")]
+        mock_boto3.session.Session.return_value.client.return_value = Mock()
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                      self.schema_config, self.data_config)
+            self.assertTrue(migrator.export_data(output_dir))
+            with open(f"{output_dir}/data_migration_report.html") as f:
+                html = f.read()
+        telemetry = migrator._report.data_migration_telemetry
+        self.assertEqual([stage["stage"] for stage in telemetry["stages"]],
+                         ["solr", "parse", "write", "serialize", "upload"])
+        self.assertEqual(telemetry["slowest"][0]["cursor_mark"], "*")
+        self.assertEqual(sum(point["docs"] for point in telemetry["timeline"]), 2)
+        self.assertGreater(telemetry["bytes_out"], 0)
+        self.assertIn("Slowest Batches", html)
+        self.assertIn("Throughput Timeline", html)
+
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_pipelined_export_spills_pages(self, mock_boto3):
+        """Test that pages beyond buffer_memory_bytes are spilled to disk and still exported in order"""
+        import os
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 3
+        self.mock_solr_client.select.side_effect = [self._page([{"id": "1"}], "c1"), self._page([{"id": "2"}], "c2"),
+                                                    self._page([{"id": "3"}], "c3"), self._page([], "c3")]
+        mock_s3 = Mock()
+        mock_boto3.session.Session.return_value.client.return_value = mock_s3
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            data_config = dict(self.data_config, pipeline=True, buffer_memory_bytes=1)
+            migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                      self.schema_config, data_config)
+            self.assertTrue(migrator.export_data(output_dir))
+            self.assertFalse(os.path.exists(os.path.join(output_dir, 'spill')))
+        self.assertEqual(migrator._report.data_migration_errors, 0)
+        self.assertEqual(migrator._report.data_migration_docs_exported, 3)
+        self.assertEqual(mock_s3.put_object.call_count, 3)
+        # whether pages spill depends on how far the fetch stage runs ahead of the parse stage
+        self.assertEqual(migrator._report.data_migration_buffer["memory_megabytes"], 0.0)
+        self.assertLessEqual(migrator._report.data_migration_buffer["spilled_pages"], 3)
+
+
+    def _broken_solr(self, ids, broken, fixed=False):
+        """Select side effect paging ids by cursorMark where the documents in broken do not parse"""
+        def select(params, **kwargs):
+            if params['q'].startswith('{!terms'):
+                wanted = params['q'].split('}', 1)[1].split('\x1f')
+                start, window = 0, [i for i in ids if i in wanted]
+            else:
+                start = 0 if params['cursorMark'] == '*' else int(params['cursorMark'][1:])
+                window = ids[start:start + int(params['rows'])]
+            id_only = params.get('fl') == 'id'
+            docs = ",".join('{"id":"%s"}' % i if id_only or fixed or i not in broken else
+                            '{"id":"%s","data":UEsD}' % i for i in window)
+            cursor = f"c{start + len(window)}" if window else params.get('cursorMark', '*')
+            response = Mock()
+            response.text = '{"response":{"docs":[%s]},"nextCursorMark":"%s"}' % (docs, cursor)
+            return response
+        return select
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_bisect_dead_letters_and_replay(self, mock_boto3):
+        """Test that a page that does not parse is bisected, its broken document dead-lettered and replayed"""
+        import os
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 5
+        self.mock_solr_client.select.side_effect = self._broken_solr(["1", "2", "3", "4", "5"], {"3"})
+        mock_s3 = Mock()
+        mock_boto3.session.Session.return_value.client.return_value = mock_s3
+        uploaded = []
+        mock_s3.put_object.side_effect = lambda **kwargs: uploaded.append((kwargs['Key'],
+                                                                           json.loads(kwargs['Body'].read())))
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            data_config = dict(self.data_config, rows_per_page=4)
+            migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                      self.schema_config, data_config)
+            self.assertTrue(migrator.export_data(output_dir))
+            self.assertEqual(migrator._report.data_migration_docs_exported, 4)
+            self.assertEqual(migrator._report.data_migration_dead_letters, 1)
+            # a page that does not parse is bisected at once, without retries
+            self.assertEqual(migrator._report.data_migration_retries, 0)
+            self.assertEqual([doc['id'] for doc in uploaded[0][1]], ["1", "2", "4"])
+            with open(os.path.join(output_dir, 'dead_letter.jsonl')) as f:
+                record = json.loads(f.readline())
+            self.assertEqual((record['id'], record['batch'], record['cursor_mark']), ("3", 1, "c2"))
+            self.assertIn("UEsD", record['raw'])
+
+            # the broken field is fixed in Solr
+            self.mock_solr_client.select.side_effect = self._broken_solr(["1", "2", "3", "4", "5"], {"3"}, fixed=True)
+            uploaded.clear()
+            migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                      self.schema_config, data_config)
+            self.assertEqual(migrator.replay_dead_letters(output_dir), 1)
+            self.assertEqual(len(uploaded), 1)
+            self.assertTrue(uploaded[0][0].startswith('solr-data/test_replay_'))
+            self.assertEqual(uploaded[0][1], [{"id": "3"}])
+            self.assertFalse(os.path.exists(os.path.join(output_dir, 'dead_letter.jsonl')))
+
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_pipelined_bisect_failure_keeps_batch_uncommitted(self, mock_boto3):
+        """Test that a pipelined page that cannot be bisected stops the partition before the journal passes it"""
+        import os
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 6
+        broken_solr = self._broken_solr(["1", "2", "3", "4", "5", "6"], {"3"})
+
+        def select(params, **kwargs):
+            if params.get('fl') == 'id':
+                # the uniqueKey of the broken document cannot be read either
+                response = Mock()
+                response.text = 'invalid json {{{'
+                return response
+            return broken_solr(params, **kwargs)
+        self.mock_solr_client.select.side_effect = select
+        mock_boto3.session.Session.return_value.client.return_value = Mock()
+
+        data_config = dict(self.data_config, pipeline=True, rows_per_page=2)
+        migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                  self.schema_config, data_config)
+        self.assertTrue(migrator.export_data(self.output_dir))
+
+        self.assertIn("bisecting failed", str(migrator._report.data_migration_error_list))
+        with open(os.path.join(self.output_dir, 'export_journal.jsonl')) as f:
+            records = [json.loads(line) for line in f]
+        batches = [(record['batch'], record['cursor_mark']) for record in records if record['type'] == 'batch']
+        self.assertEqual(batches, [(1, "c2")])
+        self.assertNotIn('done', [record['type'] for record in records])
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_adaptive_concurrency(self, mock_boto3):
+        """Test that export requests are uncached and governed, and the controller decisions are charted"""
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 2
+        pages = [self._page([{"id": "1"}, {"id": "2"}], "c1"), self._page([], "c1")]
+
+        def select(params, **kwargs):
+            # stand in for the client, which sends every request through the governor
+            governor = self.mock_solr_client.set_request_governor.call_args[0][0]
+            governor.acquire()
+            governor.release(0.01)
+            return pages.pop(0)
+        self.mock_solr_client.select.side_effect = select
+        mock_boto3.session.Session.return_value.client.return_value = Mock()
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            data_config = dict(self.data_config, adaptive_concurrency=True, solr_max_concurrency=4,
+                               solr_initial_concurrency=1, solr_max_rps=100)
+            migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                      self.schema_config, data_config)
+            controller_calls = self.mock_solr_client.set_request_governor.call_args_list
+            self.assertTrue(migrator.export_data(output_dir))
+            with open(f"{output_dir}/data_migration_report.html") as f:
+                html = f.read()
+        controller = controller_calls[0][0][0]
+        self.assertEqual((controller.max_concurrency, controller.max_rps), (4, 100))
+        self.assertIsNone(controller_calls[-1][0][0])
+        self.assertTrue(self.mock_solr_client.select.call_args_list[0][0][0]['q'].endswith(' cache=false}'))
+        concurrency = migrator._report.data_migration_concurrency
+        self.assertEqual((concurrency["initial_limit"], concurrency["limit"], concurrency["requests"]), (1, 2, 1))
+        self.assertEqual([decision["limit"] for decision in concurrency["decisions"]], [2])
+        self.assertTrue(concurrency["chart_points"].startswith("0.0,"))
+        self.assertIn("Solr Concurrency", html)
+        self.assertIn("<polyline", html)
+
+    def test_reconcile(self):
+        """Test that reconcile reports the buckets of documents that differ between Solr and OpenSearch"""
+        import os
+        from migrate.export import id_bucket
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        docs = [{"id": str(i), "title": f"t{i}"} for i in range(5)]
+        self.mock_solr_client.select.side_effect = [self._page(docs[:3], "c1"), self._page(docs[3:], "c2"),
+                                                    self._page([], "c2")]
+        # indexed by the OSIS pipeline under generated ids, with the @timestamp its date processor adds
+        target = [dict(doc, **{"@timestamp": "2024-01-01T00:00:00Z"}) for doc in docs]
+        target[2]["title"] = "changed"
+        self.mock_opensearch_client.scan.return_value = iter(
+            [{"_id": f"generated-{i}", "_source": doc} for i, doc in enumerate(reversed(target))])
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            data_config = dict(self.data_config, reconcile_bucket_bits=8)
+            migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                      self.schema_config, data_config)
+            result = migrator.reconcile(output_dir)
+            self.assertTrue(os.path.exists(f"{output_dir}/reconcile.json"))
+        self.assertEqual((result["source_docs"], result["target_docs"]), (5, 5))
+        self.assertEqual(result["differing_buckets"], [{"bucket": id_bucket("2", 8), "source_docs": 1,
+                                                        "target_docs": 1}])
+        self.assertEqual(self.mock_solr_client.select.call_args_list[1][0][0]['cursorMark'], 'c1')
+
+    def test_diff_ids(self):
+        """Test that the ids of Solr and OpenSearch are merged into missing and extra id files"""
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        export_response = Mock()
+        export_response.iter_content.return_value = [
+            b'{"responseHeader":{"status":0},"response":{"numFound":4,"docs":[{"id":"1"},{"id":"2"},',
+            b'{"id":"4"},{"id":"5"}]}}']
+        self.mock_solr_client.export.return_value = export_response
+        self.mock_opensearch_client.scan.return_value = iter(
+            [{"_id": i, "sort": [i]} for i in ("1", "3", "4")])
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                      self.schema_config, self.data_config)
+            result = migrator.diff_ids(output_dir)
+            with open(result["missing_file"]) as f:
+                missing = f.read().splitlines()
+            with open(result["extra_file"]) as f:
+                extra = f.read().splitlines()
+        self.assertEqual((missing, extra), (["2", "5"], ["3"]))
+        self.assertEqual((result["missing"], result["extra"]), (2, 1))
+        params = self.mock_solr_client.export.call_args[0][0]
+        self.assertEqual((params['fl'], params['sort']), ('id', 'id asc'))
+        self.assertEqual(self.mock_opensearch_client.scan.call_args.kwargs['sort_field'], 'id')
+        export_response.close.assert_called_once()
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_reexport_ids(self, mock_boto3):
+        """Test that only the listed documents are fetched in chunks and exported"""
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+
+        def select(params, **kwargs):
+            ids = params['q'].split('}', 1)[1].split('\x1f')
+            return self._page([{"id": i} for i in ids], None)
+        self.mock_solr_client.select.side_effect = select
+        mock_s3 = Mock()
+        mock_boto3.session.Session.return_value.client.return_value = mock_s3
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            id_file = f"{output_dir}/missing_ids.txt"
+            with open(id_file, "w") as f:
+                f.write("2\n5\n7\n")
+            data_config = dict(self.data_config, rows_per_page=2, export_workers=2)
+            migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                      self.schema_config, data_config)
+            self.assertEqual(migrator.reexport_ids(id_file), 3)
+        self.assertEqual(self.mock_solr_client.select.call_count, 2)
+        keys = [c.kwargs['Key'] for c in mock_s3.put_object.call_args_list]
+        self.assertEqual(len(keys), 2)
+        self.assertTrue(all('test_reexport_' in key for key in keys))
+
+    def test_sync(self):
+        """Test that sync applies changed documents with external versions, deletes, re-indexes and writes metrics"""
+        import os
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.max_value.side_effect = ["5", "5"]
+        self.mock_solr_client.count.return_value = 2
+        pages = [self._page([{"id": "1", "_version_": 11}, {"id": "2", "_version_": 12}], "c1"), self._page([], "c1")]
+
+        def select(params, **kwargs):
+            if 'cursorMark' in params:
+                return pages.pop(0)
+            if '5' in params['q']:
+                # the Solr document missing from the index
+                return self._page([{"id": "5", "_version_": 15}], None)
+            # the ids only in OpenSearch that Solr has again
+            return self._page([{"id": "3"}], None)
+        self.mock_solr_client.select.side_effect = select
+        export_response = Mock()
+        export_response.iter_content.return_value = [b'{"response":{"docs":[{"id":"1"},{"id":"2"},{"id":"5"}]}}']
+        self.mock_solr_client.export.return_value = export_response
+        self.mock_opensearch_client.scan.side_effect = lambda *args, **kwargs: iter(
+            [{"_id": i, "sort": [i]} for i in ("1", "2", "3", "4")])
+        bodies = []
+
+        def bulk(body, filter_path=None):
+            bodies.append(body.decode("utf-8"))
+            return {"errors": False}
+        self.mock_opensearch_client.bulk.side_effect = bulk
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            data_config = dict(self.data_config, delta_field='_version_', sync_interval_seconds=0,
+                               sync_delete_interval_seconds=1e-9)
+            migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                      self.schema_config, data_config)
+            metrics = migrator.sync(output_dir, max_cycles=2)
+            with open(f"{output_dir}/sync_watermark.json") as f:
+                self.assertEqual(json.load(f)["watermark"], "5")
+            self.assertTrue(os.path.exists(f"{output_dir}/sync_metrics.prom"))
+        # the mocked index still has id 4 at the second delete check
+        self.assertEqual((metrics["cycles"], metrics["applied_docs"], metrics["deleted_docs"]), (2, 2, 2))
+        self.assertIsNotNone(metrics["lag_seconds"])
+        actions = [json.loads(line) for body in bodies for line in body.splitlines()]
+        self.assertIn({"index": {"_id": "1", "version": 11, "version_type": "external"}}, actions)
+        self.assertIn({"delete": {"_id": "4"}}, actions)
+        self.assertNotIn({"delete": {"_id": "3"}}, actions)
+        self.assertIn({"index": {"_id": "5", "version": 15, "version_type": "external"}}, actions)
+        self.assertEqual(metrics["missing_docs"], 1)
+        # the second cycle found no change and read no pages
+        self.assertEqual(self.mock_solr_client.count.call_count, 1)
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_run_export_worker(self, mock_boto3):
+        """Test that a worker exports queued partitions and resumes one whose lease expired"""
+        from migrate.export import SqliteWorkQueue
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 2
+        cursor_marks = []
+
+        def select(params, **kwargs):
+            cursor_marks.append(params['cursorMark'])
+            if params['cursorMark'] == '*':
+                return self._page([{"id": "1"}], "c1")
+            return self._page([], "c1")
+        self.mock_solr_client.select.side_effect = select
+        mock_s3 = Mock()
+        mock_boto3.session.Session.return_value.client.return_value = mock_s3
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            data_config = dict(self.data_config, export_partitions=2, export_workers=2, lease_seconds=30,
+                               work_queue_poll_seconds=0.01)
+            migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                      self.schema_config, data_config)
+            # hash_0 was exported by w0, hash_1 by a worker that died after committing its first batch
+            partitions = migrator._build_partitions('id')
+            queue = SqliteWorkQueue(f"{output_dir}/work_queue.db")
+            queue.publish(migrator._export_fingerprint('id', partitions), partitions)
+            queue.complete(queue.claim("w0", 30), 1, 1.0)
+            dead = queue.claim("dead", -1)
+            queue.checkpoint(dead, 1, "c1", 1, ["solr-data/test_dead_batch_1.json"])
+
+            self.assertEqual(migrator.run_export_worker(output_dir, worker_id="w1"), 1)
+            stats = {worker["worker"]: worker for worker in queue.worker_stats()}
+            with open(f"{output_dir}/data_migration_report_w1.html") as f:
+                report = f.read()
+        self.assertEqual(cursor_marks, ['c1'])
+        self.assertEqual((stats["w0"]["partitions"], stats["w1"]["partitions"], stats["w1"]["docs"]), (1, 1, 0))
+        self.assertIn("Export Workers", report)
+        self.assertIn("w0", report)
+
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_restarted_export_worker_keeps_committed_objects(self, mock_boto3):
+        """Test that a restarted worker numbers its batches after those it checkpointed before it died"""
+        from migrate.export import SqliteWorkQueue
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 3
+
+        def select(params, **kwargs):
+            if params['cursorMark'] == 'c1':
+                return self._page([{"id": "2"}], "c2")
+            return self._page([], params['cursorMark'])
+        self.mock_solr_client.select.side_effect = select
+        mock_s3 = Mock()
+        mock_boto3.session.Session.return_value.client.return_value = mock_s3
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            data_config = dict(self.data_config, export_partitions=2, export_workers=1)
+            migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                      self.schema_config, data_config)
+            partitions = migrator._build_partitions('id')
+            queue = SqliteWorkQueue(f"{output_dir}/work_queue.db")
+            queue.publish(migrator._export_fingerprint('id', partitions), partitions)
+            # the previous process of w1 committed batch 1 of hash_0 and died
+            dead = queue.claim("w1", -1)
+            queue.checkpoint(dead, 1, "c1", 1, ["solr-data/test_w1_batch_1.json"])
+
+            self.assertEqual(migrator.run_export_worker(output_dir, worker_id="w1"), 2)
+        keys = [c.kwargs['Key'] for c in mock_s3.put_object.call_args_list]
+        self.assertEqual(keys, ["solr-data/test_w1_batch_2.json"])
+
+    @patch('migrate.solr2os_migrate.boto3')
+    def test_run_export_worker_shares_max_rows(self, mock_boto3):
+        """Test that max_rows counts the documents other workers already committed"""
+        from migrate.export import SqliteWorkQueue
+        self.mock_solr_client.read_schema.return_value = {'fieldTypes': [], 'fields': []}
+        self.mock_solr_client.get_config.return_value = {
+            'host': 'http://localhost', 'port': '8983', 'collection': 'test'
+        }
+        self.mock_solr_client.count.return_value = 20
+        mock_boto3.session.Session.return_value.client.return_value = Mock()
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            data_config = dict(self.data_config, export_partitions=2, export_workers=1, max_rows=10)
+            migrator = Solr2OSMigrate(self.mock_solr_client, self.mock_opensearch_client,
+                                      self.schema_config, data_config)
+            partitions = migrator._build_partitions('id')
+            queue = SqliteWorkQueue(f"{output_dir}/work_queue.db")
+            queue.publish(migrator._export_fingerprint('id', partitions), partitions)
+            other = queue.claim("w0", 30)
+            queue.checkpoint(other, 1, "c1", 10, [])
+
+            self.assertEqual(migrator.run_export_worker(output_dir, worker_id="w1"), 0)
+            self.assertEqual(queue.unfinished(), 2)
+        self.mock_solr_client.select.assert_not_called()
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -824,3 +824,36 @@ class TestOpensearchClient:
         client._opensearch_index.mapping.assert_called_once_with(client._mapping)
 
 
+
+    def test_bulk(self, mock_opensearch_client):
+        """Test that bulk requests target the migration index"""
+        mock_opensearch_client._opensearch_client.bulk = Mock(return_value={"errors": False})
+
+        response = mock_opensearch_client.bulk(b'{"index":{}}\n{"id":"1"}\n', filter_path="errors")
+
+        assert response == {"errors": False}
+        assert mock_opensearch_client.index_name == "test-index"
+        mock_opensearch_client._opensearch_client.bulk.assert_called_once_with(
+            body=b'{"index":{}}\n{"id":"1"}\n', index="test-index", filter_path="errors")
+
+    def test_scan(self, mock_opensearch_client):
+        """Test that scan pages through a point in time with search_after and deletes it"""
+        client = mock_opensearch_client._opensearch_client
+        client.create_pit = Mock(return_value={"pit_id": "pit1"})
+        client.delete_pit = Mock()
+        client.search = Mock(side_effect=[
+            {"pit_id": "pit2", "hits": {"hits": [{"_id": "1", "sort": ["1"]}, {"_id": "2", "sort": ["2"]}]}},
+            {"pit_id": "pit2", "hits": {"hits": [{"_id": "3", "sort": ["3"]}]}},
+            {"pit_id": "pit2", "hits": {"hits": []}}
+        ])
+
+        hits = list(mock_opensearch_client.scan(page_size=2, source=False))
+
+        assert [hit["_id"] for hit in hits] == ["1", "2", "3"]
+        client.create_pit.assert_called_once_with(index="test-index", keep_alive="5m")
+        bodies = [call.kwargs["body"] for call in client.search.call_args_list]
+        assert "search_after" not in bodies[0]
+        assert bodies[1]["search_after"] == ["2"]
+        assert bodies[2]["pit"]["id"] == "pit2"
+        assert bodies[0]["sort"] == [{"_id": "asc"}]
+        client.delete_pit.assert_called_once_with(body={"pit_id": ["pit2"]})
@@ -0,0 +1,91 @@
+import threading
+from unittest.mock import Mock
+
+import pytest
+
+from migrate.orchestrator import MigrationOrchestrator
+
+
+class FakeSolrClient:
+    sizes = {'logs_1': 10, 'logs_2': 500, 'products': 50, 'users': 5}
+
+    def __init__(self, config):
+        self.collection = config['collection']
+        self.budget = None
+
+    def set_request_budget(self, budget):
+        self.budget = budget
+
+    def list_collections(self):
+        return list(self.sizes)
+
+    def count(self):
+        with self.budget.request():
+            return self.sizes[self.collection]
+
+
+class FakeMigrator:
+    started = []
+    lock = threading.Lock()
+
+    def __init__(self, solr_client, opensearch_client, schema_config, data_config, s3_budget=None):
+        self._solr_client = solr_client
+        self.s3_budget = s3_budget
+        self.report = Mock(data_migration_docs_exported=0, data_migration_errors=0)
+
+    def migrate_schema(self, file_path_prefix):
+        with self.lock:
+            self.started.append(self._solr_client.collection)
+
+    def export_data(self, file_path_prefix):
+        if self._solr_client.collection == 'products':
+            raise RuntimeError("S3 access denied")
+        with self.s3_budget.request():
+            self.report.data_migration_docs_exported = FakeSolrClient.sizes[self._solr_client.collection]
+        return True
+
+
+class TestMigrationOrchestrator:
+    @pytest.fixture
+    def config(self, tmp_path):
+        return {
+            'solr': {'host': 'http://localhost', 'port': 8983, 'collection': 'logs_1'},
+            'opensearch': {'index': 'ignored'},
+            'migration': {'migrate_schema': True},
+            'data_migration': {'migrate_data': True},
+            'orchestration': {'max_parallel_collections': 1, 'solr_max_concurrent_requests': 2,
+                              'index_name_template': 'solr-{collection}', 'output_dir': str(tmp_path)}
+        }
+
+    @pytest.fixture
+    def opensearch_factory(self):
+        return Mock()
+
+    @pytest.fixture
+    def orchestrator(self, config, opensearch_factory):
+        FakeMigrator.started = []
+        return MigrationOrchestrator(config, solr_client_factory=FakeSolrClient,
+                                     opensearch_client_factory=opensearch_factory, migrator_factory=FakeMigrator)
+
+    def test_resolve_collections(self, orchestrator):
+        assert orchestrator.resolve_collections(['logs_*', 'users', 'logs_2']) == ['logs_1', 'logs_2', 'users']
+        assert orchestrator.resolve_collections(['missing_*']) == []
+
+    def test_run_largest_first(self, orchestrator, opensearch_factory, tmp_path):
+        results = orchestrator.run(['logs_*', 'products'])
+
+        assert FakeMigrator.started == ['logs_2', 'products', 'logs_1']
+        assert [(r['collection'], r['index'], r['exported'], r['status']) for r in results] == [
+            ('logs_2', 'solr-logs_2', 500, 'completed'),
+            ('products', 'solr-products', 0, 'failed'),
+            ('logs_1', 'solr-logs_1', 10, 'completed')]
+        assert results[1]['error'] == "S3 access denied"
+        assert opensearch_factory.call_args_list[0].args[0]['index'] == 'solr-logs_2'
+        opensearch_factory.return_value.set_api_budgets.assert_called_with(
+            package_budget=orchestrator.package_budget, s3_budget=orchestrator.s3_budget)
+        assert orchestrator.solr_budget.stats()['requests'] == 3
+        assert orchestrator.s3_budget.stats()['requests'] == 2
+        assert (tmp_path / 'logs_2').is_dir()
+        report = (tmp_path / 'orchestration_report.html').read_text()
+        assert 'S3 access denied' in report
+        assert 'Solr requests' in report
@@ -0,0 +1,157 @@
+import pytest
+from unittest.mock import patch, Mock
+from requests.adapters import HTTPAdapter
+import requests
+from migrate.export import AimdController, RequestBudget
+from solr.solr_client import SolrClient
+
+
+class TestSolrClient:
+    @pytest.fixture
+    def config(self):
+        return {
+            'host': 'http://localhost',
+            'port': 8983,
+            'username': 'solr',
+            'password': 'secret',
+            'collection': 'test'
+        }
+
+    @pytest.fixture
+    def session(self):
+        with patch('solr.solr_client.pysolr.Solr') as mock_solr:
+            session = requests.Session()
+            session.get = Mock(return_value=Mock(status_code=200))
+            mock_solr.return_value.get_session.return_value = session
+            yield session
+
+    def test_configure_export_transport(self, config, session):
+        client = SolrClient(config)
+
+        client.configure_export_transport(8)
+
+        adapter = session.get_adapter('https://localhost:8983/solr/')
+        assert isinstance(adapter, HTTPAdapter)
+        assert adapter._pool_maxsize == 16
+        assert adapter._pool_block is False
+        assert session.headers['Accept-Encoding'] == 'gzip, deflate'
+        assert session.auth == ('solr', 'secret')
+
+    def test_select(self, config, session):
+        client = SolrClient(config)
+        response = Mock()
+        session.get.return_value = response
+
+        result = client.select({'q': '*:*'}, timeout=10, stream=True)
+
+        assert result._response is response
+        response.raise_for_status.assert_called_once()
+        session.get.assert_called_with('http://localhost:8983/solr/test/select', params={'q': '*:*'},
+                                       auth=('solr', 'secret'), timeout=10, stream=True)
+
+    def test_count(self, config, session):
+        client = SolrClient(config)
+        session.get.return_value = Mock(json=Mock(return_value={'response': {'numFound': 42}}))
+
+        assert client.count(filter_queries=['last_modified:[NOW-1DAY TO *]']) == 42
+        params = session.get.call_args.kwargs['params']
+        assert params['rows'] == 0
+        assert params['fq'] == ['last_modified:[NOW-1DAY TO *]']
+
+    def test_max_value(self, config, session):
+        client = SolrClient(config)
+        session.get.return_value = Mock(json=Mock(return_value={
+            'response': {'docs': [{'last_modified': '2024-05-01T00:00:00Z'}]}}))
+
+        assert client.max_value('last_modified') == '2024-05-01T00:00:00Z'
+        params = session.get.call_args.kwargs['params']
+        assert params['sort'] == 'last_modified desc'
+        assert params['rows'] == 1
+
+    def test_max_value_no_documents(self, config, session):
+        client = SolrClient(config)
+        session.get.return_value = Mock(json=Mock(return_value={'response': {'docs': []}}))
+
+        assert client.max_value('_version_') is None
+
+    def test_export(self, config, session):
+        client = SolrClient(config)
+        response = Mock()
+        session.get.return_value = response
+
+        assert client.export({'q': '*:*', 'sort': 'id asc', 'fl': 'id'})._response is response
+        session.get.assert_called_with('http://localhost:8983/solr/test/export',
+                                       params={'q': '*:*', 'sort': 'id asc', 'fl': 'id'},
+                                       auth=('solr', 'secret'), timeout=300, stream=True)
+
+    def test_stream_expression(self, config, session):
+        client = SolrClient(config)
+        session.post = Mock()
+
+        client.stream_expression('search(test, q="*:*")')
+        session.post.assert_called_with('http://localhost:8983/solr/test/stream',
+                                        data={'expr': 'search(test, q="*:*")'},
+                                        auth=('solr', 'secret'), timeout=300, stream=True)
+
+    def test_select_core(self, config, session):
+        client = SolrClient(config)
+
+        client.select({'q': '*:*', 'distrib': 'false'}, core_url='http://n1:8983/solr/test_shard1_replica_p1')
+        assert session.get.call_args[0][0] == 'http://n1:8983/solr/test_shard1_replica_p1/select'
+
+    def test_cluster_status(self, config, session):
+        client = SolrClient(config)
+        session.get.return_value = Mock(json=Mock(return_value={'cluster': {'live_nodes': ['n1:8983_solr']}}))
+
+        assert client.cluster_status() == {'live_nodes': ['n1:8983_solr']}
+        assert session.get.call_args[0][0] == 'http://localhost:8983/solr/admin/collections'
+        assert session.get.call_args.kwargs['params']['action'] == 'CLUSTERSTATUS'
+
+    def test_request_governor(self, config, session):
+        client = SolrClient(config)
+        governor = AimdController(4, target_latency=1)
+        session.get.return_value = Mock(status_code=503)
+        session.get.return_value.raise_for_status.side_effect = requests.HTTPError("503 Service Unavailable")
+        client.set_request_governor(governor)
+
+        with pytest.raises(requests.HTTPError):
+            client.select({'q': '*:*'})
+        stats = governor.stats()
+        assert (stats["requests"], stats["overloads"], stats["limit"]) == (1, 1, 2)
+
+    def test_request_budget(self, config, session):
+        client = SolrClient(config)
+        budget = RequestBudget("solr", 1)
+        session.get.return_value = Mock(status_code=200)
+        client.set_request_budget(budget)
+        client.set_request_governor(AimdController(4))
+
+        client.select({'q': '*:*'})
+        assert budget.stats()["requests"] == 1
+
+    def test_streamed_response_holds_slots_until_closed(self, config, session):
+        client = SolrClient(config)
+        budget = RequestBudget("solr", 1)
+        governor = AimdController(4, initial_concurrency=1)
+        session.get.return_value = Mock(status_code=200)
+        client.set_request_budget(budget)
+        client.set_request_governor(governor)
+
+        response = client.export({'q': '*:*', 'sort': 'id asc', 'fl': 'id'})
+        assert budget.stats()["peak_in_flight"] == 1 and governor._in_flight == 1
+        # the stored field fetch of the same thread runs within the slots of the stream
+        client.select({'q': '*:*'})
+        assert budget.stats()["requests"] == 1
+        response.close()
+        response.close()
+        assert governor._in_flight == 0
+        client.select({'q': '*:*'})
+        assert budget.stats()["requests"] == 2
+
+    def test_list_collections(self, config, session):
+        client = SolrClient(config)
+        session.get.return_value = Mock(status_code=200)
+        session.get.return_value.json.return_value = {'collections': ['logs_1', 'products']}
+
+        assert client.list_collections() == ['logs_1', 'products']
+        assert session.get.call_args.kwargs['params']['action'] == 'LIST'